@@ -0,0 +1,339 @@
+import math
+import numpy as np
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+from .events import GameObserver
+from .models import Game
+from .sequential import BOOLEAN_MEASURES, wilson_interval
+from .sweep import summarise
+
+# Measures of a game which are aggregated by default (see sweep.summarise)
+NUMERIC_MEASURES = ('turns', 'bottleneck', 'bottleneckturn', 'losses', 'nummonkeys')
+
+# Quantities of a game which are recorded at every milestone by default
+TRAJECTORY_QUANTITIES = ('overallturnmultiplier', 'survivors')
+
+
+class RunningMoments:
+    '''Count, mean, variance, minimum and maximum of a stream of values (Welford's algorithm)
+
+    Two objects which saw different values merge into one which saw both
+    (Chan's parallel update), so workers can aggregate separately.
+
+    '''
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, value: float) -> None:
+        '''Adds a value'''
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: 'RunningMoments') -> None:
+        '''Adds the values seen by another object'''
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self) -> float:
+        '''Sample variance of the values'''
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self) -> float:
+        '''Sample standard deviation of the values'''
+        return math.sqrt(self.variance) if self.count > 1 else np.nan
+
+
+class QuantileSketch:
+    '''Mergeable sketch of the quantiles of a stream of values with a relative accuracy
+
+    Values are counted in logarithmic buckets: the bucket i holds the values
+    in (gamma ** (i - 1), gamma ** i], where gamma = (1 + a) / (1 - a) and a
+    is the relative accuracy, so any quantile is returned within a relative
+    error of a. The memory grows with the logarithm of the range of the
+    values, not with their number. Negative values and zeros have buckets of
+    their own.
+
+    :param relative_accuracy: relative error of the quantiles
+
+    '''
+
+    def __init__(self, relative_accuracy: float = 0.01) -> None:
+        if not 0.0 < relative_accuracy < 1.0:
+            raise ValueError('relative_accuracy must be in (0, 1) ({0})'.format(relative_accuracy))
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.loggamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def bucket(self, value: float) -> int:
+        '''Returns the index of the bucket of a positive value'''
+        return int(math.ceil(math.log(value) / self.loggamma))
+
+    def value(self, bucket: int) -> float:
+        '''Returns the representative value of a bucket (within the relative accuracy of all its values)'''
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+    def add(self, value: float) -> None:
+        '''Adds a value'''
+        value = float(value)
+        if value > 0:
+            bucket = self.bucket(value)
+            self.positive[bucket] = self.positive.get(bucket, 0) + 1
+        elif value < 0:
+            bucket = self.bucket(-value)
+            self.negative[bucket] = self.negative.get(bucket, 0) + 1
+        else:
+            self.zeros += 1
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        '''Adds the values seen by another sketch (with the same relative accuracy)'''
+        if other.gamma != self.gamma:
+            raise ValueError('only sketches with the same relative accuracy can be merged')
+        for bucket, count in other.positive.items():
+            self.positive[bucket] = self.positive.get(bucket, 0) + count
+        for bucket, count in other.negative.items():
+            self.negative[bucket] = self.negative.get(bucket, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        '''Returns the *q* quantile of the values (nan if there are none)'''
+        if not self.count:
+            return np.nan
+        return min(max(self.estimate(q * (self.count - 1)), self.min), self.max)
+
+    def estimate(self, rank: float) -> float:
+        '''Returns the representative value of the bucket of the value of a rank'''
+        seen = 0
+        for bucket in sorted(self.negative, reverse=True):
+            seen += self.negative[bucket]
+            if seen > rank:
+                return -self.value(bucket)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for bucket in sorted(self.positive):
+            seen += self.positive[bucket]
+            if seen > rank:
+                return self.value(bucket)
+        return self.max
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        '''Returns several quantiles of the values'''
+        return [self.quantile(q) for q in qs]
+
+
+class Histogram:
+    '''Counts of a stream of values in fixed bins
+
+    Values below the first edge or above the last one are counted apart.
+    Histograms with the same edges merge by adding their counts.
+
+    :param edges: increasing edges of the bins (bin i is [edges[i], edges[i + 1]))
+
+    '''
+
+    def __init__(self, edges: Sequence[float]) -> None:
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+
+    @classmethod
+    def logarithmic(cls, stop: float, bins_per_decade: int = 10) -> 'Histogram':
+        '''Returns a histogram of nonnegative values with a bin [0, 1) and logarithmic bins from 1 to *stop*'''
+        ndecades = max(math.ceil(math.log10(max(stop, 10))), 1)
+        return cls(np.concatenate((
+            [0.0], np.logspace(0, ndecades, ndecades * bins_per_decade + 1))))
+
+    def add(self, value: float) -> None:
+        '''Adds a value'''
+        if value < self.edges[0]:
+            self.underflow += 1
+        elif value >= self.edges[-1]:
+            self.overflow += 1
+        else:
+            self.counts[np.searchsorted(self.edges, value, side='right') - 1] += 1
+
+    def merge(self, other: 'Histogram') -> None:
+        '''Adds the counts of another histogram (with the same edges)'''
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError('only histograms with the same edges can be merged')
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+
+
+class GameAggregator(GameObserver):
+    '''Online summary of the results of many games, in memory which does not grow with their number
+
+    For every numeric measure of a game (see sweep.summarise) it keeps the
+    running moments, a quantile sketch and a histogram; for every measure
+    which is True/False it keeps the number of successes. As an observer of
+    the games, it also records some quantities of the game at every
+    milestone (every archive_cycle turns), whose running moments by turn
+    give e.g. the mean multiplier trajectory. Aggregators of different
+    workers (or of different batches) merge into one.
+
+    :param maxvalue: upper edge of the histograms (larger values are counted as overflow)
+    :param measures: numeric measures which are aggregated
+    :param quantities: Game attributes recorded at every milestone
+    :param relative_accuracy: relative error of the quantiles
+    :param bins_per_decade: logarithmic bins of the histograms per power of 10
+
+    '''
+
+    def __init__(
+            self,
+            maxvalue: float = 10 ** 7,
+            measures: Sequence[str] = NUMERIC_MEASURES,
+            quantities: Sequence[str] = TRAJECTORY_QUANTITIES,
+            relative_accuracy: float = 0.01,
+            bins_per_decade: int = 10) -> None:
+        self.maxvalue = maxvalue
+        self.measures = tuple(measures)
+        self.quantities = tuple(quantities)
+        self.relative_accuracy = relative_accuracy
+        self.ngames = 0
+        self.successes = {measure: 0 for measure in BOOLEAN_MEASURES}
+        self.moments = {measure: RunningMoments() for measure in self.measures}
+        self.sketches = {measure: QuantileSketch(relative_accuracy) for measure in self.measures}
+        self.histograms = {
+            measure: Histogram.logarithmic(maxvalue, bins_per_decade)
+            for measure in self.measures}
+        # trajectories[quantity][turn] are the moments of the quantity at that turn
+        self.trajectories = {quantity: {} for quantity in self.quantities}
+
+    # Feeding
+
+    def add(self, result: Dict[str, Any]) -> None:
+        '''Adds the measures of a finished game (see sweep.summarise)
+
+        Values which are not finite (e.g. the multipliers of a game shorter
+        than archive_cycle) are left out.
+
+        '''
+        self.ngames += 1
+        for measure in self.successes:
+            if measure in result:
+                self.successes[measure] += bool(result[measure])
+        for measure in self.measures:
+            value = float(result[measure])
+            if not np.isfinite(value):
+                continue
+            self.moments[measure].add(value)
+            self.sketches[measure].add(value)
+            self.histograms[measure].add(value)
+
+    def add_game(self, game: Game) -> None:
+        '''Adds a finished game (its measures are those of sweep.summarise and its best and worst multipliers)'''
+        result = summarise(game)
+        result['worstoverallturnmultiplier'] = game.worstoverallturnmultiplier
+        result['bestoverallturnmultiplier'] = game.bestoverallturnmultiplier
+        self.add(result)
+
+    def record(self, game: Game) -> None:
+        '''Records the quantities of a game in its current turn'''
+        for quantity in self.quantities:
+            moments = self.trajectories[quantity].get(game.turns)
+            if moments is None:
+                moments = self.trajectories[quantity][game.turns] = RunningMoments()
+            moments.add(getattr(game, quantity))
+
+    def merge(self, other: 'GameAggregator') -> None:
+        '''Adds the games seen by another aggregator (with the same measures and quantities)'''
+        if (other.measures != self.measures) or (other.quantities != self.quantities):
+            raise ValueError('only aggregators of the same measures and quantities can be merged')
+        self.ngames += other.ngames
+        for measure, successes in other.successes.items():
+            self.successes[measure] += successes
+        for measure in self.measures:
+            self.moments[measure].merge(other.moments[measure])
+            self.sketches[measure].merge(other.sketches[measure])
+            self.histograms[measure].merge(other.histograms[measure])
+        for quantity in self.quantities:
+            trajectory = self.trajectories[quantity]
+            for turn, moments in other.trajectories[quantity].items():
+                if turn not in trajectory:
+                    trajectory[turn] = RunningMoments()
+                trajectory[turn].merge(moments)
+
+    # GameObserver hooks
+
+    def on_milestone(self, game: Game) -> None:
+        self.record(game)
+
+    def on_end(self, game: Game) -> None:
+        self.add_game(game)
+
+    # Summaries
+
+    def chance(self, measure: str = 'learned', confidence: float = 0.95) -> Tuple[float, float, float]:
+        '''Returns the proportion of games in which a True/False measure was True and its Wilson interval'''
+        successes = self.successes[measure]
+        low, high = wilson_interval(successes, self.ngames, confidence)
+        return (successes / self.ngames if self.ngames else np.nan, low, high)
+
+    def trajectory(self, quantity: str = 'overallturnmultiplier') -> Dict[str, np.ndarray]:
+        '''Returns the turns of the milestones and the count, mean and standard deviation of a quantity in each'''
+        trajectory = self.trajectories[quantity]
+        turns = sorted(trajectory)
+        return {
+            'turns': np.array(turns),
+            'count': np.array([trajectory[turn].count for turn in turns]),
+            'mean': np.array([trajectory[turn].mean for turn in turns]),
+            'std': np.array([trajectory[turn].std for turn in turns]),
+        }
+
+    def summary(self, qs: Sequence[float] = (0.05, 0.25, 0.5, 0.75, 0.95)) -> Dict[str, Dict[str, float]]:
+        '''Returns the count, mean, standard deviation, minimum, maximum and quantiles of every numeric measure
+
+        The chance and interval of every True/False measure are under the key of the measure too.
+
+        '''
+        summary = {}
+        for measure in self.successes:
+            chance, low, high = self.chance(measure)
+            summary[measure] = {'chance': chance, 'low': low, 'high': high}
+        for measure in self.measures:
+            moments = self.moments[measure]
+            summary[measure] = {
+                'count': moments.count,
+                'mean': moments.mean if moments.count else np.nan,
+                'std': moments.std,
+                'min': moments.min,
+                'max': moments.max,
+            }
+            for q, value in zip(qs, self.sketches[measure].quantiles(qs)):
+                summary[measure]['q{0:g}'.format(100 * q)] = value
+        return summary
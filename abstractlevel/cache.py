@@ -0,0 +1,254 @@
+import functools
+import glob
+import hashlib
+import json
+import os
+import random
+import tempfile
+import numpy as np
+
+from typing import Any, Dict, List, Sequence, Union
+
+from .models import Game
+from .simulation import Simulation
+from .streams import RandomStreams
+from .sweep import cell_key, create_game, replicate_seed, summarise
+
+# A run which can be cached
+Runnable = Union[Game, Simulation]
+
+
+@functools.lru_cache(maxsize=None)
+def code_version() -> str:
+    '''Returns a hash of the source code of the abstractlevel package'''
+    digest = hashlib.sha1()
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(__file__), '*.py'))):
+        with open(path, 'rb') as file:
+            digest.update(os.path.basename(path).encode('utf-8'))
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def game_parameters(game: Game) -> Dict[str, Any]:
+    '''Returns every parameter of a Game which affects the results of its runs'''
+    factory = game.monkeyarray_factory
+    return {
+        'type': type(game).__name__,
+        'nmonkeys': game.nmonkeys,
+        'nsignals': game.nsignals,
+        'nstates': game.nstates,
+        'predarray': np.asarray(game.predarray.array, dtype=float).tolist(),
+        'spawn_probabilities': None if game.predarray.spawn_probabilities is None else [
+            float(p) for p in game.predarray.spawn_probabilities],
+        'rep_rate': game.rep_rate,
+        'mut_rate': game.mut_rate,
+        'min_monkeys': game.min_monkeys,
+        'archive_cycle': game.archive_cycle,
+        'archive_loss': game.archive_loss,
+        'delete_only_elderly': game.delete_only_elderly,
+        'immortal': game.immortal,
+        'monkeyarray_factory': getattr(factory, '__qualname__', repr(factory)),
+        'streams': None if game.streams is None else [game.streams.seed, game.streams.replicate],
+    }
+
+
+def simulation_parameters(simulation: Simulation) -> Dict[str, Any]:
+    '''Returns every parameter of a Simulation which affects the results of its runs'''
+    return {
+        'type': type(simulation).__name__,
+        'nmonkeys': simulation.nmonkeys,
+        'rep_rate': simulation.rep_rate,
+        'mut_prob': simulation.mut_prob,
+        'predators': [
+            [pred.id, prob, sorted([int(state), chance] for state, chance in pred.menu.items())]
+            for pred, prob in simulation.predator_dict.items()],
+        'signals': [int(signal) for signal in simulation.signal_list],
+        'states': [int(state) for state in simulation.state_list],
+        'delete_only_elderly': simulation.delete_only_elderly,
+        'archive_cycle': simulation.archive_cycle,
+        'min_monkeys': simulation.min_monkeys,
+    }
+
+
+def run_key(runnable: Runnable, nturns: int, seed: int) -> str:
+    '''Returns the content address of a run: a hash of its parameters, turns, seed and code version'''
+    parameters = (
+        game_parameters(runnable) if isinstance(runnable, Game)
+        else simulation_parameters(runnable))
+    text = json.dumps({
+        'parameters': parameters,
+        'nturns': nturns,
+        'seed': seed,
+        'version': code_version(),
+    }, sort_keys=True)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def run_simulation(simulation: Simulation, nturns: int, seed: int) -> Dict[str, Any]:
+    '''Runs a Simulation from scratch with a seed and returns its measures'''
+    random.seed(seed)
+    simulation.reset_game()
+    simulation.run(nturns)
+    return {
+        'turns': simulation.turn,
+        'nummonkeys': len(simulation.monkey_list),
+        'wordconvention': {
+            str(pred.id): [int(signal) for signal in signals]
+            for pred, signals in simulation.get_wordmap_convention().items()},
+        'actionconvention': {
+            str(int(signal)): [int(state) for state in states]
+            for signal, states in simulation.get_actionmap_convention().items()},
+    }
+
+
+def run_game(game: Game, nturns: int, seed: int) -> Dict[str, Any]:
+    '''Runs a Game from scratch with a seed and returns its measures (see sweep.summarise)'''
+    np.random.seed(seed)
+    game.reset()
+    game.run(nturns)
+    return summarise(game)
+
+
+class ResultCache:
+    '''On-disk store of the measures of Game and Simulation runs
+
+    Every entry is a JSON file named after the run's content address (see
+    run_key), so identical runs from any script or process share it. When
+    the store grows over *max_bytes*, the least recently used entries (by
+    modification time, which is refreshed on every hit) are removed.
+
+    :param path: directory of the store
+    :param max_bytes: maximum size of the entries
+
+    '''
+
+    def __init__(self, path: str = '.runcache', max_bytes: int = 64 * 2 ** 20) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, exist_ok=True)
+        self.nbytes = sum(os.path.getsize(entry) for entry in self.entries())
+
+    def entries(self) -> List[str]:
+        '''Returns the paths of the stored entries'''
+        return glob.glob(os.path.join(self.path, '*', '*.json'))
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key + '.json')
+
+    def get(self, key: str) -> Union[Dict[str, Any], None]:
+        '''Returns the stored measures of a run (None if they are not stored)'''
+        path = self.entry_path(key)
+        try:
+            with open(path) as file:
+                result = json.load(file)
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        '''Stores the measures of a run'''
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            # An entry being overwritten no longer counts
+            oldsize = os.path.getsize(path)
+        except FileNotFoundError:
+            oldsize = 0
+        # Written aside and moved, so readers never see half an entry
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(descriptor, 'w') as file:
+            json.dump(result, file)
+        os.replace(temporary, path)
+        self.nbytes += os.path.getsize(path) - oldsize
+        if self.nbytes > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> None:
+        '''Removes the least recently used entries until the store fits in max_bytes'''
+        entries = []
+        for entry in self.entries():
+            try:
+                stat = os.stat(entry)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        entries.sort()
+        self.nbytes = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if self.nbytes <= self.max_bytes:
+                break
+            try:
+                os.remove(entry)
+            except FileNotFoundError:
+                pass
+            self.nbytes -= size
+
+    def clear(self) -> None:
+        '''Removes every entry'''
+        for entry in self.entries():
+            os.remove(entry)
+        self.nbytes = 0
+
+    def run(self, runnable: Runnable, nturns: int, seed: int) -> Dict[str, Any]:
+        '''Returns the measures of a run, running it only if they are not stored
+
+        The game or simulation is reset and run with np.random (Game) or
+        random (Simulation) seeded with *seed*.
+
+        '''
+        key = run_key(runnable, nturns, seed)
+        result = self.get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+        if isinstance(runnable, Game):
+            result = run_game(runnable, nturns, seed)
+        else:
+            result = run_simulation(runnable, nturns, seed)
+        self.put(key, result)
+        return result
+
+    def replicates(self, runnable: Runnable, nturns: int, seeds: Sequence[int]) -> List[Dict[str, Any]]:
+        '''Returns the measures of a run for every seed (only the missing ones are run)'''
+        return [self.run(runnable, nturns, seed) for seed in seeds]
+
+
+class CachedRunner:
+    '''A Sweep runner which goes through a ResultCache
+
+    Jobs give the same results as sweep.run_replicate, so a sweep can reuse
+    the games of any other sweep or script with the same parameters.
+
+    :param path: directory of the store
+    :param max_bytes: maximum size of the entries
+
+    '''
+
+    def __init__(self, path: str = '.runcache', max_bytes: int = 64 * 2 ** 20) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.cache = None
+
+    def __call__(
+            self,
+            configuration: Dict[str, Any],
+            replicate: int,
+            nturns: int,
+            seed: int,
+            common_random_numbers: bool = False) -> Dict[str, Any]:
+        if self.cache is None:
+            self.cache = ResultCache(self.path, self.max_bytes)
+        if common_random_numbers:
+            game = create_game(configuration, RandomStreams(seed, replicate))
+            cell = '0'
+        else:
+            game = create_game(configuration)
+            cell = cell_key(configuration)
+        return self.cache.run(
+            game,
+            configuration.get('nturns', nturns),
+            replicate_seed(seed, cell, replicate))
@@ -0,0 +1,113 @@
+import sys
+import time
+
+from typing import Callable
+
+
+class GameObserver:
+    '''Receives the events of a game run
+
+    Every hook does nothing by default, so an observer only overrides the
+    events it needs. Observers are passed to a Game with *observers*.
+
+    '''
+
+    def on_start(self, game: 'Game', nturns: int) -> None:
+        '''Called when *game* starts running for (at most) *nturns* turns'''
+
+    def on_milestone(self, game: 'Game') -> None:
+        '''Called every archive_cycle turns, right after the game is measured'''
+
+    def on_loss(self, game: 'Game') -> None:
+        '''Called when there are less than min_monkeys monkeys after a hunt'''
+
+    def on_refill(self, game: 'Game') -> None:
+        '''Called when an immortal population has been refilled after a loss'''
+
+    def on_end(self, game: 'Game') -> None:
+        '''Called when the run ends'''
+
+
+class ProgressBar(GameObserver):
+    '''Prints a bar every archive_cycle turns and a space when the game ends
+
+    :param output: function which writes the text (default writes to stdout)
+
+    '''
+
+    def __init__(self, output: Callable[[str], None] = None) -> None:
+        self.output = output or self.write
+
+    @staticmethod
+    def write(text: str) -> None:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    def on_milestone(self, game: 'Game') -> None:
+        self.output('|')
+
+    def on_end(self, game: 'Game') -> None:
+        self.output(' ')
+
+
+class ProgressReporter(GameObserver):
+    '''Reports the turns per second and the estimated remaining time of a game
+
+    The report is checked at every milestone (every archive_cycle turns) and
+    written at most once every *interval* seconds.
+
+    :param interval: minimum number of seconds between two reports
+    :param output: function which writes a line (default writes to stderr)
+    :param label: text written at the start of every line
+
+    '''
+
+    def __init__(
+            self,
+            interval: float = 10.0,
+            output: Callable[[str], None] = None,
+            label: str = '') -> None:
+        self.interval = interval
+        self.output = output or self.write
+        self.label = label
+        self.nturns = 0
+        self.firstturn = 0
+        self.starttime = 0.0
+        self.lastreport = 0.0
+
+    @staticmethod
+    def write(line: str) -> None:
+        sys.stderr.write(line + '\n')
+
+    def report(self, game: 'Game', now: float) -> None:
+        '''Writes a line with the progress of *game*'''
+        turns = game.turns - self.firstturn
+        rate = turns / max(now - self.starttime, 1e-9)
+        eta = (self.nturns - turns) / rate if rate else float('inf')
+        self.output('{label}turn {turn:d}/{nturns:d}, {rate:.0f} turns/s, eta {eta:.0f} s, {nmonk:d} monkeys, {losses:d} losses'.format(
+            label=self.label,
+            turn=turns,
+            nturns=self.nturns,
+            rate=rate,
+            eta=eta,
+            nmonk=game.monkeyarray.nummonkeys,
+            losses=game.losses))
+        self.lastreport = now
+
+    def on_start(self, game: 'Game', nturns: int) -> None:
+        self.nturns = nturns
+        self.firstturn = game.turns
+        self.starttime = self.lastreport = time.time()
+
+    def on_milestone(self, game: 'Game') -> None:
+        now = time.time()
+        if now - self.lastreport >= self.interval:
+            self.report(game, now)
+
+    def on_end(self, game: 'Game') -> None:
+        now = time.time()
+        self.output('{label}ended after {turns:d} turns ({dur:.2f} s, {rate:.0f} turns/s)'.format(
+            label=self.label,
+            turns=game.turns - self.firstturn,
+            dur=now - self.starttime,
+            rate=(game.turns - self.firstturn) / max(now - self.starttime, 1e-9)))
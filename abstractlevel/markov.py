@@ -0,0 +1,389 @@
+import math
+import numpy as np
+
+from collections import defaultdict, deque
+from scipy import sparse
+from scipy.sparse.linalg import spsolve
+from typing import Dict, Iterator, Sequence, Tuple
+
+from .models import Game, PredArray
+
+# Distribution over count vectors (or over the LOST state, whose key is None)
+Distribution = Dict[Tuple[int, ...], float]
+
+
+def binomial(number: int, k: int, chance: float) -> float:
+    '''Probability of *k* successes in *number* trials with success chance *chance*'''
+    return math.comb(number, k) * chance ** k * (1.0 - chance) ** (number - k)
+
+
+def split(number: int, weights: Sequence[float]) -> Iterator[Tuple[Tuple[int, ...], float]]:
+    '''Yields the ways to draw *number* items with replacement with the given (positive) weights
+
+    Each outcome is a tuple with the number of draws of each weight and its probability.
+
+    '''
+    if len(weights) == 1:
+        yield ((number,), 1.0)
+        return
+    total = sum(weights)
+    for k in range(number + 1):
+        chance = binomial(number, k, min(weights[0] / total, 1.0))
+        if not chance:
+            continue
+        for tail, tailchance in split(number - k, weights[1:]):
+            yield ((k,) + tail, chance * tailchance)
+
+
+def multinomial(number: int, weights: Sequence[float]) -> Distribution:
+    '''Distribution of the counts of *number* draws with replacement with the given weights'''
+    empty = (0,) * len(weights)
+    support = [g for g, weight in enumerate(weights) if weight > 0]
+    if (not number) or (not support):
+        return {empty: 1.0}
+    distribution = {}
+    for counts, chance in split(number, [weights[g] for g in support]):
+        full = list(empty)
+        for g, count in zip(support, counts):
+            full[g] = count
+        distribution[tuple(full)] = chance
+    return distribution
+
+
+def convolve(first: Distribution, second: Distribution) -> Distribution:
+    '''Distribution of the sum of two independent count vectors'''
+    distribution = defaultdict(float)
+    for a, pa in first.items():
+        for b, pb in second.items():
+            distribution[tuple(x + y for x, y in zip(a, b))] += pa * pb
+    return distribution
+
+
+class MarkovChain:
+    '''Exact Markov chain of the Game dynamics over genotype counts
+
+    A state is the number of monkeys of each genotype, where a genotype is a
+    complete pair of maps: genotype g is wordcode + nwords * actioncode, with
+    the wordmap packed as wordcode (base nsignals, see pack_rows) and the
+    actionmap packed as actioncode (base nstates, as MonkeyArray.actioncodes).
+    There are nsignals ** npredators * nstates ** nsignals genotypes, so this is
+    only feasible for small populations and few genotypes.
+
+    A turn follows Game.run_turn: a predator spawns with the predarray's spawn
+    probabilities, a random monkey calls its signal, every monkey survives the
+    hunt independently, losses refill the population (immortal) or end the
+    game, and MonkeyArray.reproduce adds the babies and mutants and culls the
+    population to nmonkeys (the mutants are culled first). The extra state
+    LOST absorbs the games which ended with a loss.
+
+    Only the states reachable from the initial random populations are built.
+    The states, transition matrix and initial distribution are cached per
+    configuration in *operators*, so chains of the same game share them.
+
+    :param nmonkeys: initial and max number of monkeys
+    :param nsignals: number of signals
+    :param nstates: number of states
+    :param predarray: the predators
+    :param rep_rate: rate of reproduction
+    :param mut_rate: chance of random mutation in a generated monkey
+    :param min_monkeys: minimum number of monkeys for the game to continue
+    :param immortal: if True, monkeys reproduce to max population after hitting min_monkeys
+    :param max_states: maximum number of states (a ValueError is raised if there are more)
+
+    '''
+
+    # Cache of built chains: configuration -> (states, transition, initial, lossrate)
+    operators = {}
+
+    def __init__(
+            self,
+            nmonkeys: int,
+            nsignals: int,
+            nstates: int,
+            predarray: PredArray,
+            rep_rate: float,
+            mut_rate: float,
+            min_monkeys: int = 1,
+            immortal: bool = False,
+            max_states: int = 200000) -> None:
+        # Received parameters
+        self.nmonkeys = nmonkeys
+        self.nsignals = nsignals
+        self.nstates = nstates
+        self.predarray = predarray
+        self.rep_rate = rep_rate
+        self.mut_rate = mut_rate
+        self.min_monkeys = min_monkeys
+        self.immortal = immortal
+        self.max_states = max_states
+        # Genotypes
+        npredators = predarray.numpredators
+        self.nwords = nsignals ** npredators
+        self.ngenotypes = self.nwords * nstates ** nsignals
+        genotypes = np.arange(self.ngenotypes)
+        # words[g, p] is the signal for predator p and actions[g, s] the state for signal s
+        self.words = (genotypes[:, np.newaxis] % self.nwords) // (
+            nsignals ** np.arange(npredators)) % nsignals
+        self.actions = (genotypes[:, np.newaxis] // self.nwords) // (
+            nstates ** np.arange(nsignals)) % nstates
+        # survival[p, s, g] is the survival chance of genotype g against predator p after signal s
+        self.survival = predarray.array[:, self.actions.T]
+        self.spawn_probabilities = (
+            np.full(npredators, 1.0 / npredators) if predarray.spawn_probabilities is None
+            else np.asarray(predarray.spawn_probabilities, dtype=float))
+        self.uniform = (1.0,) * self.ngenotypes
+        self.reproductions = {}
+        # Transition structure
+        configuration = self.configuration
+        if configuration not in self.operators:
+            self.operators[configuration] = self.build()
+        self.states, self.transition, self.initial, self.lossrate = self.operators[configuration]
+        self.lost = len(self.states)
+
+    @classmethod
+    def from_game(cls, game: Game, **kwargs) -> 'MarkovChain':
+        '''Returns the chain of the dynamics of *game*'''
+        return cls(
+            nmonkeys=game.nmonkeys,
+            nsignals=game.nsignals,
+            nstates=game.nstates,
+            predarray=game.predarray,
+            rep_rate=game.rep_rate,
+            mut_rate=game.mut_rate,
+            min_monkeys=game.min_monkeys,
+            immortal=game.immortal,
+            **kwargs)
+
+    @property
+    def configuration(self) -> tuple:
+        '''A hashable summary of the parameters which define the chain'''
+        return (
+            self.nmonkeys, self.nsignals, self.nstates, self.predarray.signature,
+            self.rep_rate, self.mut_rate, self.min_monkeys, self.immortal)
+
+    # Construction
+
+    def hunting(self, counts: Tuple[int, ...], pred: int, signal: int) -> Distribution:
+        '''Distribution of the survivors of a hunt'''
+        distribution = {(): 1.0}
+        for count, chance in zip(counts, self.survival[pred, signal]):
+            outcomes = [(k, binomial(count, k, chance)) for k in range(count + 1)]
+            distribution = {
+                survivors + (k, ): p * pk
+                for survivors, p in distribution.items()
+                for k, pk in outcomes if pk}
+        return distribution
+
+    def reproduction(self, counts: Tuple[int, ...]) -> Distribution:
+        '''Distribution of the population after MonkeyArray.reproduce'''
+        if counts not in self.reproductions:
+            nummonkeys = sum(counts)
+            room = self.nmonkeys - nummonkeys
+            normal = int(nummonkeys * (self.rep_rate - 1.0) * (1.0 - self.mut_rate))
+            mutants = int(nummonkeys * (self.rep_rate - 1.0) * self.mut_rate)
+            normal = max(min(normal, room), 0)
+            mutants = max(min(mutants, room - normal), 0)
+            babies = convolve(
+                multinomial(normal, counts), multinomial(mutants, self.uniform))
+            self.reproductions[counts] = convolve({counts: 1.0}, babies)
+        return self.reproductions[counts]
+
+    def refill(self, counts: Tuple[int, ...]) -> Distribution:
+        '''Distribution of the population after reproducing up to nmonkeys (immortal losses)'''
+        done = defaultdict(float)
+        pending = {counts: 1.0}
+        while pending:
+            following = defaultdict(float)
+            for population, p in pending.items():
+                if sum(population) >= self.nmonkeys:
+                    done[population] += p
+                    continue
+                outcomes = self.reproduction(population)
+                if population in outcomes:
+                    raise ValueError(
+                        'a population of {0} monkeys cannot grow back to {1} with rep_rate {2}'.format(
+                            sum(population), self.nmonkeys, self.rep_rate))
+                for nextpopulation, pn in outcomes.items():
+                    following[nextpopulation] += p * pn
+            pending = following
+        return done
+
+    def transitions(self, counts: Tuple[int, ...]) -> Tuple[Distribution, float]:
+        '''Distribution of the state after a turn and chance of a loss in the turn'''
+        distribution = defaultdict(float)
+        loss = 0.0
+        nummonkeys = sum(counts)
+        wordcount = np.zeros((len(self.spawn_probabilities), self.nsignals))
+        for g, count in enumerate(counts):
+            if count:
+                wordcount[np.arange(wordcount.shape[0]), self.words[g]] += count
+        for pred, ppred in enumerate(self.spawn_probabilities):
+            for signal in range(self.nsignals):
+                psignal = ppred * wordcount[pred, signal] / nummonkeys
+                if not psignal:
+                    continue
+                for survivors, phunt in self.hunting(counts, pred, signal).items():
+                    p = psignal * phunt
+                    if self.immortal and not any(survivors):
+                        survivors = counts
+                    if sum(survivors) < self.min_monkeys:
+                        loss += p
+                        if not self.immortal:
+                            distribution[None] += p
+                            continue
+                        outcomes = self.refill(survivors)
+                    else:
+                        outcomes = {survivors: 1.0}
+                    for population, po in outcomes.items():
+                        for nextpopulation, pn in self.reproduction(population).items():
+                            distribution[nextpopulation] += p * po * pn
+        return (distribution, loss)
+
+    def build(self) -> Tuple[np.ndarray, sparse.csr_matrix, np.ndarray, np.ndarray]:
+        '''Builds the states reachable from the initial populations and their transitions'''
+        initial = multinomial(self.nmonkeys, self.uniform)
+        index = {}
+        rows, columns, values, losses = [], [], [], []
+        queue = deque()
+        for counts in initial:
+            index[counts] = len(index)
+            queue.append(counts)
+        while queue:
+            counts = queue.popleft()
+            distribution, loss = self.transitions(counts)
+            losses.append(loss)
+            for nextcounts, p in distribution.items():
+                if (nextcounts is not None) and (nextcounts not in index):
+                    if len(index) >= self.max_states:
+                        raise ValueError('the chain has more than {0} states'.format(
+                            self.max_states))
+                    index[nextcounts] = len(index)
+                    queue.append(nextcounts)
+                rows.append(index[counts])
+                columns.append(-1 if nextcounts is None else index[nextcounts])
+                values.append(p)
+        self.reproductions = {}
+        lost = len(index)
+        columns = np.where(np.array(columns, dtype=np.int64) < 0, lost, columns)
+        rows.append(lost)
+        columns = np.append(columns, lost)
+        values.append(1.0)
+        transition = sparse.csr_matrix(
+            (values, (rows, columns)), shape=(lost + 1, lost + 1))
+        states = np.zeros((lost, self.ngenotypes), dtype=np.int64)
+        for counts, i in index.items():
+            states[i] = counts
+        initialvector = np.zeros(lost + 1)
+        for counts, p in initial.items():
+            initialvector[index[counts]] = p
+        return (states, transition, initialvector, np.append(losses, 0.0))
+
+    # States
+
+    @property
+    def nummonkeys(self) -> np.ndarray:
+        '''Number of monkeys in each state (0 in LOST)'''
+        return np.append(self.states.sum(axis=1), 0)
+
+    @property
+    def learnedstates(self) -> np.ndarray:
+        '''Boolean array, True for the states in which the strategy convention is optimal'''
+        npredators = self.words.shape[1]
+        wordcount = np.stack([
+            np.stack([self.states[:, self.words[:, p] == s].sum(axis=1)
+                      for s in range(self.nsignals)], axis=1)
+            for p in range(npredators)], axis=1)
+        actioncount = np.stack([
+            np.stack([self.states[:, self.actions[:, s] == a].sum(axis=1)
+                      for a in range(self.nstates)], axis=1)
+            for s in range(self.nsignals)], axis=1)
+        wordconvention = np.argmax(wordcount, axis=2)
+        actionconvention = np.argmax(actioncount, axis=2)
+        strategyconvention = np.take_along_axis(actionconvention, wordconvention, axis=1)
+        learned = np.all(strategyconvention == self.predarray.survivalstates, axis=1)
+        return np.append(learned, False)
+
+    # Analysis
+
+    def distribution(self, nturns: int, initial: np.ndarray = None) -> np.ndarray:
+        '''Returns the distribution of the state after *nturns* turns (default starts from random populations)'''
+        distribution = self.initial if initial is None else initial
+        transposed = self.transition.T.tocsr()
+        for _ in range(nturns):
+            distribution = transposed @ distribution
+        return distribution
+
+    def reaching(self, targets: np.ndarray) -> np.ndarray:
+        '''Returns True for the states from which some target can be reached'''
+        reached = targets.copy()
+        while True:
+            following = reached | (self.transition @ reached.astype(float) > 0)
+            if np.array_equal(following, reached):
+                return reached
+            reached = following
+
+    def absorption_probabilities(self, targets: np.ndarray) -> np.ndarray:
+        '''Returns the chance of ever reaching the *targets* from each state
+
+        LOST is absorbing, so unless it is a target this is the chance of
+        reaching the targets before a loss ends the game.
+
+        :param targets: boolean array with a value per state (LOST included)
+
+        '''
+        probabilities = targets.astype(float)
+        transient = self.reaching(targets) & ~targets
+        if np.any(transient):
+            step = self.transition[transient][:, transient]
+            identity = sparse.identity(step.shape[0], format='csr')
+            gain = self.transition[transient][:, targets] @ np.ones(np.count_nonzero(targets))
+            probabilities[transient] = np.atleast_1d(spsolve((identity - step).tocsc(), gain))
+        return probabilities
+
+    def expected_times(self, targets: np.ndarray) -> np.ndarray:
+        '''Returns the expected number of turns until reaching the *targets* or LOST from each state
+
+        The time is infinite where some game never reaches them.
+
+        '''
+        absorbing = targets.copy()
+        absorbing[self.lost] = True
+        certain = self.absorption_probabilities(absorbing) > 1.0 - 1e-9
+        times = np.where(certain, 0.0, np.inf)
+        transient = certain & ~absorbing
+        if np.any(transient):
+            step = self.transition[transient][:, transient]
+            identity = sparse.identity(step.shape[0], format='csr')
+            times[transient] = np.atleast_1d(spsolve(
+                (identity - step).tocsc(), np.ones(step.shape[0])))
+        return times
+
+    def learning_probability(self) -> float:
+        '''Chance that random initial monkeys learn the optimal convention before a loss ends the game'''
+        return float(self.initial @ self.absorption_probabilities(self.learnedstates))
+
+    def expected_learning_time(self) -> float:
+        '''Expected number of turns until random initial monkeys learn or lose the game'''
+        return float(self.initial @ self.expected_times(self.learnedstates))
+
+    def learned_probability(self, nturns: int) -> float:
+        '''Chance that the monkeys have the optimal convention after *nturns* turns'''
+        return float(self.distribution(nturns)[self.learnedstates].sum())
+
+    def loss_probability(self, nturns: int = None) -> float:
+        '''Chance that a game (not immortal) ended with a loss within *nturns* turns (default is eventually)'''
+        if nturns is None:
+            lost = np.zeros(self.lost + 1, dtype=bool)
+            lost[self.lost] = True
+            return float(self.initial @ self.absorption_probabilities(lost))
+        return float(self.distribution(nturns)[self.lost])
+
+    def expected_losses(self, nturns: int) -> float:
+        '''Expected number of losses in *nturns* turns (for immortal games, where losses do not end the game)'''
+        distribution = self.initial
+        transposed = self.transition.T.tocsr()
+        losses = 0.0
+        for _ in range(nturns):
+            losses += distribution @ self.lossrate
+            distribution = transposed @ distribution
+        return float(losses)
@@ -1,10 +1,18 @@
+import copy
 import numpy as np
 import random
 import time
 
-from typing import Tuple, List, Dict, Any, Union
+from collections import deque
+from itertools import chain
+from operator import attrgetter, itemgetter
+from typing import Tuple, List, Dict, Any, Union, Callable, Sequence
 
-from .utilities import shuffle_along_axis
+from .events import GameObserver
+from .streams import (
+    RandomStreams, KeyedDraws, genotype_keys, genotype_ranks,
+    CREATE, SPAWN, WITNESS, HUNT, REPRODUCE, REFILL)
+from .utilities import shuffle_along_axis, onehot, pack_rows, paused_gc, memoised
 
 
 class MonkeySignal(int):
@@ -245,6 +253,9 @@ class PredArray:
 
     '''
 
+    # Largest number of genotypes (nstates ** nsignals) for a survival table
+    max_table_genotypes = 2 ** 16
+
     def __init__(
             self,
             array: List[List[float]] = None,
@@ -271,6 +282,9 @@ class PredArray:
             self.array = arr
         self.spawn_probabilities = spawn_probabilities
         self.validate()
+        # Survival tables (see survivaltable)
+        self.survivaltables = {}
+        self.survivaltablesource = None
 
     def validate(self) -> None:
         '''Validates the array and spawn probabilities'''
@@ -307,6 +321,15 @@ class PredArray:
         '''Returns the survival states of each predator'''
         return np.argmax(self.array, axis=1)
 
+    @property
+    def signature(self) -> tuple:
+        '''A hashable summary of the array and spawn probabilities (see memoised)'''
+        spawn = self.spawn_probabilities
+        return (
+            self.array.shape,
+            self.array.tobytes(),
+            tuple(spawn) if spawn is not None else None)
+
     def to_predator_list(self, state_list=None) -> List[Predator]:
         '''Converts the object to a list of Predator objects
 
@@ -326,14 +349,77 @@ class PredArray:
             predator_list.append(Predator(menu, id=p))
         return predator_list
 
-    def spawn(self) -> int:
-        '''Spawns a predator, which is a row index'''
-        return np.random.choice(self.numpredators, p=self.spawn_probabilities)
+    def spawn(self, rng: np.random.Generator = None) -> int:
+        '''Spawns a predator, which is a row index (drawn from *rng* if given, else from np.random)'''
+        if rng is None:
+            return np.random.choice(self.numpredators, p=self.spawn_probabilities)
+        return int(rng.choice(self.numpredators, p=self.spawn_probabilities))
+
+    @staticmethod
+    def uniforms(number: int, rng: np.random.Generator = None) -> np.ndarray:
+        '''Returns *number* uniforms in [0, 1) from *rng* if given, else from np.random'''
+        return np.random.rand(number) if rng is None else rng.random(number)
 
-    def hunt(self, pred: int, monkeystates: np.ndarray) -> np.ndarray:
+    def hunt(
+            self,
+            pred: int,
+            monkeystates: np.ndarray,
+            rng: np.random.Generator = None) -> np.ndarray:
         '''Returns the surviving indexes of a monkey state array'''
         survivalchances = np.matmul(monkeystates, self.array[pred, :])
-        survived = (survivalchances > np.random.rand(len(survivalchances)))
+        survived = (survivalchances > self.uniforms(len(survivalchances), rng))
+        return np.where(survived)[0]
+
+    def survivaltable(self, nsignals: int) -> Union[np.ndarray, None]:
+        '''Returns the survival table for monkeys with *nsignals* signals
+
+        The result is an array T, where T[p, s, g] is the survival chance against
+        predator p of a monkey with genotype g which heard signal s. The genotype
+        is the monkey's actionmap packed as an integer, i.e. the sum of
+        a[s] * numstates ** s, where a[s] is the index of the state linked to
+        signal s (see MonkeyArray.actioncodes). Tables are rebuilt only when the
+        array changes. Returns None if there are more than max_table_genotypes
+        genotypes.
+
+        :param nsignals: number of signals
+        :returns: the survival table
+
+        '''
+        if (self.survivaltablesource is None) or (not np.array_equal(
+                self.array, self.survivaltablesource)):
+            self.survivaltables = {}
+            self.survivaltablesource = self.array.copy()
+        if nsignals not in self.survivaltables:
+            ngenotypes = self.numstates ** nsignals
+            if ngenotypes > self.max_table_genotypes:
+                self.survivaltables[nsignals] = None
+            else:
+                digits = np.arange(ngenotypes).reshape(1, -1) // (
+                    self.numstates ** np.arange(nsignals).reshape(-1, 1))
+                self.survivaltables[nsignals] = self.array[
+                    :, digits % self.numstates]
+        return self.survivaltables[nsignals]
+
+    def hunt_genotypes(
+            self,
+            pred: int,
+            signal: int,
+            genotypes: np.ndarray,
+            nsignals: int,
+            rng: np.random.Generator = None) -> np.ndarray:
+        '''Returns the surviving indexes of a monkey genotype array
+
+        :param pred: index of the predator
+        :param signal: index of the heard signal
+        :param genotypes: packed actionmap of each monkey (see survivaltable)
+        :param nsignals: number of signals
+        :param rng: generator of the survival uniforms (default is np.random)
+        :returns: the indexes of the surviving monkeys
+
+        '''
+        survivalchances = self.survivaltable(
+            nsignals)[pred, signal].take(genotypes)
+        survived = (survivalchances > self.uniforms(len(survivalchances), rng))
         return np.where(survived)[0]
 
 
@@ -413,35 +499,8 @@ class MonkeyArray:
                 axis=2)
         elif monkey_list:
             # Third method
-            # Step 1: Initialize lists
-            predator_list = set()
-            signal_list = set()
-            state_list = set()
-            for mk in monkey_list:
-                for predator in mk.wordmap:
-                    predator_list.add(predator)
-                for signal, action in mk.actionmap.items():
-                    signal_list.add(signal)
-                    state_list.add(action)
-            predator_list = list(predator_list)
-            signal_list = list(signal_list)
-            state_list = list(state_list)
-            # Step 2: construct arrays
-            wordarray = []
-            actionarray = []
-            for mk in monkey_list:
-                wordmatrix = np.zeros((len(predator_list), len(signal_list)))
-                actionmatrix = np.zeros((len(signal_list), len(state_list)))
-                for predator, signal in mk.wordmap.items():
-                    wordmatrix[predator_list.index(
-                        predator), signal_list.index(signal)] = 1.0
-                for signal, action in mk.actionmap.items():
-                    actionmatrix[signal_list.index(
-                        signal), state_list.index(action)] = 1.0
-                wordarray.append(wordmatrix)
-                actionarray.append(actionmatrix)
-            self.wordarray = np.stack(wordarray, axis=0)
-            self.actionarray = np.stack(actionarray, axis=0)
+            self.wordarray, self.actionarray = self.encode_monkey_list(
+                monkey_list)
         else:
             raise ValueError(
                 'not enough arguments for MonkeyArray initialization were given')
@@ -483,6 +542,45 @@ class MonkeyArray:
                 raise ValueError(
                     'actionarray does not fulfill the uniqueness condition for an actionmap')
 
+    # Incremented whenever the monkeys change (the statistics are memoised on it)
+    version = 0
+
+    @property
+    def wordarray(self) -> np.ndarray:
+        '''The array representing the monkey's word behaviour'''
+        return self._wordarray
+
+    @wordarray.setter
+    def wordarray(self, wordarray: np.ndarray) -> None:
+        self._wordarray = wordarray
+        self.version += 1
+
+    @property
+    def actionarray(self) -> np.ndarray:
+        '''The array representing the monkey's action behaviour'''
+        return self._actionarray
+
+    @actionarray.setter
+    def actionarray(self, actionarray: np.ndarray) -> None:
+        self._actionarray = actionarray
+        self._actioncodes = None
+        self.version += 1
+
+    @property
+    def actioncodes(self) -> Union[np.ndarray, None]:
+        '''Returns the actionmap of each monkey packed as an integer (its genotype)
+
+        The result is an array G, where G[m] is the sum of a[s] * numstates ** s
+        and a[s] is the index of the state linked to signal s by monkey m. The
+        codes are kept up to date by survive, concatenate and reproduce. Returns
+        None if the codes do not fit in an int64.
+
+        '''
+        if self._actioncodes is None:
+            self._actioncodes = pack_rows(
+                np.argmax(self.actionarray, axis=2), self.numstates)
+        return self._actioncodes
+
     @property
     def shape(self) -> Tuple[Tuple[int]]:
         '''The combined shape of the wordarray and actionarray'''
@@ -515,6 +613,7 @@ class MonkeyArray:
         return self.actionarray.shape[2]
 
     @property
+    @memoised
     def wordcount(self) -> np.ndarray:
         '''Counts how many mappings of a signal there are for each predator
 
@@ -525,6 +624,7 @@ class MonkeyArray:
         return np.sum(self.wordarray, axis=0)
 
     @property
+    @memoised
     def wordchances(self) -> np.ndarray:
         '''Measures the probability of a signal for each predator
 
@@ -535,6 +635,7 @@ class MonkeyArray:
         return self.wordcount / self.nummonkeys
 
     @property
+    @memoised
     def wordconvention(self) -> np.ndarray:
         '''Returns the word convention for each predator
 
@@ -545,6 +646,7 @@ class MonkeyArray:
         return np.argmax(self.wordcount, axis=1)
 
     @property
+    @memoised
     def actioncount(self) -> np.ndarray:
         '''Counts how many mappings of an action/state there are for each signal
 
@@ -555,6 +657,7 @@ class MonkeyArray:
         return np.sum(self.actionarray, axis=0)
 
     @property
+    @memoised
     def actionchances(self) -> np.ndarray:
         '''Counts how many mappings of an action/state there are for each signal
 
@@ -565,6 +668,7 @@ class MonkeyArray:
         return self.actioncount / self.nummonkeys
 
     @property
+    @memoised
     def actionconvention(self) -> np.ndarray:
         '''Returns the action convention for each signal
 
@@ -575,6 +679,7 @@ class MonkeyArray:
         return np.argmax(self.actioncount, axis=1)
 
     @property
+    @memoised
     def strategychance(self) -> np.ndarray:
         '''Returns the composite action convention probabilities for each predator
 
@@ -585,6 +690,7 @@ class MonkeyArray:
         return np.matmul(self.wordchances, self.actionchances)
 
     @property
+    @memoised
     def strategyconvention(self) -> np.ndarray:
         '''Returns the composite convention for each predator
 
@@ -594,6 +700,7 @@ class MonkeyArray:
         '''
         return self.actionconvention[self.wordconvention]
 
+    @memoised
     def survivalchances(self, predarray: PredArray) -> np.ndarray:
         '''Returns the survival chance for each predator
 
@@ -607,6 +714,7 @@ class MonkeyArray:
                 self.strategychance),
             axis=1)
 
+    @memoised
     def overallsurvivalchance(self, predarray: PredArray) -> np.ndarray:
         '''Returns the overall survival chance
 
@@ -622,6 +730,7 @@ class MonkeyArray:
                         predarray.spawn_probabilities)))
         return np.mean(self.survivalchances(predarray))
 
+    @memoised
     def optimalagainst(self, predarray: PredArray) -> np.ndarray:
         '''Returns the predators against which the whole monkey population is well-equiped
         in terms of their wordmap and actionmap conventions.
@@ -630,6 +739,7 @@ class MonkeyArray:
         wellequiped = (self.strategyconvention == predarray.survivalstates)
         return np.where(wellequiped)[0]
 
+    @memoised
     def learned(self, predarray: PredArray) -> bool:
         '''Returns True if the monkey's convention for each predator is the
         same as the predator's optimal response.
@@ -637,6 +747,7 @@ class MonkeyArray:
         '''
         return np.all(self.strategyconvention == predarray.survivalstates)
 
+    @memoised
     def optimalchance(self, predarray: PredArray) -> np.ndarray:
         '''Returns the overall chance of scoring the best response against each predator
 
@@ -656,20 +767,52 @@ class MonkeyArray:
             raise ValueError(
                 'the concatendated arrays must have the same predator-state shape! actual is {0}, concatenated is {1}'.format(
                     self.shape, other.shape))
+        actioncodes = self._actioncodes
         self.wordarray = np.concatenate(
             (self.wordarray, other.wordarray), axis=0)
         self.actionarray = np.concatenate(
             (self.actionarray, other.actionarray), axis=0)
+        if (actioncodes is not None) and (other.actioncodes is not None):
+            self._actioncodes = np.concatenate(
+                (actioncodes, other.actioncodes))
+
+    def copy(self) -> 'MonkeyArray':
+        '''Returns a copy of the monkeys which changes independently of the original
 
-    def create_monkeys(self, number: int) -> None:
-        '''Creates *number* new monkeys'''
-        added_monkeys = type(self)(
-            npredators=self.numpredators,
-            nsignals=self.numsignals,
-            nstates=self.numstates,
-            nmonkeys=number)
+        The arrays are shared, since they are replaced (never changed in place)
+        whenever the monkeys change, so copying costs no memory until then.
+
+        '''
+        clone = copy.copy(self)
+        clone.__dict__.pop('_memo', None)
+        return clone
+
+    def create_monkeys(self, number: int, rng: np.random.Generator = None) -> None:
+        '''Creates *number* new monkeys (with maps drawn from *rng* if given, else from np.random)'''
+        if rng is None:
+            added_monkeys = type(self)(
+                npredators=self.numpredators,
+                nsignals=self.numsignals,
+                nstates=self.numstates,
+                nmonkeys=number)
+        else:
+            added_monkeys = type(self)(
+                wordarray=onehot(rng.integers(
+                    self.numsignals, size=(number, self.numpredators)), self.numsignals),
+                actionarray=onehot(rng.integers(
+                    self.numstates, size=(number, self.numsignals)), self.numstates))
         self.concatenate(added_monkeys)
 
+    def indexes(self) -> Tuple[np.ndarray, np.ndarray]:
+        '''Returns the maps as arrays W, A, where W[m, p] is the signal of monkey m for predator p and A[m, s] its state for signal s'''
+        return (np.argmax(self.wordarray, axis=2), np.argmax(self.actionarray, axis=2))
+
+    def add_monkeys(self, wordindex: np.ndarray, actionindex: np.ndarray) -> None:
+        '''Adds monkeys with the maps of some index arrays (see indexes)'''
+        self.concatenate(type(self)(
+            wordarray=onehot(wordindex, self.numsignals),
+            actionarray=onehot(actionindex, self.numstates)))
+
     def get_monkey(self, m: int) -> Tuple[np.ndarray, np.ndarray]:
         '''Gets the monkey of index *m*'''
         return (self.wordarray[m], self.actionarray[m])
@@ -682,6 +825,97 @@ class MonkeyArray:
         '''Every monkey does its action corresponding to the signal at index *heardsignal*'''
         return self.actionarray[:, heardsignal, :]
 
+    @staticmethod
+    def encode_maps(maps: List[dict], keys: list, values: list) -> np.ndarray:
+        '''Encodes a list of maps into an index array
+
+        Maps that are the same object (e.g. a wordmap shared between a teacher and
+        its babies) are only encoded once.
+
+        :param maps: list of dicts from *keys* to *values*
+        :param keys: ordered list of keys
+        :param values: ordered list of values
+        :returns: an array I, where I[m, k] is the index in *values* of maps[m][keys[k]]
+
+        '''
+        value_index = {value: i for i, value in enumerate(values)}
+        ids = np.fromiter(map(id, maps), dtype=np.uint64, count=len(maps))
+        _, first, inverse = np.unique(
+            ids, return_index=True, return_inverse=True)
+        getter = itemgetter(*keys) if len(keys) > 1 else (
+            lambda mp: (mp[keys[0]],))
+        try:
+            unique = np.fromiter(
+                map(value_index.__getitem__, chain.from_iterable(
+                    map(getter, map(maps.__getitem__, first)))),
+                dtype=np.int64,
+                count=len(first) * len(keys))
+        except KeyError as error:
+            raise ValueError(
+                'map entry {0} is not in the given lists'.format(error))
+        return unique.reshape(len(first), len(keys))[inverse.reshape(-1)]
+
+    @staticmethod
+    def encode_monkey_list(
+            monkey_list: List[Monkey],
+            predator_list: List[Predator] = None,
+            signal_list: List[MonkeySignal] = None,
+            state_list: List[MonkeyState] = None) -> Tuple[np.ndarray, np.ndarray]:
+        '''Encodes a list of Monkey objects into a wordarray and an actionarray
+
+        If the lists are not given, they are gathered from the monkey maps and
+        sorted (predators by id).
+
+        :param monkey_list: list of monkeys
+        :param predator_list: list of predators (optional)
+        :param signal_list: list of signals (optional)
+        :param state_list: list of states (optional)
+        :returns: the wordarray and the actionarray
+
+        '''
+        wordmaps = list(map(attrgetter('wordmap'), monkey_list))
+        actionmaps = list(map(attrgetter('actionmap'), monkey_list))
+        if not predator_list:
+            predator_list = sorted(
+                set().union(*{id(mp): mp for mp in wordmaps}.values()),
+                key=attrgetter('id'))
+        if not signal_list:
+            signal_list = sorted(
+                set().union(*{id(mp): mp for mp in actionmaps}.values()))
+        if not state_list:
+            state_list = sorted(
+                set().union(*({id(mp): mp.values() for mp in actionmaps}.values())))
+        wordindex = MonkeyArray.encode_maps(
+            wordmaps, predator_list, signal_list)
+        actionindex = MonkeyArray.encode_maps(
+            actionmaps, signal_list, state_list)
+        return (
+            onehot(wordindex, len(signal_list)),
+            onehot(actionindex, len(state_list)))
+
+    @classmethod
+    def from_monkey_list(
+            cls,
+            monkey_list: List[Monkey],
+            predator_list: List[Predator] = None,
+            signal_list: List[MonkeySignal] = None,
+            state_list: List[MonkeyState] = None) -> 'MonkeyArray':
+        '''Creates a MonkeyArray from a list of Monkey objects
+
+        Passing the lists fixes the predator, signal and state indexes (e.g. so
+        that they match the rows and columns of a PredArray).
+
+        :param monkey_list: list of monkeys
+        :param predator_list: list of predators (optional)
+        :param signal_list: list of signals (optional)
+        :param state_list: list of states (optional)
+        :returns: the MonkeyArray
+
+        '''
+        wordarray, actionarray = cls.encode_monkey_list(
+            monkey_list, predator_list, signal_list, state_list)
+        return cls(wordarray=wordarray, actionarray=actionarray)
+
     def to_monkey_list(
             self,
             predator_list: List[Predator],
@@ -689,6 +923,8 @@ class MonkeyArray:
             state_list: List[MonkeyState] = None) -> List[Monkey]:
         '''Converts the object to a list of Monkey objects
 
+        Monkeys with the same wordmap (or actionmap) share the same dict.
+
         :param predator_list: list of predators
         :param signals_list: list of signals (optional)
         :param state_list: list of states (optional)
@@ -703,21 +939,41 @@ class MonkeyArray:
             state_list = []
             for i in range(self.numstates):
                 state_list.append(MonkeyState(i))
-        monkey_list = []
-        for m in range(self.nummonkeys):
-            mwa, maa = self.get_monkey(m)
-            wordmap = {}
-            for p in range(mwa.shape[0]):
-                wordmap[predator_list[p]] = signal_list[np.argmax(mwa[p])]
-            actionmap = {}
-            for s in range(maa.shape[0]):
-                actionmap[signal_list[s]] = state_list[np.argmax(maa[s])]
-            monkey_list.append(
-                Monkey(
-                    id=m,
-                    wordmap=wordmap,
-                    actionmap=actionmap))
-        return monkey_list
+        if not self.nummonkeys:
+            return []
+        with paused_gc():
+            wordmaps = self.decode_maps(
+                np.argmax(self.wordarray, axis=2),
+                predator_list[:self.numpredators],
+                signal_list)
+            actionmaps = self.decode_maps(
+                np.argmax(self.actionarray, axis=2),
+                signal_list[:self.numsignals],
+                state_list)
+            return [Monkey(m, None, None, None, wordmap, actionmap)
+                    for m, wordmap, actionmap in zip(
+                        range(self.nummonkeys), wordmaps, actionmaps)]
+
+    @staticmethod
+    def decode_maps(index: np.ndarray, keys: list, values: list) -> List[dict]:
+        '''Decodes an index array into a list of (interned) maps
+
+        :param index: an array I, where I[m, k] is the index in *values* of the value of keys[k]
+        :param keys: ordered list of keys
+        :param values: ordered list of values
+        :returns: list of maps, where equal rows of *index* share the same dict
+
+        '''
+        codes = pack_rows(index, len(values))
+        if codes is None:
+            unique, inverse = np.unique(index, axis=0, return_inverse=True)
+        else:
+            _, first, inverse = np.unique(
+                codes, return_index=True, return_inverse=True)
+            unique = index[first]
+        maps = [dict(zip(keys, map(values.__getitem__, row)))
+                for row in unique.tolist()]
+        return list(map(maps.__getitem__, inverse.reshape(-1).tolist()))
 
     def witness(self, pred: int) -> int:
         '''Simulates wittnessing phase for predator of index *pred*
@@ -730,37 +986,170 @@ class MonkeyArray:
         signal = np.argmax(self.wordarray[monkey, pred, :])
         return self.actionarray[:, signal, :]
 
+    def witness_signal(self, pred: int, rng: np.random.Generator = None) -> int:
+        '''Simulates wittnessing phase for predator of index *pred*
+
+        :param pred: index of predator in wordarray
+        :param rng: generator of the random pick (default is np.random)
+        :returns: the index of a random monkey's signal for *pred*
+
+        '''
+        if rng is None:
+            monkey = np.random.choice(self.nummonkeys)
+        else:
+            monkey = rng.integers(self.nummonkeys)
+        return np.argmax(self.wordarray[monkey, pred, :])
+
+    def hunt(
+            self,
+            predarray: PredArray,
+            pred: int,
+            signal: int,
+            immortal: bool = False,
+            rng: np.random.Generator = None) -> None:
+        '''Simulates the hunting phase for predator of index *pred*
+
+        If the predarray has a survival table for these monkeys, each monkey's
+        survival chance is looked up from its genotype (see actioncodes).
+
+        :param predarray: the predators
+        :param pred: index of the predator
+        :param signal: index of the heard signal
+        :param immortal: if True, no monkey is eliminated when none survives
+        :param rng: generator of the survival uniforms (default is np.random)
+
+        '''
+        actioncodes = self.actioncodes
+        if (actioncodes is None) or (
+                predarray.survivaltable(self.numsignals) is None):
+            survivors = predarray.hunt(pred, self.interpret(signal), rng)
+        else:
+            survivors = predarray.hunt_genotypes(
+                pred, signal, actioncodes, self.numsignals, rng)
+        self.survive(survivors, immortal)
+
     def survive(self, surviving_list: list, immortal: bool = False) -> None:
         '''Eliminates monkeys who did not survive a predator attack'''
         if (len(surviving_list) == 0) and immortal:
             return
+        actioncodes = self._actioncodes
         self.wordarray = self.wordarray[surviving_list]
         self.actionarray = self.actionarray[surviving_list]
+        if actioncodes is not None:
+            self._actioncodes = actioncodes[surviving_list]
 
     def reproduce(
             self,
             rep_rate: float,
             mut_rate: float,
-            max_monkeys: int = np.inf) -> None:
+            max_monkeys: int = np.inf,
+            rng: np.random.Generator = None) -> None:
         '''Simulates the reporduction phase
 
         :param rep_rate: proportion of monkeys in the next generation relative to the current one
         :param mut_rate: proportion of new monkeys with wordmap/actionmap mutations
+        :param rng: generator of the teachers and mutants (default is np.random)
 
         '''
         number__no_mutation = int(
             self.nummonkeys * (rep_rate - 1.0) * (1.0 - mut_rate))
-        choice__no_mutation = np.random.choice(
-            self.nummonkeys, size=number__no_mutation)
+        if rng is None:
+            choice__no_mutation = np.random.choice(
+                self.nummonkeys, size=number__no_mutation)
+        else:
+            choice__no_mutation = rng.integers(
+                self.nummonkeys, size=number__no_mutation)
         number__mutation = int(self.nummonkeys * (rep_rate - 1.0) * mut_rate)
         normalbabies = type(self)(
             wordarray=self.wordarray[choice__no_mutation],
             actionarray=self.actionarray[choice__no_mutation])
+        if self._actioncodes is not None:
+            normalbabies._actioncodes = self._actioncodes[choice__no_mutation]
         self.concatenate(normalbabies)
-        self.create_monkeys(number__mutation)
+        self.create_monkeys(number__mutation, rng)
         if self.nummonkeys > max_monkeys:
+            actioncodes = self._actioncodes
             self.wordarray = self.wordarray[:max_monkeys]
             self.actionarray = self.actionarray[:max_monkeys]
+            if actioncodes is not None:
+                self._actioncodes = actioncodes[:max_monkeys]
+
+    # Phases with keyed draws (common random numbers, see streams.KeyedDraws)
+
+    def create_keyed_monkeys(self, number: int, draws: KeyedDraws, key: int = 0) -> None:
+        '''Creates *number* new monkeys whose maps are keyed by their number and gene
+
+        :param key: first key of the draws of the signals (the states use key + 1)
+
+        '''
+        monkeys = np.arange(number).reshape(-1, 1)
+        self.add_monkeys(
+            draws.integers(self.numsignals, key, monkeys, np.arange(self.numpredators)),
+            draws.integers(self.numstates, key + 1, monkeys, np.arange(self.numsignals)))
+
+    def keyed_witness_signal(self, pred: int, draws: KeyedDraws) -> int:
+        '''Simulates the witnessing phase for predator of index *pred* with a keyed uniform
+
+        The signal is picked by inverse CDF over the number of monkeys with
+        each signal for *pred*, so populations with similar counts hear the
+        same signal for the same uniform.
+
+        :returns: the index of a random monkey's signal for *pred*
+
+        '''
+        counts = np.cumsum(self.wordcount[pred])
+        signal = np.searchsorted(counts, draws.uniforms(0) * counts[-1], side='right')
+        return int(min(signal, self.numsignals - 1))
+
+    def keyed_hunt(
+            self,
+            predarray: PredArray,
+            pred: int,
+            signal: int,
+            draws: KeyedDraws,
+            immortal: bool = False) -> None:
+        '''Simulates the hunting phase with survival uniforms keyed by genotype
+
+        The uniform of a monkey is keyed by its maps and by the number of
+        monkeys with the same maps before it, so a genotype with n monkeys
+        has the same survivors in any population with at least n of them.
+
+        '''
+        wordindex, actionindex = self.indexes()
+        keys = genotype_keys(wordindex, actionindex)
+        survivalchances = predarray.array[pred].take(actionindex[:, signal])
+        survived = survivalchances > draws.uniforms(keys, genotype_ranks(keys))
+        self.survive(np.nonzero(survived)[0], immortal)
+
+    def keyed_reproduce(
+            self,
+            rep_rate: float,
+            mut_rate: float,
+            draws: KeyedDraws,
+            max_monkeys: int = np.inf) -> None:
+        '''Simulates the reproduction phase with keyed teachers and mutants
+
+        The teachers are picked by KeyedDraws.choices keyed by genotype and
+        rank (see keyed_hunt), so similar populations mostly teach the same
+        maps. The maps of the mutant number b are keyed by b. Babies which
+        would be eliminated for exceeding *max_monkeys* are not created.
+
+        '''
+        if self.nummonkeys > max_monkeys:
+            self.survive(np.arange(int(max_monkeys)))
+        nmonkeys = self.nummonkeys
+        number__no_mutation = int(
+            nmonkeys * (rep_rate - 1.0) * (1.0 - mut_rate))
+        number__mutation = int(nmonkeys * (rep_rate - 1.0) * mut_rate)
+        room = max(max_monkeys - nmonkeys, 0)
+        number__no_mutation = int(min(number__no_mutation, room))
+        number__mutation = int(min(number__mutation, room - number__no_mutation))
+        if number__no_mutation:
+            wordindex, actionindex = self.indexes()
+            keys = genotype_keys(wordindex, actionindex)
+            teachers = draws.choices(number__no_mutation, keys, genotype_ranks(keys))
+            self.add_monkeys(wordindex[teachers], actionindex[teachers])
+        self.create_keyed_monkeys(number__mutation, draws, key=1)
 
 
 class Game:
@@ -778,6 +1167,9 @@ class Game:
     :param archive_maps: if True, monkey maps are archived along with the gamestate
     :param archive_loss: if True, game will archive every loss
     :param immortal: if True, monkeys are allowed to reproduce to max population after hitting minmonkeys
+    :param monkeyarray_factory: callable which creates the monkeys given npredators, nsignals, nstates and nmonkeys (default is MonkeyArray)
+    :param observers: list of GameObserver objects which receive the events of the runs
+    :param streams: RandomStreams from which every random number is drawn, keyed by turn and purpose (default is np.random)
 
     '''
 
@@ -794,7 +1186,10 @@ class Game:
             delete_only_elderly: bool = False,
             archive_maps: bool = False,
             archive_loss: bool = False,
-            immortal: bool = False):
+            immortal: bool = False,
+            monkeyarray_factory: Callable[..., MonkeyArray] = None,
+            observers: List[GameObserver] = None,
+            streams: RandomStreams = None):
         # Received parameters
         self.nmonkeys = nmonkeys
         self.nsignals = nsignals
@@ -808,17 +1203,18 @@ class Game:
         self.archive_maps = archive_maps
         self.archive_loss = archive_loss
         self.immortal = immortal
+        self.monkeyarray_factory = monkeyarray_factory or MonkeyArray
+        self.observers = list(observers) if observers else []
+        self.streams = streams
+        self.predator_schedule = deque() # Predators of the next turns, before random ones (see fork)
         # Calculated parameters
-        self.monkeyarray = MonkeyArray(
-            npredators=self.predarray.numpredators,
-            nsignals=self.nsignals,
-            nstates=self.nstates,
-            nmonkeys=self.nmonkeys)
+        self.monkeyarray = self.create_monkeyarray()
         # Misc. measures
         self.bottleneck = nmonkeys # Minimum number of monkeys that ever existed
         self.bottleneckturn = 0 # Turn in which the bottleneck ocurred
         self.worstoverallturnmultiplier = np.inf # Worst .overallturnmultiplier in the whole game
         self.bestoverallturnmultiplier = 0.0 # Best .overallturnmultiplier in the whole game
+        self.survivors = nmonkeys # Monkeys which survived the last hunt
         # Measure turns / losses
         self.turns = 0
         self.losses = 0
@@ -946,45 +1342,15 @@ class Game:
         if print_ending:
             print('Game started.')
         t1 = time.time()
+        for observer in self.observers:
+            observer.on_start(self, nturns)
         for _ in range(nturns):
-            # Increment turns
-            self.turns += 1
-            if not (self.turns % self.archive_cycle):
-                # Measure stuff
-                self.measure()
-                # Print bar
-                print('|', end='', flush=True)
-            # Spawn predator
-            pred = self.predarray.spawn()
-            # Witnessing phase
-            statearray = self.monkeyarray.witness(pred)
-            # Hunting phase
-            survivors = self.predarray.hunt(pred, statearray)
-            self.monkeyarray.survive(survivors, self.immortal)
-            # Conditional break
-            if self.monkeyarray.nummonkeys < self.min_monkeys:
-                self.losses += 1
-                if self.archive_loss:
-                    # Measure stuff
-                    self.measure()
-                if self.immortal:
-                    # Conditional subroutine if immortal is True
-                    while self.monkeyarray.nummonkeys < self.nmonkeys:
-                        self.monkeyarray.reproduce(
-                            self.rep_rate,
-                            self.mut_rate,
-                            max_monkeys=self.nmonkeys)
-                else:
-                    break
-            # Reproductive phase
-            self.monkeyarray.reproduce(
-                self.rep_rate,
-                self.mut_rate,
-                max_monkeys=self.nmonkeys)
+            if not self.run_turn():
+                break
         self.ended = True
         self.monkeyswon = (self.turns >= nturns)
-        # Print space
-        print(' ', end='', flush=True)
+        for observer in self.observers:
+            observer.on_end(self)
         # Print ending message
         if print_ending:
             duration = time.time() - t1
@@ -994,23 +1360,166 @@ class Game:
                 sep=sep,
                 end=end)
 
-    def reset(self, wipe_statistics: bool=True) -> None:
-        self.monkeyarray = MonkeyArray(
+    def run_turn(self) -> bool:
+        '''Runs a single turn
+
+        :returns: False if the monkeys lost and the game must end
+
+        '''
+        # Increment turns
+        self.turns += 1
+        if not (self.turns % self.archive_cycle):
+            # Measure stuff
+            self.measure()
+            for observer in self.observers:
+                observer.on_milestone(self)
+        # Spawn predator
+        pred = self.spawn()
+        # Witnessing phase
+        if self.streams is None:
+            signal = self.monkeyarray.witness_signal(pred)
+        else:
+            signal = self.monkeyarray.keyed_witness_signal(
+                pred, self.draws(WITNESS))
+        # Hunting phase
+        if self.streams is None:
+            self.monkeyarray.hunt(self.predarray, pred, signal, self.immortal)
+        else:
+            self.monkeyarray.keyed_hunt(
+                self.predarray, pred, signal, self.draws(HUNT), self.immortal)
+        self.survivors = self.monkeyarray.nummonkeys
+        # Conditional break
+        if self.monkeyarray.nummonkeys < self.min_monkeys:
+            self.losses += 1
+            if self.archive_loss:
+                # Measure stuff
+                self.measure()
+            for observer in self.observers:
+                observer.on_loss(self)
+            if self.immortal:
+                # Conditional subroutine if immortal is True
+                refill = 0
+                while self.monkeyarray.nummonkeys < self.nmonkeys:
+                    self.reproduce(REFILL, refill)
+                    refill += 1
+                for observer in self.observers:
+                    observer.on_refill(self)
+            else:
+                return False
+        # Reproductive phase
+        self.reproduce(REPRODUCE)
+        return True
+
+    def reproduce(self, purpose: int, *subkeys: int) -> None:
+        '''Runs a reproductive phase of the monkeys with the draws of a purpose (see draws)'''
+        if self.streams is None:
+            self.monkeyarray.reproduce(
+                self.rep_rate,
+                self.mut_rate,
+                max_monkeys=self.nmonkeys)
+        else:
+            self.monkeyarray.keyed_reproduce(
+                self.rep_rate,
+                self.mut_rate,
+                self.draws(purpose, *subkeys),
+                max_monkeys=self.nmonkeys)
+
+    def spawn(self) -> int:
+        '''Returns the predator of the turn: the next one of predator_schedule, or a random one'''
+        if self.predator_schedule:
+            return self.predator_schedule.popleft()
+        return self.predarray.spawn(self.rng(SPAWN))
+
+    def rng(self, purpose: int) -> Union[np.random.Generator, None]:
+        '''Returns the stream of a purpose in the current turn (None draws from np.random)'''
+        if self.streams is None:
+            return None
+        return self.streams.generator(self.turns, purpose)
+
+    def draws(self, purpose: int, *subkeys: int) -> KeyedDraws:
+        '''Returns the keyed draws of a purpose in the current turn (needs streams)
+
+        The monkeys draw from these rather than from a stream, so games of
+        different configurations stay correlated (see streams.KeyedDraws).
+
+        '''
+        return self.streams.draws(self.turns, purpose, *subkeys)
+
+    def create_monkeyarray(self) -> MonkeyArray:
+        '''Creates a randomly initialized population of nmonkeys monkeys'''
+        if self.streams is None:
+            return self.monkeyarray_factory(
+                npredators=self.predarray.numpredators,
+                nsignals=self.nsignals,
+                nstates=self.nstates,
+                nmonkeys=self.nmonkeys)
+        monkeyarray = self.monkeyarray_factory(
             npredators=self.predarray.numpredators,
             nsignals=self.nsignals,
             nstates=self.nstates,
-            nmonkeys=self.nmonkeys)
+            nmonkeys=0)
+        monkeyarray.create_keyed_monkeys(self.nmonkeys, self.streams.draws(0, CREATE))
+        return monkeyarray
+
+    def reset(self, wipe_statistics: bool=True) -> None:
+        self.monkeyarray = self.create_monkeyarray()
+        self.predator_schedule.clear()
         if wipe_statistics:
             self.bottleneck = self.nmonkeys # Minimum number of monkeys that ever existed
             self.bottleneckturn = 0 # Turn in which the bottleneck ocurred
             self.worstoverallturnmultiplier = np.inf # Worst .overallturnmultiplier in the whole game
             self.bestoverallturnmultiplier = 0.0 # Best .overallturnmultiplier in the whole game
+            self.survivors = self.nmonkeys # Monkeys which survived the last hunt
             # Measure turns
             self.losses = 0
             self.turns = 0
             self.monkeyswon = None
             self.ended = False
 
+    def clone(self, streams: RandomStreams = None) -> 'Game':
+        '''Returns a copy of the game which continues independently from its current state
+
+        The monkeys are copied with MonkeyArray.copy and the rest of the state
+        (turns, losses and measures) is copied too; the predators and the
+        parameters are shared. Observers are not carried over.
+
+        :param streams: random streams of the copy (default are the streams of the game, which make it draw the same numbers)
+
+        '''
+        clone = copy.copy(self)
+        clone.monkeyarray = self.monkeyarray.copy()
+        clone.observers = []
+        clone.predator_schedule = deque(self.predator_schedule)
+        if streams is not None:
+            clone.streams = streams
+        return clone
+
+    def fork(
+            self,
+            predator_schedule: Sequence[int] = None,
+            streams: RandomStreams = None) -> 'Game':
+        '''Returns a branch of the game from its current state, e.g. to ask what if some predators came next
+
+        The branch is a clone, so it shares the monkeys with the game until
+        either of them changes (copy on write, see MonkeyArray.copy), and
+        many branches of a state cost little more memory than the state.
+        With RandomStreams, a branch draws the same numbers as the game in
+        every turn except for the scheduled predators (or all of them, with
+        other *streams*), so branches differ only by what was changed.
+
+        :param predator_schedule: indexes of the predators of the next turns of the branch, after which they are random again
+        :param streams: random streams of the branch (default are the streams of the game)
+
+        '''
+        branch = self.clone(streams)
+        if predator_schedule is not None:
+            predators = [int(pred) for pred in predator_schedule]
+            if any(not 0 <= pred < self.predarray.numpredators for pred in predators):
+                raise ValueError('predators must be in [0, {0}) ({1})'.format(
+                    self.predarray.numpredators, predators))
+            branch.predator_schedule = deque(predators)
+        return branch
+
     def better(self, other: 'Game') -> bool:
         '''Compares two games after their runs ended.
 
@@ -0,0 +1,240 @@
+import os
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Tuple, Any
+
+from .models import PredArray
+from .storage import IndexMonkeyArray
+
+
+class ThreadedMonkeyArray(IndexMonkeyArray):
+    '''An IndexMonkeyArray which processes its chunks in a pool of threads
+
+    NumPy releases the GIL in its ufunc and gather loops, so the hunting and
+    reproduction phases of a single large population can use several cores.
+    Every chunk draws its random numbers from its own stream, which depends only
+    on the seed, the number of operations done so far and the chunk number. The
+    chunks have a fixed size, so the results do not depend on *nthreads*.
+
+    Survivors are compacted with a prefix sum of the survivor count of each
+    chunk, which gives every chunk the place where it writes its survivors.
+
+    :param npredators: number of predators
+    :param nsignals: number of signals
+    :param nstates: number of states
+    :param nmonkeys: number of (randomly initialized) monkeys
+    :param nthreads: number of threads (default is the number of cpus)
+    :param seed: seed of the random streams (default is drawn from np.random)
+    :param capacity: number of allocated rows (it grows if needed)
+    :param chunk_size: number of monkeys processed by a thread at once
+
+    '''
+
+    def __init__(
+            self,
+            npredators: int,
+            nsignals: int,
+            nstates: int,
+            nmonkeys: int,
+            nthreads: int = None,
+            seed: int = None,
+            capacity: int = None,
+            chunk_size: int = 2 ** 16) -> None:
+        self.nthreads = nthreads or os.cpu_count() or 1
+        self.seed = seed if seed is not None else np.random.randint(
+            np.iinfo(np.int64).max)
+        self.operations = 0
+        self.executor = None
+        super().__init__(
+            npredators=npredators,
+            nsignals=nsignals,
+            nstates=nstates,
+            nmonkeys=nmonkeys,
+            capacity=capacity,
+            chunk_size=chunk_size)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['executor'] = None
+        return state
+
+    def copy(self) -> 'ThreadedMonkeyArray':
+        '''Returns a copy of the monkeys which changes independently of the original
+
+        The copy gets a new seed (drawn from np.random), so it does not repeat
+        the random streams of the original.
+
+        '''
+        clone = super().copy()
+        clone.executor = None
+        clone.seed = np.random.randint(np.iinfo(np.int64).max)
+        clone.operations = 0
+        return clone
+
+    # Threads and random streams
+
+    def map(
+            self,
+            function: Callable[..., Any],
+            chunks: List[Tuple[int, int]]) -> List[Any]:
+        '''Calls function(chunk_number, start, stop) for every chunk in the thread pool'''
+        if (self.nthreads == 1) or (len(chunks) < 2):
+            return [function(c, start, stop)
+                    for c, (start, stop) in enumerate(chunks)]
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(self.nthreads)
+        return list(self.executor.map(
+            lambda chunk: function(chunk[0], *chunk[1]), enumerate(chunks)))
+
+    def next_operation(self) -> int:
+        '''Returns the number of the current operation and increments the counter'''
+        self.operations += 1
+        return self.operations
+
+    def rng(self, operation: int, chunk: int = 0) -> np.random.Generator:
+        '''Returns the random stream of a chunk in an operation'''
+        return np.random.default_rng(np.random.SeedSequence(
+            self.seed, spawn_key=(operation, chunk)))
+
+    def chunk_streams(
+            self,
+            rng: np.random.Generator = None) -> Callable[[int], np.random.Generator]:
+        '''Returns a function which gives the random stream of each chunk of a new operation
+
+        If a generator is given (e.g. a stream of RandomStreams), the chunk
+        streams are spawned from a number drawn from it instead of the seed
+        and the operation counter.
+
+        '''
+        if rng is None:
+            operation = self.next_operation()
+            return lambda chunk: self.rng(operation, chunk)
+        base = int(rng.integers(np.iinfo(np.int64).max))
+        return lambda chunk: np.random.default_rng(
+            np.random.SeedSequence(base, spawn_key=(chunk,)))
+
+    # MonkeyArray properties
+
+    def count(self, array: np.ndarray, depth: int) -> np.ndarray:
+        '''Counts the values of each column of an index array, chunk by chunk'''
+        offsets = depth * np.arange(array.shape[1])
+        counts = self.map(
+            lambda c, start, stop: np.bincount(
+                (array[start:stop] + offsets).reshape(-1),
+                minlength=depth * array.shape[1]),
+            list(self.chunks()))
+        return np.sum(
+            counts,
+            axis=0,
+            dtype=np.int64).reshape(array.shape[1], depth).astype(float)
+
+    # MonkeyArray methods
+
+    def create_monkeys(self, number: int, rng: np.random.Generator = None) -> None:
+        '''Creates *number* new monkeys'''
+        self.own()
+        self.reserve(self.size + number)
+        streams = self.chunk_streams(rng)
+
+        def create(c: int, start: int, stop: int) -> None:
+            rng = streams(c)
+            self.wordindex[start:stop] = rng.integers(
+                self.numsignals, size=(stop - start, self.numpredators))
+            self.actionindex[start:stop] = rng.integers(
+                self.numstates, size=(stop - start, self.numsignals))
+
+        self.map(create, list(self.chunks(self.size + number, self.size)))
+        self.size += number
+
+    def witness_signal(self, pred: int, rng: np.random.Generator = None) -> int:
+        '''Simulates wittnessing phase for predator of index *pred*
+
+        :param pred: index of predator in wordindex
+        :param rng: generator from which the stream of the pick is spawned (see chunk_streams)
+        :returns: the index of a random monkey's signal for *pred*
+
+        '''
+        monkey = self.chunk_streams(rng)(0).integers(self.size)
+        return int(self.wordindex[monkey, pred])
+
+    def hunt(
+            self,
+            predarray: PredArray,
+            pred: int,
+            signal: int,
+            immortal: bool = False,
+            rng: np.random.Generator = None) -> None:
+        '''Simulates the hunting phase for predator of index *pred*
+
+        :param predarray: the predators
+        :param pred: index of the predator
+        :param signal: index of the heard signal
+        :param immortal: if True, no monkey is eliminated when none survives
+        :param rng: generator from which the chunk streams are spawned (see chunk_streams)
+
+        '''
+        survivalchances = predarray.array[pred]
+        self.own()
+        streams = self.chunk_streams(rng)
+        chunks = list(self.chunks())
+
+        def select(c: int, start: int, stop: int) -> Tuple[np.ndarray, np.ndarray]:
+            survived = survivalchances.take(
+                self.actionindex[start:stop, signal]) > streams(c).random(stop - start)
+            return (
+                self.wordindex[start:stop][survived],
+                self.actionindex[start:stop][survived])
+
+        survivors = self.map(select, chunks)
+        offsets = np.concatenate(
+            ([0], np.cumsum([len(words) for words, _ in survivors])))
+        if (offsets[-1] == 0) and immortal:
+            return
+
+        def compact(c: int, start: int, stop: int) -> None:
+            words, actions = survivors[c]
+            self.wordindex[offsets[c]:offsets[c + 1]] = words
+            self.actionindex[offsets[c]:offsets[c + 1]] = actions
+
+        self.map(compact, chunks)
+        self.size = int(offsets[-1])
+
+    def reproduce(
+            self,
+            rep_rate: float,
+            mut_rate: float,
+            max_monkeys: int = np.inf,
+            rng: np.random.Generator = None) -> None:
+        '''Simulates the reporduction phase
+
+        Babies which would be eliminated for exceeding *max_monkeys* are not created.
+
+        :param rep_rate: proportion of monkeys in the next generation relative to the current one
+        :param mut_rate: proportion of new monkeys with wordmap/actionmap mutations
+        :param rng: generator from which the chunk streams are spawned (see chunk_streams)
+
+        '''
+        self.own()
+        nmonkeys = self.size
+        number__no_mutation = int(
+            nmonkeys * (rep_rate - 1.0) * (1.0 - mut_rate))
+        number__mutation = int(nmonkeys * (rep_rate - 1.0) * mut_rate)
+        if max_monkeys < nmonkeys + number__no_mutation + number__mutation:
+            room = max(int(max_monkeys) - nmonkeys, 0)
+            number__no_mutation = min(number__no_mutation, room)
+            number__mutation = min(number__mutation, room - number__no_mutation)
+            self.size = min(self.size, int(max_monkeys))
+        self.reserve(nmonkeys + number__no_mutation + number__mutation)
+        streams = self.chunk_streams(rng)
+
+        def copy(c: int, start: int, stop: int) -> None:
+            teachers = np.sort(streams(c).integers(
+                nmonkeys, size=stop - start))
+            self.wordindex[start:stop] = self.wordindex[teachers]
+            self.actionindex[start:stop] = self.actionindex[teachers]
+
+        self.map(copy, list(self.chunks(
+            nmonkeys + number__no_mutation, nmonkeys)))
+        self.size += number__no_mutation
+        self.create_monkeys(number__mutation, rng)
@@ -0,0 +1,191 @@
+import math
+import numpy as np
+
+from typing import Any, Callable, Dict, List, Sequence, Union
+
+from .models import Game
+from .streams import RandomStreams
+
+# Function which measures how close a game is to extinction (lower is closer)
+Importance = Callable[[Game], float]
+
+
+def population(game: Game) -> float:
+    '''Importance of a game: the number of monkeys which survived the last hunt'''
+    return game.survivors
+
+
+def multiplier(game: Game) -> float:
+    '''Importance of a game: its overallturnmultiplier'''
+    return game.overallturnmultiplier
+
+
+def geometric_levels(start: float, stop: float, nlevels: int) -> List[float]:
+    '''Returns *nlevels* thresholds in geometric progression from *start* (excluded) to *stop* (excluded)
+
+    E.g. geometric_levels(game.nmonkeys, game.min_monkeys, 5) for the
+    population importance function.
+
+    '''
+    return [float(level) for level in np.geomspace(start, stop, nlevels + 2)[1:-1]]
+
+
+class Trajectory:
+    '''A game in a splitting stage, along with the turn of its extinction (None if it is alive)'''
+
+    def __init__(self, game: Game, extinction: int = None) -> None:
+        self.game = game
+        self.extinction = extinction
+
+
+class SplittingEstimator:
+    '''Fixed effort multilevel splitting estimator of the chance of extinction of a Game
+
+    Extinction is the first loss of the game (less than min_monkeys monkeys
+    after a hunt) within *nturns* turns. The importance function measures how
+    close a game is to extinction, and the levels are decreasing thresholds
+    of it. In the stage i, *ntrajectories* trajectories start from clones of
+    the games which reached the level i - 1 (round robin) and run until their
+    importance goes below the level i (or they die out), or until the turn
+    *nturns*. The chance of extinction is the product of the proportions of
+    trajectories which reached each level, and the stages only simulate the
+    turns which lead towards extinction, so the estimate has a much lower
+    variance than the proportion of extinctions in games of the same total
+    number of turns.
+
+    Trajectories which die out before the last stage count as hits in every
+    later stage. Since all the trajectories of the last stage have the same
+    weight, the turns of the extinctions are a sample of the extinction time
+    conditioned on extinction (correlated through their common ancestors).
+
+    :param game: game whose current state is the start of every trajectory
+    :param nturns: turn after which the game is won
+    :param levels: decreasing thresholds of the importance function
+    :param ntrajectories: trajectories run in each stage
+    :param importance: function which measures how close a game is to extinction (see population and multiplier)
+    :param seed: seed of the streams of the clones if the game has RandomStreams (default is drawn from the OS)
+    :param reset: if True, the trajectories of the first stage start from new random populations (the game is reset), so the estimate is the chance of extinction of a new game
+
+    '''
+
+    def __init__(
+            self,
+            game: Game,
+            nturns: int,
+            levels: Sequence[float],
+            ntrajectories: int = 100,
+            importance: Importance = population,
+            seed: int = None,
+            reset: bool = False) -> None:
+        if any(a <= b for a, b in zip(levels, levels[1:])):
+            raise ValueError('levels must be decreasing ({0})'.format(list(levels)))
+        self.game = game
+        self.nturns = nturns
+        self.levels = list(levels)
+        self.ntrajectories = ntrajectories
+        self.importance = importance
+        self.rng = np.random.default_rng(seed)
+        self.reset = reset
+        self.work = 0
+
+    def clone(self, game: Game) -> Game:
+        '''Returns a clone of a game which draws its own random numbers'''
+        if game.streams is None:
+            return game.clone()
+        return game.clone(RandomStreams(
+            int(self.rng.integers(np.iinfo(np.int64).max)), game.streams.replicate))
+
+    def advance(self, trajectory: Trajectory, level: Union[float, None]) -> bool:
+        '''Runs a trajectory until it goes below a level (None is extinction) or the game is won
+
+        A trajectory which starts below the level (one hunt can cross several
+        levels) reaches it without playing any turn.
+
+        :returns: True if the trajectory reached the level
+
+        '''
+        if trajectory.extinction is not None:
+            return True
+        game = trajectory.game
+        if (level is not None) and (self.importance(game) < level):
+            return True
+        while game.turns < self.nturns:
+            losses = game.losses
+            game.run_turn()
+            self.work += 1
+            if game.losses > losses:
+                trajectory.extinction = game.turns
+                return True
+            if (level is not None) and (self.importance(game) < level):
+                return True
+        return False
+
+    def stage(self, starts: List[Trajectory], level: Union[float, None]) -> List[Trajectory]:
+        '''Runs the trajectories of a stage and returns the ones which reached its level'''
+        hits = []
+        for i in range(self.ntrajectories):
+            start = starts[i % len(starts)]
+            if start.extinction is not None:
+                trajectory = start
+            else:
+                trajectory = Trajectory(self.clone(start.game))
+                if self.reset and (start.game is self.game):
+                    trajectory.game.reset()
+            if self.advance(trajectory, level):
+                hits.append(trajectory)
+        return hits
+
+    def run(self, callback: Callable[[int, float], Any] = None) -> Dict[str, Any]:
+        '''Runs every stage and returns the estimates
+
+        :param callback: function called with the number of each finished stage and the proportion of its hits
+        :returns: the chance of extinction, the proportion of hits of each stage, the relative error of the estimate, the turns of the extinctions of the last stage and their mean, the turns simulated and the relative error of naive Monte Carlo games of the same total number of turns
+
+        '''
+        self.work = 0
+        starts = [Trajectory(self.game)]
+        proportions = []
+        hits = []
+        for i, level in enumerate(self.levels + [None]):
+            hits = self.stage(starts, level)
+            proportions.append(len(hits) / self.ntrajectories)
+            if callback is not None:
+                callback(i, proportions[-1])
+            if not hits:
+                break
+            starts = hits
+        probability = float(np.prod(proportions)) if len(proportions) == len(self.levels) + 1 else 0.0
+        times = [trajectory.extinction for trajectory in hits] if probability else []
+        return {
+            'probability': probability,
+            'proportions': proportions,
+            'relative_error': self.relative_error(proportions) if probability else np.inf,
+            'times': times,
+            'mean_time': float(np.mean(times)) if times else np.nan,
+            'turns': self.work,
+            'naive_relative_error': self.naive_relative_error(probability),
+        }
+
+    def relative_error(self, proportions: Sequence[float]) -> float:
+        '''Approximate relative standard error of the product of the proportions of the stages
+
+        The trajectories of a stage are taken as independent, but the ones
+        cloned from the same ancestor are correlated, so this under-reports
+        the error (the spread of the probability over independent runs is
+        the reliable measure).
+
+        '''
+        return math.sqrt(sum(
+            (1 - p) / (p * self.ntrajectories) for p in proportions))
+
+    def naive_relative_error(self, probability: float) -> float:
+        '''Relative standard error of naive Monte Carlo games which simulate as many turns as the last run
+
+        Each naive game is counted as *nturns* - game.turns turns, which is
+        its length unless it dies out.
+
+        '''
+        ngames = self.work / max(self.nturns - self.game.turns, 1)
+        if not (probability and ngames):
+            return np.inf
+        return math.sqrt((1 - probability) / (probability * ngames))
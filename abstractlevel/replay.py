@@ -0,0 +1,112 @@
+import json
+import pandas as pd
+
+from typing import Any, Dict, Iterator, List, Sequence
+
+from .events import GameObserver
+from .models import Game
+from .streams import RandomStreams
+from .sweep import summarise
+
+# Quantities of a game which are recorded at every milestone by default
+RECORDED_QUANTITIES = ('survivors', 'overallturnmultiplier', 'losses', 'learned')
+
+
+class ReplayLog(GameObserver):
+    '''Logs what is needed to replay every run of the games it observes
+
+    A game with RandomStreams draws every random number from the streams of
+    its seed and replicate, keyed by turn, so its seed, replicate and first
+    and last turns are enough to run it again bit for bit (see replay). The
+    measures of the run (see sweep.summarise) are logged too, so the runs
+    worth a detailed replay can be picked from the log.
+
+    :param path: JSON lines file to which the entries are appended (default keeps them only in memory)
+
+    '''
+
+    def __init__(self, path: str = None) -> None:
+        self.path = path
+        self.entries = []
+        self.entry = None
+
+    @staticmethod
+    def load(path: str) -> List[Dict[str, Any]]:
+        '''Returns the entries stored in a file'''
+        with open(path) as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+    def on_start(self, game: Game, nturns: int) -> None:
+        if game.streams is None:
+            raise ValueError('only games with RandomStreams can be replayed')
+        self.entry = {
+            'seed': game.streams.seed,
+            'replicate': game.streams.replicate,
+            'start': game.turns,
+            'nturns': nturns,
+        }
+
+    def on_end(self, game: Game) -> None:
+        self.entry.update(summarise(game))
+        self.entries.append(self.entry)
+        if self.path is not None:
+            with open(self.path, 'a') as file:
+                file.write(json.dumps(self.entry) + '\n')
+        self.entry = None
+
+
+def replay(
+        game: Game,
+        entry: Dict[str, Any],
+        observers: Sequence[GameObserver] = (),
+        **parameters) -> Game:
+    '''Runs a logged run again, with observers and other parameters which do not draw random numbers
+
+    The turns before the logged run (if it did not start from a new game) are
+    run first without observers. E.g. replay(game, entry, [TurnRecorder()],
+    archive_cycle=1) records every turn of a run done with a coarse
+    archive_cycle.
+
+    :param game: game with the parameters of the logged run (it is not changed)
+    :param entry: entry of the run in a ReplayLog
+    :param observers: observers of the replay
+    :param parameters: Game attributes changed for the replay (e.g. archive_cycle, archive_loss)
+    :returns: the replayed game
+
+    '''
+    replayed = game.clone(RandomStreams(entry['seed'], entry['replicate']))
+    for name, value in parameters.items():
+        if not hasattr(replayed, name):
+            raise ValueError('Game has no parameter {0}'.format(name))
+        setattr(replayed, name, value)
+    replayed.reset()
+    while replayed.turns < entry['start']:
+        replayed.run_turn()
+    replayed.observers = list(observers)
+    replayed.run(entry['nturns'])
+    return replayed
+
+
+class TurnRecorder(GameObserver):
+    '''Records some quantities of a game at every milestone (every archive_cycle turns)
+
+    :param quantities: Game attributes which are recorded
+
+    '''
+
+    def __init__(self, quantities: Sequence[str] = RECORDED_QUANTITIES) -> None:
+        self.quantities = tuple(quantities)
+        self.rows = []
+
+    def on_milestone(self, game: Game) -> None:
+        row = {'turn': game.turns}
+        for quantity in self.quantities:
+            row[quantity] = getattr(game, quantity)
+        self.rows.append(row)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.rows)
+
+    def frame(self) -> pd.DataFrame:
+        '''Returns the records as a DataFrame with a row per milestone'''
+        return pd.DataFrame(self.rows, columns=('turn',) + self.quantities)
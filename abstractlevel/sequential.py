@@ -0,0 +1,200 @@
+import math
+import numpy as np
+
+from statistics import NormalDist
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+# Measures of a run which are True/False (their mean is a chance)
+BOOLEAN_MEASURES = ('learned', 'monkeyswon')
+
+
+def normal_quantile(confidence: float) -> float:
+    '''Returns z such that a standard normal lies in [-z, z] with chance *confidence*'''
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def wilson_interval(successes: int, n: int, confidence: float = 0.95) -> Tuple[float, float]:
+    '''Returns the Wilson score interval of a chance estimated from *successes* in *n* trials'''
+    if not n:
+        return (0.0, 1.0)
+    z = normal_quantile(confidence)
+    p = successes / n
+    center = (p + z ** 2 / (2 * n)) / (1 + z ** 2 / n)
+    half = z * math.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / (1 + z ** 2 / n)
+    return (max(center - half, 0.0), min(center + half, 1.0))
+
+
+def mean_interval(values: Sequence[float], confidence: float = 0.95) -> Tuple[float, float]:
+    '''Returns the normal approximation interval of the mean of *values*'''
+    n = len(values)
+    if n < 2:
+        return (-np.inf, np.inf)
+    mean = float(np.mean(values))
+    half = normal_quantile(confidence) * float(np.std(values, ddof=1)) / math.sqrt(n)
+    return (mean - half, mean + half)
+
+
+class IntervalWidth:
+    '''Stops a batch of games when the confidence interval of a measure is narrow enough
+
+    Chances (learned, monkeyswon) use the Wilson interval, which stays
+    reliable near 0 and 1 where clear-cut configurations end up; other
+    measures (turns, losses, ...) use the normal approximation.
+
+    :param measure: key of the measure in the results of the games (see sweep.summarise)
+    :param width: target width of the interval
+    :param confidence: confidence level of the interval
+    :param min_games: games run before the interval is checked
+    :param max_games: games after which the batch stops anyway
+
+    '''
+
+    def __init__(
+            self,
+            measure: str = 'learned',
+            width: float = 0.05,
+            confidence: float = 0.95,
+            min_games: int = 30,
+            max_games: int = 1000) -> None:
+        self.measure = measure
+        self.width = width
+        self.confidence = confidence
+        self.min_games = min_games
+        self.max_games = max_games
+
+    def interval(self, results: List[Dict[str, Any]]) -> Tuple[float, float]:
+        '''Returns the interval of the measure in some results'''
+        values = [result[self.measure] for result in results]
+        if self.measure in BOOLEAN_MEASURES:
+            return wilson_interval(sum(bool(value) for value in values), len(values), self.confidence)
+        return mean_interval(values, self.confidence)
+
+    def done(self, results: List[Dict[str, Any]]) -> bool:
+        '''Returns True if no more games are needed'''
+        if len(results) >= self.max_games:
+            return True
+        if len(results) < self.min_games:
+            return False
+        low, high = self.interval(results)
+        return high - low <= self.width
+
+
+class SequentialComparison:
+    '''Sequential sign test between the paired games of two configurations
+
+    Games are paired by replicate number. Pairs in which the measure is the
+    same in both games are ignored; among the others, the first configuration
+    is better in a proportion p of them. Two Wald sequential probability ratio
+    tests run at once, p = 0.5 against p = 0.5 + effect and p = 0.5 against
+    p = 0.5 - effect, so the comparison stops as soon as the evidence is
+    enough in any direction. The measure is better when it is higher (use
+    lower_is_better for e.g. losses).
+
+    :param measure: key of the measure in the results of the games
+    :param effect: smallest difference from 0.5 in p worth detecting
+    :param alpha: chance of declaring a difference between equivalent configurations
+    :param beta: chance of missing a difference of *effect*
+    :param max_pairs: pairs after which the comparison stops undecided
+    :param lower_is_better: if True, the configuration with lower values is better
+
+    '''
+
+    FIRST = 'first'
+    SECOND = 'second'
+    EQUIVALENT = 'equivalent'
+    UNDECIDED = 'undecided'
+
+    def __init__(
+            self,
+            measure: str = 'learned',
+            effect: float = 0.2,
+            alpha: float = 0.05,
+            beta: float = 0.1,
+            max_pairs: int = 1000,
+            lower_is_better: bool = False) -> None:
+        if not 0.0 < effect < 0.5:
+            raise ValueError('effect must be in (0, 0.5) ({0})'.format(effect))
+        self.measure = measure
+        self.effect = effect
+        self.alpha = alpha
+        self.beta = beta
+        self.max_pairs = max_pairs
+        self.lower_is_better = lower_is_better
+        # Each one-sided test gets half of alpha
+        self.upper = math.log((1 - beta) / (alpha / 2))
+        self.lower = math.log(beta / (1 - alpha / 2))
+
+    def signs(self, first: List[Dict[str, Any]], second: List[Dict[str, Any]]) -> Tuple[int, int]:
+        '''Returns the number of pairs in which each configuration is better'''
+        differences = np.array([
+            float(a[self.measure]) - float(b[self.measure]) for a, b in zip(first, second)])
+        if self.lower_is_better:
+            differences = -differences
+        return (int(np.count_nonzero(differences > 0)), int(np.count_nonzero(differences < 0)))
+
+    def loglikelihoods(self, wins: int, defeats: int) -> Tuple[float, float]:
+        '''Log likelihood ratios of "first is better" and "second is better" against "equivalent"'''
+        better = 0.5 + self.effect
+        worse = 0.5 - self.effect
+        return (
+            wins * math.log(better / 0.5) + defeats * math.log(worse / 0.5),
+            wins * math.log(worse / 0.5) + defeats * math.log(better / 0.5))
+
+    def decision(
+            self,
+            first: List[Dict[str, Any]],
+            second: List[Dict[str, Any]]) -> Union[str, None]:
+        '''Returns the result of the comparison, or None if more pairs are needed'''
+        wins, defeats = self.signs(first, second)
+        firstbetter, secondbetter = self.loglikelihoods(wins, defeats)
+        if firstbetter >= self.upper:
+            return self.FIRST
+        if secondbetter >= self.upper:
+            return self.SECOND
+        if (firstbetter <= self.lower) and (secondbetter <= self.lower):
+            return self.EQUIVALENT
+        if min(len(first), len(second)) >= self.max_pairs:
+            return self.UNDECIDED
+        return None
+
+
+def paired_difference(
+        first: List[Dict[str, Any]],
+        second: List[Dict[str, Any]],
+        measure: str = 'learned',
+        confidence: float = 0.95) -> Dict[str, float]:
+    '''Estimates the difference of the mean of a measure between paired games of two configurations
+
+    Games are paired by replicate number. With common random numbers (see
+    streams.RandomStreams) the games of a pair are positively correlated
+    while their populations stay close, so the interval of the mean of the
+    paired differences is narrower than the interval of the difference of two
+    independent means, which is also given.
+    variance_reduction is the ratio between the variances of both estimates.
+
+    '''
+    npairs = min(len(first), len(second))
+    a = np.array([float(result[measure]) for result in first[:npairs]])
+    b = np.array([float(result[measure]) for result in second[:npairs]])
+    low, high = mean_interval(a - b, confidence)
+    estimate = {
+        'pairs': npairs,
+        'difference': float(np.mean(a - b)) if npairs else np.nan,
+        'low': low,
+        'high': high,
+    }
+    if npairs < 2:
+        estimate.update(unpaired_low=-np.inf, unpaired_high=np.inf, correlation=np.nan,
+                        variance_reduction=np.nan)
+        return estimate
+    half = normal_quantile(confidence) * math.sqrt(
+        (np.var(a, ddof=1) + np.var(b, ddof=1)) / npairs)
+    paired = np.var(a - b, ddof=1)
+    unpaired = np.var(a, ddof=1) + np.var(b, ddof=1)
+    deviations = np.std(a, ddof=1) * np.std(b, ddof=1)
+    estimate.update(
+        unpaired_low=estimate['difference'] - half,
+        unpaired_high=estimate['difference'] + half,
+        correlation=float(np.cov(a, b)[0, 1] / deviations) if deviations else np.nan,
+        variance_reduction=float(unpaired / paired) if paired else np.inf)
+    return estimate
@@ -0,0 +1,490 @@
+import copy
+import os
+import shutil
+import tempfile
+import weakref
+import numpy as np
+
+from typing import List, Tuple, Iterator, Union
+
+from .models import MonkeyArray, PredArray
+from .utilities import onehot, pack_rows, memoised
+
+
+def release(owners: List[List[int]]) -> None:
+    '''Forgets a dead owner of shared arrays (see IndexMonkeyArray.copy)'''
+    owners[0][0] -= 1
+
+
+class IndexMonkeyArray(MonkeyArray):
+    '''A MonkeyArray which stores indexes instead of 0/1 arrays
+
+    We have wordindex[m, p] = s if the monkey number m emmits the signal number s
+    when the predator number p is perceived and actionindex[m, s] = a if the monkey
+    number m changes to state number a when the signal s is heard. Only the first
+    *nummonkeys* rows of both arrays are monkeys, the rest is free space for the
+    next generation.
+
+    The hunting, survival and reproduction phases and the counts stream over
+    chunks of *chunk_size* monkeys, so the extra memory they use does not grow
+    with the number of monkeys. The wordarray and actionarray are still available,
+    but they are built on demand (which takes as much memory as a MonkeyArray).
+
+    The random draws have the same distributions as in MonkeyArray, but they
+    are not the same draws: np.random is called differently, and the teachers
+    of the babies are drawn and sorted chunk by chunk, so the monkeys end up
+    in another order. A seeded game therefore takes another course on each
+    backend.
+
+    Copies share the arrays until they are changed (copy on write): the
+    number of objects sharing them is counted, and an object which is about to
+    change shared arrays copies them first (see own).
+
+    :param npredators: number of predators
+    :param nsignals: number of signals
+    :param nstates: number of states
+    :param nmonkeys: number of (randomly initialized) monkeys
+    :param capacity: number of allocated rows (it grows if needed)
+    :param chunk_size: number of monkeys processed at once
+
+    '''
+
+    def __init__(
+            self,
+            npredators: int,
+            nsignals: int,
+            nstates: int,
+            nmonkeys: int,
+            capacity: int = None,
+            chunk_size: int = 2 ** 16) -> None:
+        if (not npredators) or (npredators < 0):
+            raise ValueError('no positive number of predators was given')
+        if (not nsignals) or (nsignals < 0):
+            raise ValueError('no positive number of signals was given')
+        if (not nstates) or (nstates < 0):
+            raise ValueError('no positive number of states was given')
+        if (nmonkeys is None) or (nmonkeys < 0):
+            raise ValueError('no positive number of monkeys was given')
+        self.nstates = nstates
+        self.chunk_size = chunk_size
+        self.share([0])
+        self.size = 0
+        self.capacity = max(capacity or 0, nmonkeys, 1)
+        self.wordindex = self.allocate(
+            'wordindex', (self.capacity, npredators), np.min_scalar_type(nsignals))
+        self.actionindex = self.allocate(
+            'actionindex', (self.capacity, nsignals), np.min_scalar_type(nstates))
+        self.create_monkeys(nmonkeys)
+
+    # Storage
+
+    def allocate(
+            self,
+            name: str,
+            shape: Tuple[int, int],
+            dtype: np.dtype) -> np.ndarray:
+        '''Allocates the array *name* (wordindex or actionindex)'''
+        return np.empty(shape, dtype=dtype)
+
+    def reallocate(
+            self,
+            name: str,
+            array: np.ndarray,
+            capacity: int) -> np.ndarray:
+        '''Returns the array *name* with *capacity* rows, keeping the monkeys'''
+        newarray = self.allocate(name, (capacity, array.shape[1]), array.dtype)
+        for start, stop in self.chunks():
+            newarray[start:stop] = array[start:stop]
+        return newarray
+
+    def reserve(self, nmonkeys: int) -> None:
+        '''Makes sure that there is space for *nmonkeys* monkeys'''
+        if nmonkeys <= self.capacity:
+            return
+        self.capacity = max(nmonkeys, int(1.5 * self.capacity))
+        self.wordindex = self.reallocate(
+            'wordindex', self.wordindex, self.capacity)
+        self.actionindex = self.reallocate(
+            'actionindex', self.actionindex, self.capacity)
+
+    def share(self, sharers: List[int]) -> None:
+        '''Makes the monkeys one more owner of arrays owned by *sharers*[0] objects'''
+        sharers[0] += 1
+        # Boxed, so own can swap the counter which the finalizer decrements
+        self.owners = [sharers]
+        weakref.finalize(self, release, self.owners)
+
+    def detach(self) -> None:
+        '''Prepares the monkeys to allocate arrays of their own (see own)'''
+
+    def own(self) -> None:
+        '''Copies the arrays if other objects share them (called before changing them in place)
+
+        Only the first *nummonkeys* rows are copied, chunk by chunk.
+
+        '''
+        sharers = self.owners[0]
+        if sharers[0] <= 1:
+            return
+        sharers[0] -= 1
+        self.owners[0] = [1]
+        self.detach()
+        wordindex = self.allocate(
+            'wordindex', self.wordindex.shape, self.wordindex.dtype)
+        actionindex = self.allocate(
+            'actionindex', self.actionindex.shape, self.actionindex.dtype)
+        for start, stop in self.chunks():
+            wordindex[start:stop] = self.wordindex[start:stop]
+            actionindex[start:stop] = self.actionindex[start:stop]
+        self.wordindex = wordindex
+        self.actionindex = actionindex
+
+    def copy(self) -> 'IndexMonkeyArray':
+        '''Returns a copy of the monkeys which changes independently of the original
+
+        The copy shares the arrays with the original until either of them
+        changes (see own), so copies cost no memory until then.
+
+        '''
+        clone = copy.copy(self)
+        clone.__dict__.pop('_memo', None)
+        clone.share(self.owners[0])
+        return clone
+
+    def chunks(
+            self,
+            stop: int = None,
+            start: int = 0) -> Iterator[Tuple[int, int]]:
+        '''Iterates over (start, stop) pairs of chunks in [start, stop)
+
+        :param stop: end of the iteration (default is the number of monkeys)
+        :param start: start of the iteration
+
+        '''
+        stop = self.size if stop is None else stop
+        for chunk_start in range(start, stop, self.chunk_size):
+            yield (chunk_start, min(chunk_start + self.chunk_size, stop))
+
+    @property
+    def size(self) -> int:
+        '''Number of monkeys (every change of the monkeys sets it, so it bumps the version)'''
+        return self._size
+
+    @size.setter
+    def size(self, size: int) -> None:
+        self._size = size
+        self.version += 1
+
+    # MonkeyArray properties
+
+    @property
+    def wordarray(self) -> np.ndarray:
+        return onehot(self.wordindex[:self.size], self.numsignals)
+
+    @property
+    def actionarray(self) -> np.ndarray:
+        return onehot(self.actionindex[:self.size], self.numstates)
+
+    @property
+    def actioncodes(self) -> Union[np.ndarray, None]:
+        return pack_rows(self.actionindex[:self.size], self.numstates)
+
+    @property
+    def shape(self) -> Tuple[Tuple[int]]:
+        return (
+            (self.nummonkeys, self.numpredators, self.numsignals),
+            (self.nummonkeys, self.numsignals, self.numstates))
+
+    @property
+    def nummonkeys(self) -> int:
+        return self.size
+
+    @property
+    def numpredators(self) -> int:
+        return self.wordindex.shape[1]
+
+    @property
+    def numsignals(self) -> int:
+        return self.actionindex.shape[1]
+
+    @property
+    def numstates(self) -> int:
+        return self.nstates
+
+    def count(self, array: np.ndarray, depth: int) -> np.ndarray:
+        '''Counts the values of each column of an index array, chunk by chunk'''
+        offsets = depth * np.arange(array.shape[1])
+        count = np.zeros(depth * array.shape[1], dtype=np.int64)
+        for start, stop in self.chunks():
+            count += np.bincount(
+                (array[start:stop] + offsets).reshape(-1),
+                minlength=len(count))
+        return count.reshape(array.shape[1], depth).astype(float)
+
+    @property
+    @memoised
+    def wordcount(self) -> np.ndarray:
+        return self.count(self.wordindex, self.numsignals)
+
+    @property
+    @memoised
+    def actioncount(self) -> np.ndarray:
+        return self.count(self.actionindex, self.numstates)
+
+    # MonkeyArray methods
+
+    def concatenate(self, other: MonkeyArray) -> None:
+        '''Concatenates *self* with another MonkeyArray object'''
+        if not isinstance(other, MonkeyArray):
+            raise TypeError('concatenated entity must be a MonkeyArray')
+        if self.pashape != other.pashape:
+            raise ValueError(
+                'the concatendated arrays must have the same predator-state shape! actual is {0}, concatenated is {1}'.format(
+                    self.shape, other.shape))
+        self.own()
+        self.reserve(self.size + other.nummonkeys)
+        if isinstance(other, IndexMonkeyArray):
+            for start, stop in other.chunks():
+                self.wordindex[self.size + start:self.size + stop] = \
+                    other.wordindex[start:stop]
+                self.actionindex[self.size + start:self.size + stop] = \
+                    other.actionindex[start:stop]
+        else:
+            self.wordindex[self.size:self.size + other.nummonkeys] = \
+                np.argmax(other.wordarray, axis=2)
+            self.actionindex[self.size:self.size + other.nummonkeys] = \
+                np.argmax(other.actionarray, axis=2)
+        self.size += other.nummonkeys
+
+    def create_monkeys(self, number: int, rng: np.random.Generator = None) -> None:
+        '''Creates *number* new monkeys (with maps drawn from *rng* if given, else from np.random)'''
+        integers = np.random.randint if rng is None else rng.integers
+        self.own()
+        self.reserve(self.size + number)
+        for start, stop in self.chunks(self.size + number, self.size):
+            self.wordindex[start:stop] = integers(
+                self.numsignals, size=(stop - start, self.numpredators))
+            self.actionindex[start:stop] = integers(
+                self.numstates, size=(stop - start, self.numsignals))
+        self.size += number
+
+    def indexes(self) -> Tuple[np.ndarray, np.ndarray]:
+        '''Returns views of the index arrays of the monkeys (see MonkeyArray.indexes)'''
+        return (self.wordindex[:self.size], self.actionindex[:self.size])
+
+    def add_monkeys(self, wordindex: np.ndarray, actionindex: np.ndarray) -> None:
+        '''Adds monkeys with the maps of some index arrays (see indexes)'''
+        number = len(wordindex)
+        self.own()
+        self.reserve(self.size + number)
+        self.wordindex[self.size:self.size + number] = wordindex
+        self.actionindex[self.size:self.size + number] = actionindex
+        self.size += number
+
+    def get_monkey(self, m: int) -> Tuple[np.ndarray, np.ndarray]:
+        '''Gets the monkey of index *m*'''
+        return (
+            np.eye(self.numsignals)[self.wordindex[m]],
+            np.eye(self.numstates)[self.actionindex[m]])
+
+    def emmit(self, predator: int) -> np.ndarray:
+        '''Every monkey emmits its signal corresponding to the predator at index *predator*'''
+        return np.eye(self.numsignals)[self.wordindex[:self.size, predator]]
+
+    def interpret(self, heardsignal: int) -> np.ndarray:
+        '''Every monkey does its action corresponding to the signal at index *heardsignal*'''
+        return np.eye(self.numstates)[self.actionindex[:self.size, heardsignal]]
+
+    def witness(self, pred: int) -> np.ndarray:
+        '''Simulates wittnessing phase for predator of index *pred*
+
+        :param pred: index of predator in wordindex
+        :returns: a random monkey's signal for *pred*
+
+        '''
+        return self.interpret(self.witness_signal(pred))
+
+    def witness_signal(self, pred: int, rng: np.random.Generator = None) -> int:
+        '''Simulates wittnessing phase for predator of index *pred*
+
+        :param pred: index of predator in wordindex
+        :param rng: generator of the random pick (default is np.random)
+        :returns: the index of a random monkey's signal for *pred*
+
+        '''
+        monkey = np.random.choice(self.size) if rng is None else rng.integers(self.size)
+        return int(self.wordindex[monkey, pred])
+
+    def hunt(
+            self,
+            predarray: PredArray,
+            pred: int,
+            signal: int,
+            immortal: bool = False,
+            rng: np.random.Generator = None) -> None:
+        '''Simulates the hunting phase for predator of index *pred*
+
+        Survivors are moved to the front of the arrays chunk by chunk.
+
+        :param predarray: the predators
+        :param pred: index of the predator
+        :param signal: index of the heard signal
+        :param immortal: if True, no monkey is eliminated when none survives
+        :param rng: generator of the survival uniforms (default is np.random)
+
+        '''
+        survivalchances = predarray.array[pred]
+        self.own()
+        nsurvivors = 0
+        for start, stop in self.chunks():
+            survived = survivalchances.take(
+                self.actionindex[start:stop, signal]) > predarray.uniforms(stop - start, rng)
+            nsurvived = int(np.count_nonzero(survived))
+            self.wordindex[nsurvivors:nsurvivors + nsurvived] = \
+                self.wordindex[start:stop][survived]
+            self.actionindex[nsurvivors:nsurvivors + nsurvived] = \
+                self.actionindex[start:stop][survived]
+            nsurvivors += nsurvived
+        if (nsurvivors == 0) and immortal:
+            return
+        self.size = nsurvivors
+
+    def survive(self, surviving_list: list, immortal: bool = False) -> None:
+        '''Eliminates monkeys who did not survive a predator attack
+
+        :param surviving_list: sorted indexes of the surviving monkeys
+
+        '''
+        if (len(surviving_list) == 0) and immortal:
+            return
+        surviving_list = np.asarray(surviving_list, dtype=np.int64)
+        self.own()
+        for start, stop in self.chunks(len(surviving_list)):
+            survivors = surviving_list[start:stop]
+            self.wordindex[start:stop] = self.wordindex[survivors]
+            self.actionindex[start:stop] = self.actionindex[survivors]
+        self.size = len(surviving_list)
+
+    def reproduce(
+            self,
+            rep_rate: float,
+            mut_rate: float,
+            max_monkeys: int = np.inf,
+            rng: np.random.Generator = None) -> None:
+        '''Simulates the reporduction phase
+
+        Babies which would be eliminated for exceeding *max_monkeys* are not created.
+        Teachers are drawn uniformly (as in MonkeyArray) and sorted chunk by
+        chunk, so the babies are stored in another order than in MonkeyArray.
+
+        :param rep_rate: proportion of monkeys in the next generation relative to the current one
+        :param mut_rate: proportion of new monkeys with wordmap/actionmap mutations
+        :param rng: generator of the teachers and mutants (default is np.random)
+
+        '''
+        self.own()
+        nmonkeys = self.size
+        number__no_mutation = int(
+            nmonkeys * (rep_rate - 1.0) * (1.0 - mut_rate))
+        number__mutation = int(nmonkeys * (rep_rate - 1.0) * mut_rate)
+        if max_monkeys < nmonkeys + number__no_mutation + number__mutation:
+            room = max(int(max_monkeys) - nmonkeys, 0)
+            number__no_mutation = min(number__no_mutation, room)
+            number__mutation = min(number__mutation, room - number__no_mutation)
+            self.size = min(self.size, int(max_monkeys))
+        self.reserve(nmonkeys + number__no_mutation + number__mutation)
+        for start, stop in self.chunks(
+                nmonkeys + number__no_mutation, nmonkeys):
+            # Sorted teachers are read in storage order
+            if rng is None:
+                teachers = np.sort(np.random.choice(nmonkeys, size=stop - start))
+            else:
+                teachers = np.sort(rng.integers(nmonkeys, size=stop - start))
+            self.wordindex[start:stop] = self.wordindex[teachers]
+            self.actionindex[start:stop] = self.actionindex[teachers]
+        self.size += number__no_mutation
+        self.create_monkeys(number__mutation, rng)
+
+
+class MemmapMonkeyArray(IndexMonkeyArray):
+    '''An IndexMonkeyArray stored in memory-mapped files
+
+    Only the chunks being processed need to be in memory, so populations larger
+    than the RAM can be simulated. The files are deleted along with the object,
+    unless a *directory* is given.
+
+    :param npredators: number of predators
+    :param nsignals: number of signals
+    :param nstates: number of states
+    :param nmonkeys: number of (randomly initialized) monkeys
+    :param directory: directory of the files (default is a new temporary directory)
+    :param capacity: number of allocated rows (it grows if needed)
+    :param chunk_size: number of monkeys processed at once
+
+    '''
+
+    def __init__(
+            self,
+            npredators: int,
+            nsignals: int,
+            nstates: int,
+            nmonkeys: int,
+            directory: str = None,
+            capacity: int = None,
+            chunk_size: int = 2 ** 20) -> None:
+        self.directory = directory
+        if directory is None:
+            self.detach()
+        super().__init__(
+            npredators=npredators,
+            nsignals=nsignals,
+            nstates=nstates,
+            nmonkeys=nmonkeys,
+            capacity=capacity,
+            chunk_size=chunk_size)
+
+    def copy(self) -> 'MemmapMonkeyArray':
+        '''Returns a copy of the monkeys in a new temporary directory
+
+        Files are not shared (the arrays are reopened by path when they grow),
+        so the copy is made at once.
+
+        '''
+        clone = super().copy()
+        clone.own()
+        return clone
+
+    def detach(self) -> None:
+        '''Moves the files of the monkeys to a new temporary directory'''
+        self.directory = tempfile.mkdtemp(prefix='monkeyarray-')
+        weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+    def path(self, name: str) -> str:
+        '''Returns the path of the file of array *name*'''
+        return os.path.join(self.directory, name + '.dat')
+
+    def allocate(
+            self,
+            name: str,
+            shape: Tuple[int, int],
+            dtype: np.dtype) -> np.ndarray:
+        '''Allocates the array *name* in a new file'''
+        return np.memmap(self.path(name), dtype=dtype, mode='w+', shape=shape)
+
+    def reallocate(
+            self,
+            name: str,
+            array: np.ndarray,
+            capacity: int) -> np.ndarray:
+        '''Extends the file of array *name* to *capacity* rows'''
+        array.flush()
+        return np.memmap(
+            self.path(name),
+            dtype=array.dtype,
+            mode='r+',
+            shape=(capacity, array.shape[1]))
+
+    def flush(self) -> None:
+        '''Writes the changes to disk'''
+        self.wordindex.flush()
+        self.actionindex.flush()
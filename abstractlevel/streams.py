@@ -0,0 +1,146 @@
+import numpy as np
+
+# Purposes of the random streams of a turn
+CREATE = 0  # initial monkeys (turn 0)
+SPAWN = 1  # predator spawn
+WITNESS = 2  # monkey whose signal is heard
+HUNT = 3  # survival uniforms
+REPRODUCE = 4  # teachers and mutants of the reproduction phase
+REFILL = 5  # reproduction of an immortal population after a loss
+
+# Constants of splitmix64, which scrambles the keys of the keyed draws
+GOLDEN = np.uint64(0x9e3779b97f4a7c15)
+MIX1 = np.uint64(0xbf58476d1ce4e5b9)
+MIX2 = np.uint64(0x94d049bb133111eb)
+
+
+def mix(x: np.ndarray) -> np.ndarray:
+    '''Scrambles an array of 64 bit unsigned integers (the finaliser of splitmix64)'''
+    # Products wrap around modulo 2 ** 64 on purpose
+    with np.errstate(over='ignore'):
+        x = (x ^ (x >> np.uint64(30))) * MIX1
+        x = (x ^ (x >> np.uint64(27))) * MIX2
+    return x ^ (x >> np.uint64(31))
+
+
+def combine(hashes: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    '''Hashes some keys (non negative integers) into some hashes (the order of the keys matters)'''
+    with np.errstate(over='ignore'):
+        return mix(hashes + (np.asarray(keys).astype(np.uint64) + np.uint64(1)) * GOLDEN)
+
+
+def genotype_keys(wordindex: np.ndarray, actionindex: np.ndarray) -> np.ndarray:
+    '''Returns a 64 bit key of the maps of each monkey, the same for the same maps in any game
+
+    :param wordindex: array W, where W[m, p] is the signal of monkey m for predator p
+    :param actionindex: array A, where A[m, s] is the state of monkey m for signal s
+
+    '''
+    genes = np.hstack((wordindex, actionindex)).astype(np.uint64)
+    # A random odd multiplier per gene, so the sum tells apart any two maps
+    multipliers = mix(np.arange(1, genes.shape[1] + 1, dtype=np.uint64) * GOLDEN) | np.uint64(1)
+    with np.errstate(over='ignore'):
+        return mix((genes + np.uint64(1)) @ multipliers)
+
+
+def genotype_ranks(keys: np.ndarray) -> np.ndarray:
+    '''Returns the number of monkeys with the same key before each monkey'''
+    order = np.argsort(keys, kind='stable')
+    sortedkeys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sortedkeys[1:] != sortedkeys[:-1]])
+    counts = np.diff(np.r_[starts, len(keys)])
+    ranks = np.empty(len(keys), dtype=np.int64)
+    ranks[order] = np.arange(len(keys)) - np.repeat(starts, counts)
+    return ranks
+
+
+class KeyedDraws:
+    '''Random numbers of a turn and purpose which are picked by keys instead of drawn in order
+
+    The uniform of some keys is a hash of the keys and of the stream, so two
+    games get the same uniform for the same keys whatever else they draw: the
+    survival uniform of the third monkey with some maps, or the teacher of
+    the tenth baby. Draws from a Generator are matched by position instead,
+    which makes them useless for common random numbers once two populations
+    differ in size or order.
+
+    :param key: key of the stream (see RandomStreams.draws)
+
+    '''
+
+    def __init__(self, key: int) -> None:
+        self.key = np.uint64(key)
+
+    def uniforms(self, *keys: np.ndarray) -> np.ndarray:
+        '''Returns the uniforms in [0, 1) of some keys (broadcast against each other)'''
+        hashes = np.full(np.broadcast(*keys).shape, self.key, dtype=np.uint64)
+        for key in keys:
+            hashes = combine(hashes, key)
+        return (hashes >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+    def integers(self, high: int, *keys: np.ndarray) -> np.ndarray:
+        '''Returns the integers in [0, high) of some keys'''
+        return np.minimum((self.uniforms(*keys) * high).astype(np.int64), high - 1)
+
+    def choices(self, size: int, *keys: np.ndarray) -> np.ndarray:
+        '''Returns *size* indexes of some keys picked uniformly with replacement
+
+        Each key gets a Poisson process of arrivals keyed by it, and the
+        indexes are the keys of the first *size* arrivals of all of them. A
+        key keeps its arrivals when other keys come or go, so the picks of
+        two similar arrays of keys are mostly the same (an inverse CDF over
+        positions would shift every pick after the first difference).
+
+        :param keys: arrays of the same length which identify each index
+
+        '''
+        number = len(keys[0])
+        if not size:
+            return np.zeros(0, dtype=np.int64)
+        # Enough arrivals per key that the first size ones are almost always there
+        narrivals = int(np.ceil(size / number)) + 4
+        while True:
+            times = np.cumsum(-np.log1p(-self.uniforms(
+                *[np.asarray(key).reshape(-1, 1) for key in keys],
+                np.arange(narrivals))), axis=1)
+            first = np.argpartition(times.ravel(), size - 1)[:size]
+            first = first[np.argsort(times.ravel()[first])]
+            # A key whose arrivals all come before the last pick may have more
+            if (times[:, -1] > times.ravel()[first[-1]]).all():
+                return first // narrivals
+            narrivals *= 2
+
+
+class RandomStreams:
+    '''Independent random streams keyed by (replicate, turn, purpose)
+
+    A Game with streams draws every random number of a turn from the stream
+    of that turn and purpose instead of np.random. Games of different
+    configurations with the same seed and replicate see the same predators,
+    and their monkeys are drawn from keyed draws (see draws and KeyedDraws),
+    which do not depend on the position of the monkeys in the arrays: the
+    same maps survive the same hunts and similar populations hear the same
+    witnesses and teach the same babies. These common random numbers keep
+    the games of a pair correlated after their populations diverge, so the
+    difference between their results has less noise than the difference
+    between independent games (see commonrandomnumberstest.py).
+
+    :param seed: seed of every stream (default is drawn from the OS)
+    :param replicate: number of the replicate
+
+    '''
+
+    def __init__(self, seed: int = None, replicate: int = 0) -> None:
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+        self.replicate = replicate
+
+    def generator(self, turn: int, purpose: int) -> np.random.Generator:
+        '''Returns the stream of a purpose in a turn'''
+        return np.random.default_rng(np.random.SeedSequence(
+            self.seed, spawn_key=(self.replicate, turn, purpose)))
+
+    def draws(self, turn: int, purpose: int, *subkeys: int) -> KeyedDraws:
+        '''Returns the keyed draws of a purpose in a turn (subkeys tell apart several draws of a purpose)'''
+        key = np.random.SeedSequence(
+            self.seed, spawn_key=(self.replicate, turn, purpose) + subkeys).generate_state(1, np.uint64)[0]
+        return KeyedDraws(int(key))
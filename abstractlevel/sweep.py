@@ -0,0 +1,489 @@
+import hashlib
+import itertools
+import json
+import os
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Tuple, Union
+
+from .events import GameObserver
+from .models import Game, PredArray
+from .sequential import IntervalWidth, SequentialComparison, paired_difference
+from .streams import RandomStreams
+
+# Measures of a run, averaged per cell by Sweep.summary
+MEASURES = ['learned', 'monkeyswon', 'turns', 'bottleneck', 'bottleneckturn', 'losses', 'nummonkeys']
+
+
+def normalise(configuration: Dict[str, Any]) -> Dict[str, Any]:
+    '''Returns a configuration with plain (JSON) values
+
+    The predarray can be given as a PredArray, as a matrix or as a dict with
+    its array and spawn_probabilities; it becomes such a dict.
+
+    '''
+    normalised = {}
+    for key, value in configuration.items():
+        if key == 'predarray':
+            if isinstance(value, PredArray):
+                value = {'array': value.array, 'spawn_probabilities': value.spawn_probabilities}
+            elif not isinstance(value, dict):
+                value = {'array': value, 'spawn_probabilities': None}
+            spawn = value.get('spawn_probabilities')
+            value = {
+                'array': np.asarray(value['array'], dtype=float).tolist(),
+                'spawn_probabilities': None if spawn is None else [float(p) for p in spawn],
+            }
+        elif isinstance(value, np.generic):
+            value = value.item()
+        normalised[key] = value
+    return normalised
+
+
+def cell_key(configuration: Dict[str, Any]) -> str:
+    '''Returns a stable hash of a configuration'''
+    text = json.dumps(normalise(configuration), sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def grid_design(**values: List[Any]) -> List[Dict[str, Any]]:
+    '''Returns every combination of the given parameter values
+
+    e.g. grid_design(rep_rate=[1.1, 1.2], mut_rate=[0.01, 0.05]) has 4 configurations.
+    A parameter with a single value can be given as a list with one element.
+
+    '''
+    keys = list(values)
+    return [dict(zip(keys, combination))
+            for combination in itertools.product(*(values[key] for key in keys))]
+
+
+def random_design(
+        nconfigurations: int,
+        seed: int = None,
+        **distributions: Any) -> List[Dict[str, Any]]:
+    '''Returns *nconfigurations* configurations with randomly drawn parameters
+
+    Each parameter is given as a callable which receives a numpy Generator, as
+    a tuple (low, high) for a uniform draw (an integer one if both are
+    integers, high included) or as a list of values to choose from.
+
+    '''
+    rng = np.random.default_rng(seed)
+    configurations = []
+    for _ in range(nconfigurations):
+        configuration = {}
+        for key, distribution in distributions.items():
+            if callable(distribution):
+                value = distribution(rng)
+            elif isinstance(distribution, tuple):
+                low, high = distribution
+                if isinstance(low, int) and isinstance(high, int):
+                    value = int(rng.integers(low, high + 1))
+                else:
+                    value = float(rng.uniform(low, high))
+            else:
+                value = distribution[rng.integers(len(distribution))]
+            configuration[key] = value
+        configurations.append(normalise(configuration))
+    return configurations
+
+
+def replicate_seed(seed: int, cell: str, replicate: int) -> int:
+    '''Returns the np.random seed of a replicate of a cell'''
+    sequence = np.random.SeedSequence(seed, spawn_key=(int(cell, 16), replicate))
+    return int(sequence.generate_state(1)[0])
+
+
+def create_game(configuration: Dict[str, Any], streams: RandomStreams = None) -> Game:
+    '''Creates the Game of a (normalised) configuration'''
+    parameters = dict(configuration)
+    predarray = parameters.pop('predarray')
+    parameters.pop('nturns', None)
+    return Game(
+        predarray=PredArray(
+            array=np.array(predarray['array']),
+            spawn_probabilities=predarray['spawn_probabilities']),
+        streams=streams,
+        **parameters)
+
+
+def summarise(game: Game) -> Dict[str, Any]:
+    '''Returns the measures of a game which ended'''
+    return {
+        'learned': bool(game.learned),
+        'monkeyswon': bool(game.monkeyswon),
+        'turns': game.turns,
+        'bottleneck': game.bottleneck,
+        'bottleneckturn': game.bottleneckturn,
+        'losses': game.losses,
+        'nummonkeys': game.monkeyarray.nummonkeys,
+    }
+
+
+def create_replicate(
+        configuration: Dict[str, Any],
+        replicate: int,
+        seed: int,
+        common_random_numbers: bool = False) -> Game:
+    '''Creates the game of a replicate of a configuration, ready to run
+
+    np.random is seeded from the seed, the configuration and the replicate
+    number, so a job gives the same result in any worker. With common random
+    numbers the game draws from RandomStreams(seed, replicate) instead, which
+    are the same for every configuration.
+
+    '''
+    if common_random_numbers:
+        np.random.seed(replicate_seed(seed, '0', replicate))
+        return create_game(configuration, RandomStreams(seed, replicate))
+    np.random.seed(replicate_seed(seed, cell_key(configuration), replicate))
+    return create_game(configuration)
+
+
+def run_replicate(
+        configuration: Dict[str, Any],
+        replicate: int,
+        nturns: int,
+        seed: int,
+        common_random_numbers: bool = False) -> Dict[str, Any]:
+    '''Runs a replicate of a configuration and returns its measures (see create_replicate)'''
+    game = create_replicate(configuration, replicate, seed, common_random_numbers)
+    game.run(configuration.get('nturns', nturns))
+    return summarise(game)
+
+
+class Sweep:
+    '''Runs replicates of many Game configurations in a pool of processes
+
+    Every (configuration, replicate) job runs in a worker process. Results are
+    appended to a JSON lines file as soon as each job is done, so a sweep which
+    is interrupted and run again only runs the missing jobs. Instead of a
+    fixed number of replicates, run_until and compare run replicates until a
+    sequential rule (see the sequential module) is satisfied.
+
+    :param configurations: parameters of each Game (see grid_design and random_design)
+    :param nreplicates: number of games per configuration (for run)
+    :param nturns: maximum number of turns of a game (a configuration may have its own nturns)
+    :param path: path of the results file
+    :param nworkers: number of worker processes (default is the number of cpus, 1 runs in this process)
+    :param seed: seed of the replicates
+    :param runner: function which runs a job, called as runner(configuration, replicate, nturns, seed)
+    :param common_random_numbers: if True, replicate r of every configuration uses the same random streams (the runner gets common_random_numbers=True)
+
+    '''
+
+    def __init__(
+            self,
+            configurations: List[Dict[str, Any]],
+            nreplicates: int,
+            nturns: int,
+            path: str,
+            nworkers: int = None,
+            seed: int = 0,
+            runner: Callable[..., Dict[str, Any]] = run_replicate,
+            common_random_numbers: bool = False) -> None:
+        self.configurations = [normalise(configuration) for configuration in configurations]
+        self.cells = [cell_key(configuration) for configuration in self.configurations]
+        self.nreplicates = nreplicates
+        self.nturns = nturns
+        self.path = path
+        self.nworkers = nworkers or os.cpu_count() or 1
+        self.seed = seed
+        self.runner = runner
+        self.common_random_numbers = common_random_numbers
+        self.options = {'common_random_numbers': True} if common_random_numbers else {}
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        '''Yields the records of the results file (an incomplete last line is skipped)'''
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def stored(self) -> Dict[str, Dict[int, Dict[str, Any]]]:
+        '''Returns the stored results by cell and then by replicate'''
+        stored = {}
+        for record in self.records():
+            stored.setdefault(record['cell'], {})[record['replicate']] = record['result']
+        return stored
+
+    def done(self) -> set:
+        '''Returns the (cell, replicate) jobs with a stored result'''
+        return {(record['cell'], record['replicate']) for record in self.records()}
+
+    def pending(self) -> List[Tuple[int, int]]:
+        '''Returns the (configuration index, replicate) jobs without a result'''
+        done = self.done()
+        return [(i, replicate)
+                for i, cell in enumerate(self.cells)
+                for replicate in range(self.nreplicates)
+                if (cell, replicate) not in done]
+
+    def store(self, file, index: int, replicate: int, result: Dict[str, Any]) -> None:
+        '''Appends the result of a job to the results file'''
+        record = {
+            'cell': self.cells[index],
+            'replicate': replicate,
+            'configuration': self.configurations[index],
+            'result': result,
+        }
+        file.write(json.dumps(record) + '\n')
+        file.flush()
+
+    def execute(
+            self,
+            jobs: List[Tuple[int, int]],
+            callback: Callable[[int, int, Dict[str, Any]], None] = None,
+            executor: ProcessPoolExecutor = None) -> List[Tuple[int, int, Dict[str, Any]]]:
+        '''Runs some (configuration index, replicate) jobs and stores their results
+
+        :returns: the (configuration index, replicate, result) of every job
+
+        '''
+        results = []
+        if os.path.exists(self.path):
+            # Drop a line left incomplete by an interruption
+            with open(self.path, 'rb+') as file:
+                content = file.read()
+                file.truncate(content.rfind(b'\n') + 1)
+        with open(self.path, 'a') as file:
+            if executor is None:
+                for index, replicate in jobs:
+                    result = self.runner(
+                        self.configurations[index], replicate, self.nturns, self.seed,
+                        **self.options)
+                    self.store(file, index, replicate, result)
+                    results.append((index, replicate, result))
+                    if callback is not None:
+                        callback(index, replicate, result)
+            else:
+                futures = {
+                    executor.submit(
+                        self.runner, self.configurations[index], replicate,
+                        self.nturns, self.seed, **self.options): (index, replicate)
+                    for index, replicate in jobs}
+                for future in as_completed(futures):
+                    index, replicate = futures[future]
+                    result = future.result()
+                    self.store(file, index, replicate, result)
+                    results.append((index, replicate, result))
+                    if callback is not None:
+                        callback(index, replicate, result)
+        return results
+
+    def executor(self) -> Union[ProcessPoolExecutor, None]:
+        '''Returns a pool of nworkers processes (None if jobs run in this process)'''
+        return ProcessPoolExecutor(self.nworkers) if self.nworkers > 1 else None
+
+    def run(self, callback: Callable[[int, int, Dict[str, Any]], None] = None) -> pd.DataFrame:
+        '''Runs the pending jobs and returns the summary
+
+        :param callback: function called as callback(index, replicate, result) after each job
+
+        '''
+        executor = self.executor()
+        try:
+            self.execute(self.pending(), callback, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return self.summary()
+
+    def cell_results(
+            self,
+            index: int,
+            stored: Dict[str, Dict[int, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        '''Returns the stored results of a configuration, sorted by replicate
+
+        :param stored: results by cell and replicate (see stored; default reads the results file)
+
+        '''
+        if stored is None:
+            stored = self.stored()
+        results = stored.get(self.cells[index], {})
+        return [results[replicate] for replicate in sorted(results)]
+
+    def wave(
+            self,
+            index: int,
+            nresults: int,
+            batch_size: int,
+            stored: Dict[str, Dict[int, Dict[str, Any]]] = None) -> List[Tuple[int, int]]:
+        '''Returns the jobs which complete the first nresults + batch_size replicates of a configuration
+
+        :param stored: results by cell and replicate (see stored; default reads the results file)
+
+        '''
+        if stored is None:
+            stored = self.stored()
+        done = stored.get(self.cells[index], {})
+        return [(index, replicate)
+                for replicate in range(nresults + batch_size)
+                if replicate not in done]
+
+    def update(
+            self,
+            stored: Dict[str, Dict[int, Dict[str, Any]]],
+            results: List[Tuple[int, int, Dict[str, Any]]]) -> None:
+        '''Adds the results returned by execute to the stored results by cell and replicate'''
+        for index, replicate, result in results:
+            stored.setdefault(self.cells[index], {})[replicate] = result
+
+    def run_until(
+            self,
+            rule: IntervalWidth,
+            batch_size: int = 10,
+            callback: Callable[[int, int, Dict[str, Any]], None] = None) -> pd.DataFrame:
+        '''Runs replicates of every configuration until a stopping rule is satisfied
+
+        Replicates run in waves of *batch_size* per configuration, and the
+        rule (see sequential.IntervalWidth) is checked for each configuration
+        after every wave, so the number of replicates (nreplicates is not used)
+        depends on how clear-cut each configuration is. Stored results count,
+        so an interrupted run resumes where it stopped.
+
+        :returns: the summary, with the achieved interval of the rule's measure
+
+        '''
+        active = list(range(len(self.configurations)))
+        stored = self.stored()
+        executor = self.executor()
+        try:
+            while active:
+                results = {index: self.cell_results(index, stored) for index in active}
+                active = [index for index in active if not rule.done(results[index])]
+                jobs = [job for index in active
+                        for job in self.wave(index, len(results[index]), batch_size, stored)]
+                self.update(stored, self.execute(jobs, callback, executor))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return self.summary(rule)
+
+    def compare(
+            self,
+            first: int,
+            second: int,
+            test: SequentialComparison,
+            batch_size: int = 10,
+            callback: Callable[[int, int, Dict[str, Any]], None] = None) -> Dict[str, Any]:
+        '''Runs paired replicates of two configurations until a sequential test decides
+
+        :param first: index of the first configuration
+        :param second: index of the second configuration
+        :param test: the test (see sequential.SequentialComparison)
+        :returns: the decision of the test, the number of pairs, the mean of the measure in each configuration and the paired estimate of their difference (see paired)
+
+        '''
+        stored = self.stored()
+        executor = self.executor()
+        try:
+            while True:
+                a, b = self.cell_results(first, stored), self.cell_results(second, stored)
+                npairs = min(len(a), len(b))
+                decision = test.decision(a[:npairs], b[:npairs])
+                if decision is not None:
+                    break
+                jobs = (self.wave(first, npairs, batch_size, stored)
+                        + self.wave(second, npairs, batch_size, stored))
+                self.update(stored, self.execute(jobs, callback, executor))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        wins, defeats = test.signs(a[:npairs], b[:npairs])
+        return {
+            'decision': decision,
+            'pairs': npairs,
+            'first_better': wins,
+            'second_better': defeats,
+            'first_mean': float(np.mean([float(r[test.measure]) for r in a[:npairs]])),
+            'second_mean': float(np.mean([float(r[test.measure]) for r in b[:npairs]])),
+            **paired_difference(a[:npairs], b[:npairs], test.measure),
+        }
+
+    def paired(
+            self,
+            first: int,
+            second: int,
+            measure: str = 'learned',
+            confidence: float = 0.95) -> Dict[str, float]:
+        '''Returns the paired estimate of the difference of a measure between two configurations
+
+        Replicates are paired by number (see sequential.paired_difference), which
+        reduces the noise when the sweep uses common random numbers.
+
+        '''
+        return paired_difference(
+            self.cell_results(first), self.cell_results(second), measure, confidence)
+
+    def replay(
+            self,
+            index: int,
+            replicate: int,
+            observers: List[GameObserver] = (),
+            **parameters) -> Game:
+        '''Runs a game of the sweep again, bit for bit, with observers and other parameters
+
+        Jobs are deterministic (see create_replicate), so any stored game can
+        be replayed with e.g. a replay.TurnRecorder and a finer archive_cycle,
+        which do not draw random numbers.
+
+        :param index: number of the configuration
+        :param replicate: number of the replicate
+        :param observers: observers of the replay
+        :param parameters: Game attributes changed for the replay (e.g. archive_cycle, archive_loss)
+        :returns: the replayed game
+
+        '''
+        configuration = self.configurations[index]
+        game = create_replicate(
+            configuration, replicate, self.seed, self.common_random_numbers)
+        for name, value in parameters.items():
+            if not hasattr(game, name):
+                raise ValueError('Game has no parameter {0}'.format(name))
+            setattr(game, name, value)
+        game.observers = list(observers)
+        game.run(configuration.get('nturns', self.nturns))
+        return game
+
+    def results(self) -> pd.DataFrame:
+        '''Returns a table with the measures of every stored job of this sweep'''
+        cells = set(self.cells)
+        rows = [dict(cell=record['cell'], replicate=record['replicate'], **record['result'])
+                for record in self.records() if record['cell'] in cells]
+        return pd.DataFrame(rows, columns=['cell', 'replicate'] + MEASURES)
+
+    def summary(self, rule: IntervalWidth = None) -> pd.DataFrame:
+        '''Returns a table with a row per configuration
+
+        It has the parameters of the configuration (the predarray as text), the
+        number of finished replicates and the mean of every measure (learned and
+        monkeyswon are fractions of the replicates). With a stopping rule, the
+        low and high ends of the interval of its measure are added.
+
+        '''
+        results = self.results().drop_duplicates(['cell', 'replicate'])
+        results[MEASURES] = results[MEASURES].astype(float)
+        means = results.groupby('cell')[MEASURES].mean()
+        counts = results.groupby('cell')['replicate'].count()
+        rows = []
+        for index, (cell, configuration) in enumerate(zip(self.cells, self.configurations)):
+            row = {key: (json.dumps(value) if isinstance(value, (dict, list)) else value)
+                   for key, value in configuration.items()}
+            row['cell'] = cell
+            row['replicates'] = int(counts.get(cell, 0))
+            for measure in MEASURES:
+                row[measure] = means[measure].get(cell, np.nan)
+            if rule is not None:
+                low, high = rule.interval(self.cell_results(index))
+                row[rule.measure + '_low'] = low
+                row[rule.measure + '_high'] = high
+            rows.append(row)
+        return pd.DataFrame(rows)
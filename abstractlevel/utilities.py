@@ -1,5 +1,63 @@
+import functools
+import gc
 import numpy as np
 
+from contextlib import contextmanager
+from typing import Callable, Iterator, Union
+
 def shuffle_along_axis(a:np.ndarray, axis:int) -> np.ndarray:
     idx = np.random.rand(*a.shape).argsort(axis=axis)
-    return np.take_along_axis(a,idx,axis=axis)
\ No newline at end of file
+    return np.take_along_axis(a,idx,axis=axis)
+
+def onehot(index:np.ndarray, depth:int) -> np.ndarray:
+    '''Expands an integer array of shape (m, n) into a 0/1 array of shape (m, n, depth)'''
+    m, n = index.shape
+    array = np.zeros((m, n, depth))
+    array[np.arange(m).reshape(-1, 1), np.arange(n).reshape(1, -1), index] = 1.0
+    return array
+
+def pack_rows(index:np.ndarray, base:int) -> Union[np.ndarray, None]:
+    '''Packs each row of an integer array of shape (m, n) with values in [0, base) into a single integer
+
+    Returns None if the packed integers would not fit in an int64.
+
+    '''
+    if base ** index.shape[1] > 2 ** 62:
+        return None
+    return np.matmul(index.astype(np.int64), base ** np.arange(index.shape[1], dtype=np.int64))
+
+@contextmanager
+def paused_gc() -> Iterator[None]:
+    '''Pauses the cyclic garbage collector while creating many python objects in bulk'''
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def memoised(method:Callable) -> Callable:
+    '''Caches the results of a method until the object's version changes
+
+    The object must have a version attribute which changes whenever its
+    results may change. The arguments are part of the key (through their
+    signature attribute if they have one). Cached arrays are read-only.
+
+    '''
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        version, cache = self.__dict__.get('_memo', (None, None))
+        if version != self.version:
+            cache = {}
+            self.__dict__['_memo'] = (self.version, cache)
+        key = (name,) + tuple(getattr(arg, 'signature', arg) for arg in args)
+        if key not in cache:
+            result = method(self, *args)
+            if isinstance(result, np.ndarray):
+                result.flags.writeable = False
+            cache[key] = result
+        return cache[key]
+    return wrapper
@@ -0,0 +1,29 @@
+import time
+
+from spatiallevel.rendering import FrameEncoder, RasterRenderer
+from spatiallevel.spatialgame import SpatialGame
+
+# Parameters
+nmonkeys = 10000
+neagles = 50
+seconds = 10
+fps = 24
+
+# Initialization
+
+game = SpatialGame(
+    nmonkeys=nmonkeys,
+    neagles=neagles,
+    max_axis=100.0,
+    eagle_detection_distance=2.0,
+    monkey_detection_distance=10.0,
+    seed=0)
+
+encoder = FrameEncoder('animationspeed.gif', fps=fps)
+game.attach(RasterRenderer(size=400, encoder=encoder))
+
+# Animation
+
+start = time.time()
+game.run(seconds * fps)
+print('{0} frames of {1} monkeys in {2:.2f} s'.format(game.steps, nmonkeys, time.time() - start))
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import time
+
+from abstractlevel.sweep import Sweep
+
+# Parameters
+npairs = 100
+mut_rates = [0.05, 0.1]
+seed = 0
+
+predarray = [
+    [0.7, 0.99, 0.6],
+    [0.6, 0.7, 0.99],
+    [0.99, 0.6, 0.7]]
+
+# The games of a pair stay close until their witnesses first differ (a few
+# tens of turns), so common random numbers only help with what happens before:
+# - 'rare losses': the game ends at the first loss, which comes late or never
+# - 'frequent losses': immortal monkeys lose every few turns, counted over 100 turns
+settings = {
+    'rare losses': dict(
+        extra=dict(min_monkeys=25),
+        nturns=300,
+        measures=['turns', 'losses']),
+    'frequent losses': dict(
+        extra=dict(min_monkeys=65, immortal=True),
+        nturns=100,
+        measures=['losses']),
+}
+
+# Pairs of games of both configurations, with and without common random numbers
+
+directory = tempfile.mkdtemp()
+for name, setting in settings.items():
+    configurations = [
+        dict(
+            nmonkeys=100,
+            nsignals=3,
+            nstates=3,
+            predarray=predarray,
+            rep_rate=1.4,
+            mut_rate=mut_rate,
+            **setting['extra'])
+        for mut_rate in mut_rates]
+    for common_random_numbers in (False, True):
+        t1 = time.time()
+        sweep = Sweep(
+            configurations,
+            nreplicates=npairs,
+            nturns=setting['nturns'],
+            path=os.path.join(directory, '{0}{1}.jsonl'.format(
+                name.replace(' ', ''), int(common_random_numbers))),
+            nworkers=1,
+            seed=seed,
+            common_random_numbers=common_random_numbers)
+        sweep.run()
+        print('{0}, common random numbers: {1} ({2} pairs, {3:.2f} s)'.format(
+            name, common_random_numbers, npairs, time.time() - t1))
+        for measure in setting['measures']:
+            estimate = sweep.paired(0, 1, measure)
+            print('    {0}: difference {1:.3f} [{2:.3f}, {3:.3f}], unpaired [{4:.3f}, {5:.3f}], correlation {6:.2f}, variance reduction {7:.2f}'.format(
+                measure,
+                estimate['difference'],
+                estimate['low'],
+                estimate['high'],
+                estimate['unpaired_low'],
+                estimate['unpaired_high'],
+                estimate['correlation'],
+                estimate['variance_reduction']))
@@ -0,0 +1,58 @@
+import time
+import tracemalloc
+import numpy as np
+
+from abstractlevel.models import Game, PredArray
+from abstractlevel.storage import IndexMonkeyArray
+from abstractlevel.streams import RandomStreams
+
+# Parameters
+nmonkeys = 10**5
+nturns = 200 # turns before the branches
+nbranches = 30 # branches of each predator
+schedule_length = 100
+
+predarray = PredArray(
+    array=np.array([
+        [0.7, 0.99, 0.6],   # snake
+        [0.6, 0.7, 0.99],   # eagle
+        [0.99, 0.6, 0.7]])) # puma
+names = ['snake', 'eagle', 'puma']
+
+game = Game(
+    nmonkeys=nmonkeys,
+    nsignals=3,
+    nstates=3,
+    predarray=predarray,
+    rep_rate=1.2,
+    mut_rate=0.05,
+    min_monkeys=30,
+    immortal=True,
+    archive_cycle=nturns + 1,
+    monkeyarray_factory=IndexMonkeyArray,
+    streams=RandomStreams(0))
+game.run(nturns)
+print('Game after {0} turns: {1} monkeys, multiplier {2:.4f}'.format(
+    game.turns, game.monkeyarray.nummonkeys, game.overallturnmultiplier))
+
+# Forking costs little memory until the branches run
+
+tracemalloc.start()
+t1 = time.time()
+branches = [game.fork([p] * schedule_length) for p in range(3) for _ in range(nbranches)]
+print('{0} branches forked in {1:.4f} s with {2:.0f} kB'.format(
+    len(branches), time.time() - t1, tracemalloc.get_traced_memory()[0] / 2**10))
+tracemalloc.stop()
+
+# What if the next predators were all snakes, eagles or pumas?
+
+baseline = game.fork()
+baseline.run(schedule_length)
+print('Random predators: {0} monkeys, {1} losses'.format(
+    baseline.monkeyarray.nummonkeys, baseline.losses - game.losses))
+for p, name in enumerate(names):
+    branch = game.fork([p] * schedule_length)
+    branch.run(schedule_length)
+    print('{0} {1}s: {2} monkeys, {3} losses, multiplier {4:.4f}'.format(
+        schedule_length, name, branch.monkeyarray.nummonkeys,
+        branch.losses - game.losses, branch.overallturnmultiplier))
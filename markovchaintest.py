@@ -0,0 +1,47 @@
+import time
+import numpy as np
+
+from abstractlevel.markov import MarkovChain
+from abstractlevel.models import Game, PredArray
+
+# Parameters
+nmonkeys = 4
+nturns = 8
+ngames = 20000
+
+predarray = PredArray(
+    array=np.array([[0.2, 0.9], [0.9, 0.3]]),
+    spawn_probabilities=[0.7, 0.3])
+
+# Exact results against Monte Carlo estimates
+
+for immortal in (False, True):
+    parameters = dict(
+        nmonkeys=nmonkeys,
+        nsignals=2,
+        nstates=2,
+        predarray=predarray,
+        rep_rate=2.0 if immortal else 1.8,
+        mut_rate=0.0 if immortal else 0.3,
+        min_monkeys=2,
+        immortal=immortal)
+    t1 = time.time()
+    chain = MarkovChain(**parameters)
+    print('Chain with {0} states built in {1:.2f} s (immortal={2})'.format(
+        len(chain.states), time.time() - t1, immortal))
+    t1 = time.time()
+    learned = 0
+    losses = 0
+    for _ in range(ngames):
+        game = Game(archive_cycle=nturns + 1, **parameters)
+        game.run(nturns)
+        learned += bool(game.learned) and (game.monkeyarray.nummonkeys >= game.min_monkeys)
+        losses += game.losses
+    print('{0} games played in {1:.2f} s'.format(ngames, time.time() - t1))
+    print('Learned after {0} turns: {1:.4f} exact, {2:.4f} Monte Carlo'.format(
+        nturns, chain.learned_probability(nturns), learned / ngames))
+    print('Losses in {0} turns: {1:.4f} exact, {2:.4f} Monte Carlo'.format(
+        nturns, chain.expected_losses(nturns), losses / ngames))
+    if not immortal:
+        print('Chance of learning before losing: {0:.4f} ({1:.2f} turns to learn or lose)'.format(
+            chain.learning_probability(), chain.expected_learning_time()))
@@ -0,0 +1,65 @@
+import time
+import numpy as np
+
+from abstractlevel.models import MonkeyArray, MonkeySignal, MonkeyState, PredArray
+from abstractlevel.simulation import Simulation
+
+# Parameters
+npredators = 3
+nsignals = 5
+nstates = 7
+nmonkeys = 1000000
+
+# Simulation
+
+monkey_signals = []
+for i in range(nsignals):
+    monkey_signals.append(MonkeySignal(i))
+
+monkey_states = []
+for i in range(nstates):
+    monkey_states.append(MonkeyState(i))
+
+sp = np.random.rand(npredators)
+sp = sp / np.sum(sp)
+predarray = PredArray(
+    array=np.random.rand(npredators, nstates),
+    spawn_probabilities=sp)
+predators = predarray.to_predator_list(
+    state_list=monkey_states)
+
+sim = Simulation(
+    nmonkeys=nmonkeys,
+    rep_rate=1.2,
+    mut_prob=0.2,
+    predator_dict={predators[i]: sp[i] for i in range(len(predators))},
+    signal_list=monkey_signals,
+    state_list=monkey_states)
+sim.create_monkeys()
+
+# Simulation -> Game
+
+t1 = time.time()
+ma = MonkeyArray.from_monkey_list(
+    sim.monkey_list,
+    predator_list=predators,
+    signal_list=monkey_signals,
+    state_list=monkey_states)
+t2 = time.time()
+print('Encoding: {0:.0f} μs ({1:.2f} μs per monkey)'.format(
+    (t2 - t1) * (10**6),
+    (t2 - t1) * (10**6) / nmonkeys
+))
+
+# Game -> Simulation
+
+t1 = time.time()
+monkey_list = ma.to_monkey_list(
+    predator_list=predators,
+    signal_list=monkey_signals,
+    state_list=monkey_states)
+t2 = time.time()
+print('Decoding: {0:.0f} μs ({1:.2f} μs per monkey)'.format(
+    (t2 - t1) * (10**6),
+    (t2 - t1) * (10**6) / nmonkeys
+))
@@ -0,0 +1,68 @@
+import time
+import numpy as np
+
+from abstractlevel.models import MonkeyArray, PredArray
+from abstractlevel.storage import IndexMonkeyArray
+
+# Parameters
+npredators = 3
+nsignals = 5
+nstates = 7
+nmonkeys = 1000000
+pred = 0
+seed = 0
+
+predarray = PredArray(
+    array=np.random.default_rng(seed).random((npredators, nstates)))
+
+# Both backends start from the same monkeys
+
+monkeys = MonkeyArray(
+    npredators=npredators,
+    nsignals=nsignals,
+    nstates=nstates,
+    nmonkeys=nmonkeys)
+signal = monkeys.witness_signal(pred, np.random.default_rng(seed))
+backends = {
+    'MonkeyArray': monkeys,
+    'IndexMonkeyArray': IndexMonkeyArray(
+        npredators=npredators,
+        nsignals=nsignals,
+        nstates=nstates,
+        nmonkeys=0),
+}
+backends['IndexMonkeyArray'].concatenate(monkeys)
+
+# Hunting + reproductive phase on each backend
+# (the random draws differ, only their distributions are the same)
+
+results = {}
+for name, ma in backends.items():
+    np.random.seed(seed + 1)
+    t1 = time.time()
+    ma.hunt(predarray, pred, signal)
+    survivors = ma.nummonkeys
+    ma.reproduce(
+        rep_rate=1.2,
+        mut_rate=0.2,
+        max_monkeys=nmonkeys)
+    t2 = time.time()
+    results[name] = (
+        ma.wordcount / ma.nummonkeys,
+        ma.actioncount / ma.nummonkeys)
+    print('{0}: {1:.0f} μs ({2:.4f} μs per monkey, {3} survivors, {4} monkeys)'.format(
+        name,
+        (t2 - t1) * (10**6),
+        (t2 - t1) * (10**6) / nmonkeys,
+        survivors,
+        ma.nummonkeys
+    ))
+
+# Distributions of the next generation
+
+(words, actions), (indexwords, indexactions) = results.values()
+print('Largest difference of word proportions: {0:.4f}'.format(
+    np.abs(words - indexwords).max()))
+print('Largest difference of action proportions: {0:.4f}'.format(
+    np.abs(actions - indexactions).max()))
+print('Expected sampling error: {0:.4f}'.format(1 / np.sqrt(nmonkeys)))
@@ -0,0 +1,43 @@
+import os
+import time
+import numpy as np
+
+from abstractlevel.models import PredArray
+from abstractlevel.parallel import ThreadedMonkeyArray
+
+# Parameters
+npredators = 3
+nsignals = 5
+nstates = 7
+nmonkeys = 4000000
+seed = 0
+
+predarray = PredArray(
+    array=np.random.rand(npredators, nstates))
+
+# Hunting + reproductive phase with 1, 2, 4, ... threads
+
+nthreads = 1
+while nthreads <= (os.cpu_count() or 1):
+    ma = ThreadedMonkeyArray(
+        npredators=npredators,
+        nsignals=nsignals,
+        nstates=nstates,
+        nmonkeys=nmonkeys,
+        nthreads=nthreads,
+        seed=seed)
+    t1 = time.time()
+    signal = ma.witness_signal(0)
+    ma.hunt(predarray, 0, signal)
+    ma.reproduce(
+        rep_rate=1.2,
+        mut_rate=0.2,
+        max_monkeys=nmonkeys)
+    t2 = time.time()
+    print('{0} threads: {1:.0f} μs ({2:.4f} μs per monkey, {3} survivors)'.format(
+        nthreads,
+        (t2 - t1) * (10**6),
+        (t2 - t1) * (10**6) / nmonkeys,
+        ma.nummonkeys
+    ))
+    nthreads *= 2
@@ -74,3 +74,15 @@ print('Vectorized: {0:.0f} μs ({1:.2f} μs per monkey)'.format(
     (t2 - t1) * (10**6),
     (t2 - t1) * (10**6) / nmonkeys
 ))
+
+signal = ma.witness_signal(random_predator)
+genotypes = ma.actioncodes
+predarray.survivaltable(nsignals)
+t1 = time.time()
+survived = predarray.hunt_genotypes(random_predator, signal, genotypes, nsignals)
+ma.survive(survived)
+t2 = time.time()
+print('Lookup table: {0:.0f} μs ({1:.2f} μs per monkey)'.format(
+    (t2 - t1) * (10**6),
+    (t2 - t1) * (10**6) / nmonkeys
+))
@@ -0,0 +1,66 @@
+import time
+import numpy as np
+
+from abstractlevel.models import Game, PredArray
+from abstractlevel.rareevent import SplittingEstimator, geometric_levels
+
+# Parameters
+nturns = 200
+ngames = 2000
+ntrajectories = 300
+
+predarray = PredArray(
+    array=np.array([
+        [0.7, 0.99, 0.6],
+        [0.6, 0.7, 0.99],
+        [0.99, 0.6, 0.7]]))
+
+
+def create_game(rep_rate: float) -> Game:
+    return Game(
+        nmonkeys=100,
+        nsignals=3,
+        nstates=3,
+        predarray=predarray,
+        rep_rate=rep_rate,
+        mut_rate=0.05,
+        min_monkeys=25,
+        archive_cycle=nturns + 1)
+
+
+# Splitting against Monte Carlo where extinction is common enough to count
+
+t1 = time.time()
+losses = 0
+for _ in range(ngames):
+    game = create_game(1.4)
+    game.run(nturns)
+    losses += game.losses
+print('Chance of extinction in {0} turns: {1:.4f} Monte Carlo ({2} games, {3:.2f} s)'.format(
+    nturns, losses / ngames, ngames, time.time() - t1))
+t1 = time.time()
+estimate = SplittingEstimator(
+    create_game(1.4),
+    nturns=nturns,
+    levels=geometric_levels(60, 25, 3),
+    ntrajectories=ntrajectories,
+    reset=True).run()
+print('Chance of extinction in {0} turns: {1:.4f} splitting (+-{2:.0%}, {3} turns, {4:.2f} s)'.format(
+    nturns, estimate['probability'], estimate['relative_error'], estimate['turns'], time.time() - t1))
+
+# Rare extinction, out of reach of Monte Carlo
+
+nturns = 1000
+t1 = time.time()
+estimate = SplittingEstimator(
+    create_game(1.7),
+    nturns=nturns,
+    levels=geometric_levels(65, 25, 5),
+    ntrajectories=ntrajectories,
+    reset=True).run(
+        callback=lambda stage, proportion: print(
+            'Stage {0}: {1:.2%} of the trajectories went on'.format(stage + 1, proportion)))
+print('Chance of extinction in {0} turns: {1:.2e} (+-{2:.0%}, Monte Carlo with as many turns +-{3:.0%})'.format(
+    nturns, estimate['probability'], estimate['relative_error'], estimate['naive_relative_error']))
+print('Mean turn of the extinctions: {0:.1f} ({1:.2f} s)'.format(
+    estimate['mean_time'], time.time() - t1))
@@ -3,13 +3,19 @@ import copy
 import pandas as pd
 import numpy as np
 
+from abstractlevel.aggregate import GameAggregator, NUMERIC_MEASURES
 from abstractlevel.models import Game, PredArray
+from abstractlevel.events import ProgressBar
+from abstractlevel.replay import ReplayLog, TurnRecorder, replay
+from abstractlevel.sequential import IntervalWidth
+from abstractlevel.streams import RandomStreams
 
 # CREATE GAME
 #########################
 
 # Settings
-numgames = 1000
+numgames = 1000 # maximum number of games
+target_width = 0.05 # stop when the chance of learning is known within this width (None runs numgames games)
 maxturns = 10**6
 nmonkeys = 1000
 nsignals = 7
@@ -18,6 +24,9 @@ minmonkeys = 30
 immortal = True
 archive_cycle = 10**4
 archive_loss = True
+verbose = True # if False, nothing is printed until the games end
+seed = None # seed of the random streams of the games (default is drawn from the OS)
+replay_cycle = 100 # archive_cycle of the detailed replay of the best game (None skips it)
 
 predarray = PredArray([
     #grass  #tree   #bush
@@ -26,6 +35,13 @@ predarray = PredArray([
     [0.99,   0.6,    0.7]   # puma
 ])
 
+# Summary of every game (turns, bottlenecks, losses, multipliers) and of the multiplier trajectories
+aggregator = GameAggregator(
+    measures=NUMERIC_MEASURES + ('worstoverallturnmultiplier', 'bestoverallturnmultiplier'))
+# Seed and turns of every game, so any game can be replayed in detail (stored in replay.jsonl)
+replaylog = ReplayLog('replay.jsonl')
+seed = RandomStreams(seed).seed
+
 game = Game(
     nmonkeys=nmonkeys,
     nsignals=nsignals,
@@ -36,7 +52,8 @@ game = Game(
     min_monkeys=minmonkeys,
     immortal=immortal,
     archive_cycle=archive_cycle,
-    archive_loss=archive_loss)
+    archive_loss=archive_loss,
+    observers=[aggregator, replaylog, ProgressBar()] if verbose else [aggregator, replaylog])
 
 # CREATE ARCHIVE
 #########################
@@ -72,32 +89,41 @@ else:
 # RUN GAMES
 #########################
 
+stopping = IntervalWidth(
+    measure='learned',
+    width=target_width,
+    max_games=numgames) if target_width else None
+results = []
+
 print('RUNNING GAMES')
 print('-' * 30)
 bestgame = None
 for i in range(numgames):
+    game.streams = RandomStreams(seed, replicate=i)
     game.reset()
-    print('GAME %d' % (i+1), end=': ')
+    if verbose:
+        print('GAME %d' % (i+1), end=': ')
     game.run(maxturns)
     bestgame = copy.deepcopy(game) if not bestgame else bestgame
     bestgame.numgame = i+1
-    if game.monkeyswon:
-        print('MADE IT WITH %d MONKEYS!\n(bottleneck: %d monkeys in turn %d, bestmultiplier: %.4f, worstmultiplier: %.4f)' % (
-            game.monkeyarray.nummonkeys,
-            game.bottleneck,
-            game.bottleneckturn,
-            game.bestoverallturnmultiplier,
-            game.worstoverallturnmultiplier))
-    elif game.turns > bestgame.turns:
-        print('RECORD HIGH OF %d TURNS!\n(bestmultiplier: %.4f, worstmultiplier: %.4f)' % (
-            game.turns,
-            game.bestoverallturnmultiplier,
-            game.worstoverallturnmultiplier))
-    else:
-        print('%d TURNS.\n(bestmultiplier: %.4f, worstmultiplier: %.4f)' %(
-            game.turns,
-            game.bestoverallturnmultiplier,
-            game.worstoverallturnmultiplier))
+    if verbose:
+        if game.monkeyswon:
+            print('MADE IT WITH %d MONKEYS!\n(bottleneck: %d monkeys in turn %d, bestmultiplier: %.4f, worstmultiplier: %.4f)' % (
+                game.monkeyarray.nummonkeys,
+                game.bottleneck,
+                game.bottleneckturn,
+                game.bestoverallturnmultiplier,
+                game.worstoverallturnmultiplier))
+        elif game.turns > bestgame.turns:
+            print('RECORD HIGH OF %d TURNS!\n(bestmultiplier: %.4f, worstmultiplier: %.4f)' % (
+                game.turns,
+                game.bestoverallturnmultiplier,
+                game.worstoverallturnmultiplier))
+        else:
+            print('%d TURNS.\n(bestmultiplier: %.4f, worstmultiplier: %.4f)' %(
+                game.turns,
+                game.bestoverallturnmultiplier,
+                game.worstoverallturnmultiplier))
     if game.better(bestgame):
         bestgame = copy.deepcopy(game)
         bestgame.numgame = i+1
@@ -118,12 +144,41 @@ for i in range(numgames):
         index=False,
         encoding='utf-8')
 
+    results.append({'learned': game.learned})
+    if (stopping is not None) and stopping.done(results):
+        break
+
 np.set_printoptions(precision=2, suppress=True)
 
+print('-' * 30)
+if stopping is not None:
+    low, high = stopping.interval(results)
+    print('CHANCE OF LEARNING: {0:.3f} ({1:.0%} INTERVAL {2:.3f}-{3:.3f}, {4} GAMES)'.format(
+        np.mean([result['learned'] for result in results]),
+        stopping.confidence, low, high, len(results)))
+    print('-' * 30)
+pd.set_option('display.width', 200)
+print('SUMMARY OF {0} GAMES:'.format(aggregator.ngames))
+print(pd.DataFrame(aggregator.summary()).T)
+print('')
+multipliers = aggregator.trajectory('overallturnmultiplier')
+print('MEAN OVERALL TURN MULTIPLIER BY TURN:')
+print(pd.Series(multipliers['mean'], index=multipliers['turns']).to_string())
 print('-' * 30)
 print('BEST GAME: GAME {0}'.format(bestgame.numgame))
 print('-' * 30)
 
+if replay_cycle:
+    recorder = TurnRecorder()
+    replay(
+        game,
+        replaylog.entries[bestgame.numgame - 1],
+        observers=[recorder],
+        archive_cycle=replay_cycle)
+    recorder.frame().to_csv('bestgame.csv', index=False, encoding='utf-8')
+    print('BEST GAME REPLAYED: {0} MILESTONES STORED IN bestgame.csv'.format(len(recorder.rows)))
+    print('')
+
 print('WORDMAP COUNT:')
 print(bestgame.wordcount)
 print('')
@@ -0,0 +1,43 @@
+import numpy as np
+
+from typing import Tuple
+
+from .spatialindex import pairs_within
+
+
+def propagate_alarms(
+        emitters: np.ndarray,
+        signals: np.ndarray,
+        x: np.ndarray,
+        y: np.ndarray,
+        listening: np.ndarray,
+        signal_act: np.ndarray,
+        radius: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''Finds the monkeys that hear an alarm and how each one responds
+
+    Every emitter is heard by the listening monkeys closer than *radius*
+    (the emitter included). A monkey that hears several alarms does what the
+    last one in *emitters* tells it, as if the emitters called one after the other.
+
+    :param emitters: indexes of the emitting monkeys, in calling order (may repeat)
+    :param signals: signal emitted by each emitter
+    :param x: x coordinates of the monkeys
+    :param y: y coordinates of the monkeys
+    :param listening: boolean array, True for the monkeys that can hear alarms
+    :param signal_act: array A, where A[j, s] is the act of monkey j when it hears signal s
+    :param radius: maximum (excluded) distance at which an alarm is heard
+    :returns: arrays R, A, H, where monkey R[k] (sorted) does act A[k] after hearing H[k] alarms
+
+    '''
+    emitters = np.asarray(emitters, dtype=np.int64)
+    signals = np.asarray(signals, dtype=np.int64)
+    candidates = np.nonzero(listening)[0]
+    calls, heard_by = pairs_within(
+        x[emitters], y[emitters], x[candidates], y[candidates], radius)
+    receivers = candidates[heard_by]
+    acts = signal_act[receivers, signals[calls]]
+    # Pairs are sorted by call, so the last occurrence of a receiver is its last alarm
+    unique, reversed_last, heard = np.unique(
+        receivers[::-1], return_index=True, return_counts=True)
+    last = len(receivers) - 1 - reversed_last
+    return (unique, acts[last], heard)
@@ -0,0 +1,270 @@
+import numpy as np
+
+from typing import Sequence, Tuple, Union
+
+from .kinematics import Kinematics
+from .spatialindex import pairs_within
+
+
+class BatchedSpatialGame:
+    '''Several independent SpatialGame worlds stepped together
+
+    Every array has a leading replica axis: x[r, j] is the x coordinate of
+    monkey j in replica r. The parameters that are usually calibrated can be
+    different in each replica, and each replica draws from its own random
+    generator in the same order as SpatialGame, so replica r behaves like
+    SpatialGame(seed=seeds[r]) with the same parameters.
+
+    Movement is a single vectorised update of all replicas. For detection,
+    alarms and hunting the replicas are laid side by side along the x axis,
+    far enough from each other to never interact, so a single spatial query
+    covers all of them; pairs are then filtered with each replica's distances.
+
+    :param nreplicas: number of replicas
+    :param nmonkeys: maximum number of monkeys per replica
+    :param neagles: number of eagles per replica
+    :param initial_monkeys: number of monkeys alive at the start (default is nmonkeys)
+    :param eagle_detection_distance: distance at which monkeys see eagles and eagles catch monkeys (scalar or one per replica)
+    :param monkey_detection_distance: distance at which monkeys hear calls (scalar or one per replica)
+    :param max_rounds_hidden: steps until a hidden monkey moves again (scalar or one per replica)
+    :param longest_step: maximum monkey displacement per axis and step (scalar or one per replica, default is max_axis / 15)
+    :param eagle_step: maximum eagle displacement per axis and step (scalar or one per replica, default is longest_step)
+    :param seeds: seed of each replica, or a single seed from which they are spawned
+
+    The rest of the parameters are the ones of SpatialGame and are shared by every replica.
+
+    '''
+
+    DEAD = 0
+    ROAMING = 1
+    HIDDEN = 2
+
+    def __init__(
+            self,
+            nreplicas: int,
+            nmonkeys: int,
+            neagles: int,
+            initial_monkeys: int = None,
+            nevents: int = 2,
+            nsignals: int = 2,
+            nacts: int = 2,
+            max_axis: float = 100.0,
+            eagle_detection_distance: Union[float, Sequence[float]] = 1.0,
+            monkey_detection_distance: Union[float, Sequence[float]] = 10.0,
+            max_rounds_hidden: Union[int, Sequence[int]] = 2,
+            longest_step: Union[float, Sequence[float]] = None,
+            eagle_step: Union[float, Sequence[float]] = None,
+            safe_acts: Tuple[int] = (0,),
+            eagle_event: int = 0,
+            boundary: str = 'reflect',
+            seeds: Union[int, Sequence[int]] = None) -> None:
+        # Received parameters
+        self.nreplicas = nreplicas
+        self.nmonkeys = nmonkeys
+        self.neagles = neagles
+        self.initial_monkeys = nmonkeys if initial_monkeys is None else initial_monkeys
+        self.nevents = nevents
+        self.nsignals = nsignals
+        self.nacts = nacts
+        self.max_axis = max_axis
+        self.eagle_detection_distance = self.per_replica(eagle_detection_distance)
+        self.monkey_detection_distance = self.per_replica(monkey_detection_distance)
+        self.max_rounds_hidden = self.per_replica(max_rounds_hidden, dtype=np.int64)
+        self.longest_step = self.per_replica(
+            longest_step if longest_step is not None else max_axis / 15)
+        self.eagle_step = self.per_replica(eagle_step) if eagle_step is not None else self.longest_step
+        self.safe_acts = tuple(safe_acts)
+        self.eagle_event = eagle_event
+        self.boundary = boundary
+        self.apply_boundary = Kinematics.boundaries[boundary]
+        if (seeds is None) or np.isscalar(seeds):
+            self.seeds = np.random.SeedSequence(seeds).spawn(nreplicas)
+        else:
+            if len(seeds) != nreplicas:
+                raise ValueError('there must be one seed per replica')
+            self.seeds = list(seeds)
+        # Distance between the origins of two consecutive replicas in the spatial queries
+        self.spacing = 2 * max_axis + 2 * max(
+            np.amax(self.eagle_detection_distance), np.amax(self.monkey_detection_distance))
+        self.reset()
+
+    def per_replica(self, value: Union[float, Sequence[float]], dtype: type = float) -> np.ndarray:
+        '''Returns a parameter as an array with one value per replica'''
+        array = np.broadcast_to(np.asarray(value, dtype=dtype), (self.nreplicas,))
+        return array.copy()
+
+    def reset(self) -> None:
+        '''Puts every replica back at its initial random state'''
+        R, n, m = self.nreplicas, self.nmonkeys, self.neagles
+        self.rngs = [np.random.default_rng(seed) for seed in self.seeds]
+        self.x = np.empty((R, n))
+        self.y = np.empty((R, n))
+        self.eagle_x = np.empty((R, m))
+        self.eagle_y = np.empty((R, m))
+        self.event_signal = np.empty((R, n, self.nevents), dtype=np.int64)
+        self.signal_act = np.empty((R, n, self.nsignals), dtype=np.int64)
+        for r, rng in enumerate(self.rngs):
+            # Same draws as SpatialGame.reset
+            self.x[r] = rng.uniform(-self.max_axis, self.max_axis, n)
+            self.y[r] = rng.uniform(-self.max_axis, self.max_axis, n)
+            self.eagle_x[r] = rng.uniform(-self.max_axis, self.max_axis, m)
+            self.eagle_y[r] = rng.uniform(-self.max_axis, self.max_axis, m)
+            self.event_signal[r] = rng.integers(self.nsignals, size=(n, self.nevents))
+            self.signal_act[r] = rng.integers(self.nacts, size=(n, self.nsignals))
+        alive = np.broadcast_to(np.arange(n) < self.initial_monkeys, (R, n))
+        self.state = np.where(alive, self.ROAMING, self.DEAD).astype(np.int8)
+        self.moving = alive.copy()
+        self.hidden = np.zeros((R, n), dtype=bool)
+        self.rounds_hidden = np.zeros((R, n), dtype=np.int64)
+        self.steps = 0
+        self.kills = np.zeros(R, dtype=np.int64)
+
+    # Properties
+
+    @property
+    def alive(self) -> np.ndarray:
+        '''Boolean array, True for the monkeys that are alive'''
+        return self.state != self.DEAD
+
+    @property
+    def nalive(self) -> np.ndarray:
+        '''Number of monkeys alive in each replica'''
+        return np.count_nonzero(self.state, axis=1)
+
+    @property
+    def exposed(self) -> np.ndarray:
+        '''Boolean array, True for the monkeys that eagles can catch'''
+        exposed = self.alive
+        for act in self.safe_acts:
+            exposed &= (self.state != self.HIDDEN + act)
+        return exposed
+
+    # Spatial queries over all the replicas
+
+    def replica_pairs(
+            self,
+            ax: np.ndarray,
+            ay: np.ndarray,
+            areplicas: np.ndarray,
+            bx: np.ndarray,
+            by: np.ndarray,
+            breplicas: np.ndarray,
+            radius: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        '''Finds the pairs of a points and b points of the same replica closer than its radius
+
+        :param areplicas: replica of each a point
+        :param breplicas: replica of each b point
+        :param radius: radius of each replica
+        :returns: arrays A, B where a point A[k] is close to b point B[k], sorted by A and then B
+
+        '''
+        pa, pb = pairs_within(
+            ax + areplicas * self.spacing, ay,
+            bx + breplicas * self.spacing, by,
+            np.amax(radius))
+        close = (ax[pa] - bx[pb]) ** 2 + (ay[pa] - by[pb]) ** 2 < radius[breplicas[pb]] ** 2
+        return (pa[close], pb[close])
+
+    def eagle_pairs(self, monkeys: np.ndarray) -> np.ndarray:
+        '''Returns the monkeys (flat indexes) within eagle_detection_distance of an eagle, one per pair'''
+        eagles = np.arange(self.eagle_x.size)
+        _, close = self.replica_pairs(
+            self.eagle_x.ravel(), self.eagle_y.ravel(), eagles // self.neagles,
+            self.x.ravel()[monkeys], self.y.ravel()[monkeys], monkeys // self.nmonkeys,
+            self.eagle_detection_distance)
+        return monkeys[close]
+
+    # Phases
+
+    def move(self) -> None:
+        '''Moves monkeys and eagles of every replica'''
+        R, n, m = self.nreplicas, self.nmonkeys, self.neagles
+        self.rounds_hidden[self.hidden] += 1
+        released = self.hidden & (self.rounds_hidden > self.max_rounds_hidden[:, np.newaxis])
+        self.hidden[released] = False
+        self.moving[released] = True
+        self.rounds_hidden[released] = 0
+        self.state[released] = self.ROAMING
+        # Same draws as SpatialGame.move, replica by replica
+        draws = np.empty((R, 2 * n + 2 * m))
+        for r, rng in enumerate(self.rngs):
+            draws[r, :n] = rng.uniform(-1.0, 1.0, size=n)
+            draws[r, n:2 * n] = rng.uniform(-1.0, 1.0, size=n)
+            draws[r, 2 * n:2 * n + m] = rng.uniform(-1.0, 1.0, size=m)
+            draws[r, 2 * n + m:] = rng.uniform(-1.0, 1.0, size=m)
+        scale = self.longest_step[:, np.newaxis] * self.moving
+        bounds = (-self.max_axis, self.max_axis)
+        self.x[...] = self.apply_boundary(self.x + draws[:, :n] * scale, *bounds)
+        self.y[...] = self.apply_boundary(self.y + draws[:, n:2 * n] * scale, *bounds)
+        scale = self.eagle_step[:, np.newaxis]
+        self.eagle_x[...] = self.apply_boundary(
+            self.eagle_x + draws[:, 2 * n:2 * n + m] * scale, *bounds)
+        self.eagle_y[...] = self.apply_boundary(
+            self.eagle_y + draws[:, 2 * n + m:] * scale, *bounds)
+
+    def detect(self) -> np.ndarray:
+        '''Finds the monkeys that see an eagle
+
+        :returns: flat indexes of the emitters (one per detection)
+
+        '''
+        return self.eagle_pairs(np.flatnonzero(self.alive))
+
+    def alarm(self, emitters: np.ndarray) -> np.ndarray:
+        '''The emitters call the signal for an eagle and the monkeys that hear it hide
+
+        As in propagate_alarms, a monkey that hears several alarms does what
+        the last one tells it.
+
+        :returns: flat indexes of the alarmed monkeys
+
+        '''
+        if not len(emitters):
+            return emitters
+        x = self.x.ravel()
+        y = self.y.ravel()
+        signal_act = self.signal_act.reshape(-1, self.nsignals)
+        signals = self.event_signal.reshape(-1, self.nevents)[emitters, self.eagle_event]
+        candidates = np.flatnonzero(self.alive)
+        calls, heard_by = self.replica_pairs(
+            x[emitters], y[emitters], emitters // self.nmonkeys,
+            x[candidates], y[candidates], candidates // self.nmonkeys,
+            self.monkey_detection_distance)
+        receivers = candidates[heard_by]
+        acts = signal_act[receivers, signals[calls]]
+        unique, reversed_last = np.unique(receivers[::-1], return_index=True)
+        acts = acts[len(receivers) - 1 - reversed_last]
+        self.state.ravel()[unique] = self.HIDDEN + acts
+        self.moving.ravel()[unique] = False
+        self.hidden.ravel()[unique] = True
+        self.rounds_hidden.ravel()[unique] = 0
+        return unique
+
+    def hunt(self) -> np.ndarray:
+        '''The eagles eat the exposed monkeys within reach
+
+        :returns: flat indexes of the killed monkeys
+
+        '''
+        killed = np.unique(self.eagle_pairs(np.flatnonzero(self.exposed)))
+        self.state.ravel()[killed] = self.DEAD
+        self.moving.ravel()[killed] = False
+        self.hidden.ravel()[killed] = False
+        self.rounds_hidden.ravel()[killed] = 0
+        self.kills += np.bincount(killed // self.nmonkeys, minlength=self.nreplicas)
+        return killed
+
+    def step(self) -> None:
+        '''Advances every replica one step'''
+        self.move()
+        emitters = self.detect()
+        self.alarm(emitters)
+        self.hunt()
+        self.steps += 1
+
+    def run(self, nsteps: int) -> None:
+        '''Runs *nsteps* steps (or until every monkey of every replica is dead)'''
+        for _ in range(nsteps):
+            if not np.any(self.state):
+                break
+            self.step()
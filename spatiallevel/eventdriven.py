@@ -0,0 +1,482 @@
+import heapq
+import itertools
+
+import numpy as np
+
+from typing import Tuple
+
+from .spatialgame import SpatialObserver
+from .spatialindex import CellList, pairs_within
+
+
+class LinearMotion:
+    '''Agents moving in straight lines between events
+
+    Each agent keeps a reference position (x0, y0) at time t0 and a velocity
+    (vx, vy), so its position at any later time is computed analytically until
+    its velocity changes. Every velocity change increments the agent's version,
+    which invalidates the events scheduled with the old one. x and y hold the
+    positions at the last call to materialise.
+
+    :param x: initial x coordinates
+    :param y: initial y coordinates
+    :param speed: maximum speed along each axis
+    :param bounds: (low, high) bounds of both axes
+
+    '''
+
+    def __init__(
+            self,
+            x: np.ndarray,
+            y: np.ndarray,
+            speed: float,
+            bounds: Tuple[float, float]) -> None:
+        self.x0 = np.array(x, dtype=float)
+        self.y0 = np.array(y, dtype=float)
+        self.vx = np.zeros(self.x0.shape)
+        self.vy = np.zeros(self.y0.shape)
+        self.t0 = np.zeros(self.x0.shape)
+        self.version = np.zeros(self.x0.shape, dtype=np.int64)
+        self.speed = speed
+        self.bounds = bounds
+        self.x = self.x0.copy()
+        self.y = self.y0.copy()
+
+    def __len__(self) -> int:
+        return len(self.x0)
+
+    def positions(self, agents, time: float) -> Tuple[np.ndarray, np.ndarray]:
+        '''Returns the positions of some agents at *time*'''
+        elapsed = time - self.t0[agents]
+        return (
+            self.x0[agents] + self.vx[agents] * elapsed,
+            self.y0[agents] + self.vy[agents] * elapsed)
+
+    def materialise(self, time: float) -> None:
+        '''Stores the positions of every agent at *time* in x and y'''
+        self.x[...], self.y[...] = self.positions(slice(None), time)
+
+    def set_velocity(self, agents, time: float, vx: np.ndarray, vy: np.ndarray) -> None:
+        '''Changes the velocity of some agents at *time*'''
+        x, y = self.positions(agents, time)
+        self.x0[agents] = np.clip(x, *self.bounds)
+        self.y0[agents] = np.clip(y, *self.bounds)
+        self.t0[agents] = time
+        self.vx[agents] = vx
+        self.vy[agents] = vy
+        self.version[agents] += 1
+
+    def axis_wall_times(self, agents) -> Tuple[np.ndarray, np.ndarray]:
+        '''Returns the times at which each agent will hit a wall along the x and y axes'''
+        low, high = self.bounds
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return tuple(
+                self.t0[agents] + np.where(v > 0, (high - p) / v, np.where(v < 0, (low - p) / v, np.inf))
+                for p, v in ((self.x0[agents], self.vx[agents]), (self.y0[agents], self.vy[agents])))
+
+    def wall_times(self, agents) -> np.ndarray:
+        '''Returns the time at which each agent will hit a wall'''
+        return np.minimum(*self.axis_wall_times(agents))
+
+
+def entering_times(
+        dx: np.ndarray,
+        dy: np.ndarray,
+        dvx: np.ndarray,
+        dvy: np.ndarray,
+        radius: float,
+        tolerance: float = 1e-9) -> np.ndarray:
+    '''Returns when each pair gets closer than *radius* (inf if never or already closer)
+
+    :param dx: relative x positions now
+    :param dy: relative y positions now
+    :param dvx: relative x velocities
+    :param dvy: relative y velocities
+    :param tolerance: relative tolerance below which a pair is already closer
+    :returns: time from now until the distance equals radius while decreasing
+
+    '''
+    a = dvx ** 2 + dvy ** 2
+    b = dx * dvx + dy * dvy
+    c = dx ** 2 + dy ** 2 - radius ** 2
+    discriminant = b ** 2 - a * c
+    # Pairs on the boundary (up to rounding) are already closer, or they would enter again and again
+    entering = (c > tolerance * radius ** 2) & (b < 0) & (discriminant >= 0)
+    times = np.full(dx.shape, np.inf)
+    times[entering] = (-b[entering] - np.sqrt(discriminant[entering])) / a[entering]
+    return times
+
+
+class EventDrivenSpatialGame:
+    '''Event-driven version of SpatialGame
+
+    Instead of moving every agent every step, agents move in straight lines at
+    constant velocity and the game jumps from event to event, kept in a
+    priority queue:
+
+    - MOTION: an agent hits a wall (and bounces) or turns (a new random
+      velocity, at random times with rate *turn_rate*)
+    - ENCOUNTER: an eagle gets closer than eagle_detection_distance to a
+      monkey. The monkey calls the signal for an eagle, the monkeys that hear
+      it hide (stop) doing their act and, if the monkey is exposed, it is eaten.
+      A monkey that becomes exposed while it is that close to an eagle is
+      eaten right away
+    - RELEASE: a hidden monkey starts roaming again after *hide_time*
+    - REFRESH: every *horizon* time units the positions are indexed again
+
+    Encounter times are the roots of a quadratic. Only the pairs that can meet
+    before the next refresh (closer than the detection distance plus the
+    largest distance they can travel in a horizon) are solved, so a sparse world
+    costs time proportional to the number of interactions. Events of an agent
+    whose velocity changed are discarded lazily, by comparing versions.
+
+    States and strategies are the same as in SpatialGame and so are observers,
+    which are notified at every frame (every *frame_interval* time units).
+
+    :param nmonkeys: number of monkeys
+    :param neagles: number of eagles
+    :param nevents: number of events (eagles are event *eagle_event*)
+    :param nsignals: number of signals
+    :param nacts: number of acts
+    :param max_axis: the arena is [-max_axis, max_axis] in both axes
+    :param speed: maximum monkey speed along each axis (default is max_axis / 15)
+    :param eagle_speed: maximum eagle speed along each axis (default is speed)
+    :param turn_rate: mean number of turns per agent and time unit (0 means straight lines)
+    :param eagle_detection_distance: distance at which monkeys see eagles and eagles catch monkeys
+    :param monkey_detection_distance: distance at which monkeys hear calls
+    :param hide_time: time until a hidden monkey moves again
+    :param safe_acts: acts which protect a monkey from eagles
+    :param eagle_event: event number of an eagle
+    :param horizon: time between refreshes (default is the time two agents need to close monkey_detection_distance)
+    :param seed: seed of the random generator
+
+    '''
+
+    DEAD = 0
+    ROAMING = 1
+    HIDDEN = 2
+
+    # Event kinds
+    MOTION = 0
+    RELEASE = 1
+    ENCOUNTER = 2
+    REFRESH = 3
+    FRAME = 4
+
+    def __init__(
+            self,
+            nmonkeys: int,
+            neagles: int,
+            nevents: int = 2,
+            nsignals: int = 2,
+            nacts: int = 2,
+            max_axis: float = 100.0,
+            speed: float = None,
+            eagle_speed: float = None,
+            turn_rate: float = 1.0,
+            eagle_detection_distance: float = 1.0,
+            monkey_detection_distance: float = 10.0,
+            hide_time: float = 3.0,
+            safe_acts: Tuple[int] = (0,),
+            eagle_event: int = 0,
+            horizon: float = None,
+            seed: int = None) -> None:
+        # Received parameters
+        self.nmonkeys = nmonkeys
+        self.neagles = neagles
+        self.nevents = nevents
+        self.nsignals = nsignals
+        self.nacts = nacts
+        self.max_axis = max_axis
+        self.speed = speed if speed is not None else max_axis / 15
+        self.eagle_speed = eagle_speed if eagle_speed is not None else self.speed
+        self.turn_rate = turn_rate
+        self.eagle_detection_distance = eagle_detection_distance
+        self.monkey_detection_distance = monkey_detection_distance
+        self.hide_time = hide_time
+        self.safe_acts = tuple(safe_acts)
+        self.eagle_event = eagle_event
+        self.horizon = horizon if horizon is not None else monkey_detection_distance / (
+            self.speed + self.eagle_speed)
+        self.seed = seed
+        # Observers
+        self.observers = []
+        self.reset()
+
+    def reset(self) -> None:
+        '''Puts the monkeys and eagles back at random positions with random strategies'''
+        self.rng = np.random.default_rng(self.seed)
+        bounds = (-self.max_axis, self.max_axis)
+        self.monkeys = LinearMotion(
+            self.rng.uniform(*bounds, self.nmonkeys),
+            self.rng.uniform(*bounds, self.nmonkeys),
+            self.speed, bounds)
+        self.eagles = LinearMotion(
+            self.rng.uniform(*bounds, self.neagles),
+            self.rng.uniform(*bounds, self.neagles),
+            self.eagle_speed, bounds)
+        self.groups = (self.monkeys, self.eagles)
+        self.next_turn = (np.zeros(self.nmonkeys), np.zeros(self.neagles))
+        self.state = np.full(self.nmonkeys, self.ROAMING, dtype=np.int8)
+        self.living = self.nmonkeys # kept by kill, so nalive does not scan state
+        self.event_signal = self.rng.integers(self.nsignals, size=(self.nmonkeys, self.nevents))
+        self.signal_act = self.rng.integers(self.nacts, size=(self.nmonkeys, self.nsignals))
+        self.time = 0.0
+        self.frames = 0
+        self.kills = 0
+        self.alarms = 0
+        self.processed = 0
+        self.queue = []
+        self.counter = itertools.count()
+        self.refreshtime = 0.0
+        # Both groups start moving, the refresh schedules the encounters
+        for group in (0, 1):
+            agents = np.arange(len(self.groups[group]))
+            self.turn(group, agents)
+        self.on_refresh()
+
+    # Observers
+
+    def attach(self, observer: SpatialObserver, stride: int = 1) -> None:
+        '''Attaches an observer which is notified every *stride* frames'''
+        self.observers.append((observer, stride))
+
+    def detach(self, observer: SpatialObserver) -> None:
+        '''Detaches an observer'''
+        self.observers = [(obs, stride) for obs, stride in self.observers if obs is not observer]
+
+    # Properties
+
+    @property
+    def steps(self) -> int:
+        '''Number of frames so far (like SpatialGame.steps)'''
+        return self.frames
+
+    @property
+    def alive(self) -> np.ndarray:
+        '''Boolean array, True for the monkeys that are alive'''
+        return self.state != self.DEAD
+
+    @property
+    def nalive(self) -> int:
+        '''Number of monkeys alive'''
+        return self.living
+
+    def exposed(self, monkeys: np.ndarray) -> np.ndarray:
+        '''Returns True for the monkeys which are alive and not doing a safe act'''
+        state = self.state[monkeys]
+        exposed = state != self.DEAD
+        for act in self.safe_acts:
+            exposed &= (state != self.HIDDEN + act)
+        return exposed
+
+    @property
+    def reach(self) -> float:
+        '''Largest distance between a monkey and an eagle that can meet before the next refresh'''
+        return self.eagle_detection_distance + np.sqrt(2) * (
+            self.speed + self.eagle_speed) * self.horizon
+
+    # Scheduling
+
+    def schedule(self, time: float, kind: int, *event) -> None:
+        '''Pushes an event into the queue'''
+        heapq.heappush(self.queue, (time, next(self.counter), kind) + event)
+
+    def schedule_motion(self, group: int, agents: np.ndarray) -> None:
+        '''Schedules the next wall or turn event of some moving agents'''
+        motion = self.groups[group]
+        times = np.minimum(motion.wall_times(agents), self.next_turn[group][agents])
+        for agent, time, version in zip(agents.tolist(), times.tolist(), motion.version[agents].tolist()):
+            if time < np.inf:
+                self.schedule(time, self.MOTION, group, agent, version)
+
+    def schedule_encounters(self, eagles: np.ndarray, monkeys: np.ndarray) -> None:
+        '''Schedules the encounters of some eagle-monkey pairs before the next refresh'''
+        alive = self.state[monkeys] != self.DEAD
+        eagles = eagles[alive]
+        monkeys = monkeys[alive]
+        ex, ey = self.eagles.positions(eagles, self.time)
+        mx, my = self.monkeys.positions(monkeys, self.time)
+        times = self.time + entering_times(
+            mx - ex, my - ey,
+            self.monkeys.vx[monkeys] - self.eagles.vx[eagles],
+            self.monkeys.vy[monkeys] - self.eagles.vy[eagles],
+            self.eagle_detection_distance)
+        soon = times <= self.refreshtime + self.horizon
+        for e, m, time in zip(eagles[soon].tolist(), monkeys[soon].tolist(), times[soon].tolist()):
+            self.schedule(
+                time, self.ENCOUNTER, e, m,
+                int(self.eagles.version[e]), int(self.monkeys.version[m]))
+
+    def reschedule_encounters(self, group: int, agents: np.ndarray) -> None:
+        '''Schedules the encounters of some agents whose velocity changed'''
+        if not len(agents):
+            return
+        motion = self.groups[group]
+        cells, indexes = self.eaglecells if group == 0 else self.monkeycells
+        x, y = motion.positions(agents, self.time)
+        queries, others = cells.query(x, y, self.reach)
+        others = indexes[others]
+        if group == 0:
+            self.schedule_encounters(others, agents[queries])
+        else:
+            self.schedule_encounters(agents[queries], others)
+
+    def catch_inside(self, monkeys: np.ndarray) -> None:
+        '''The exposed monkeys already too close to an eagle are eaten (no alarm is called)'''
+        monkeys = monkeys[self.exposed(monkeys)]
+        if not len(monkeys):
+            return
+        mx, my = self.monkeys.positions(monkeys, self.time)
+        ex, ey = self.eagles.positions(slice(None), self.time)
+        caught = monkeys[np.unique(pairs_within(
+            mx, my, ex, ey, self.eagle_detection_distance)[0])]
+        self.kill(caught)
+
+    # Velocity changes
+
+    def random_velocities(self, group: int, number: int) -> Tuple[np.ndarray, np.ndarray]:
+        speed = self.groups[group].speed
+        return (
+            self.rng.uniform(-speed, speed, number),
+            self.rng.uniform(-speed, speed, number))
+
+    def turn(self, group: int, agents: np.ndarray) -> None:
+        '''Gives some agents a new random velocity and schedules their next turn'''
+        vx, vy = self.random_velocities(group, len(agents))
+        self.groups[group].set_velocity(agents, self.time, vx, vy)
+        if self.turn_rate > 0:
+            self.next_turn[group][agents] = self.time + self.rng.exponential(
+                1.0 / self.turn_rate, len(agents))
+        else:
+            self.next_turn[group][agents] = np.inf
+        self.schedule_motion(group, agents)
+
+    def stop(self, monkeys: np.ndarray) -> None:
+        '''Stops some monkeys (they hide or die)'''
+        zeros = np.zeros(len(monkeys))
+        self.monkeys.set_velocity(monkeys, self.time, zeros, zeros)
+
+    def kill(self, monkeys: np.ndarray) -> None:
+        '''Some monkeys are eaten'''
+        monkeys = monkeys[self.state[monkeys] != self.DEAD]
+        self.state[monkeys] = self.DEAD
+        self.living -= len(monkeys)
+        self.stop(monkeys)
+        self.kills += len(monkeys)
+
+    # Event handlers
+
+    def on_motion(self, group: int, agent: int, version: int) -> None:
+        motion = self.groups[group]
+        if motion.version[agent] != version:
+            return
+        agents = np.array([agent])
+        if self.next_turn[group][agent] <= self.time:
+            self.turn(group, agents)
+        else:
+            # Bounce off the walls that were reached (by time, as positions may be off by rounding)
+            tx, ty = motion.axis_wall_times(agents)
+            vx = np.where(tx <= self.time, -motion.vx[agents], motion.vx[agents])
+            vy = np.where(ty <= self.time, -motion.vy[agents], motion.vy[agents])
+            motion.set_velocity(agents, self.time, vx, vy)
+            self.schedule_motion(group, agents)
+        self.reschedule_encounters(group, agents)
+
+    def on_release(self, monkey: int, version: int) -> None:
+        if self.monkeys.version[monkey] != version:
+            return
+        monkeys = np.array([monkey])
+        self.state[monkey] = self.ROAMING
+        self.turn(0, monkeys)
+        self.reschedule_encounters(0, monkeys)
+        self.catch_inside(monkeys)
+
+    def on_encounter(self, eagle: int, monkey: int, eagle_version: int, monkey_version: int) -> None:
+        if (self.eagles.version[eagle] != eagle_version) or (
+                self.monkeys.version[monkey] != monkey_version) or (
+                self.state[monkey] == self.DEAD):
+            return
+        # The monkey calls and the monkeys that hear it (itself included) hide
+        signal = self.event_signal[monkey, self.eagle_event]
+        x, y = self.monkeys.positions(np.array([monkey]), self.time)
+        elapsed = self.time - self.refreshtime
+        cells, indexes = self.monkeycells
+        _, candidates = cells.query(
+            x, y, self.monkey_detection_distance + np.sqrt(2) * self.speed * elapsed)
+        candidates = indexes[candidates]
+        candidates = candidates[self.state[candidates] != self.DEAD]
+        cx, cy = self.monkeys.positions(candidates, self.time)
+        receivers = candidates[
+            (cx - x) ** 2 + (cy - y) ** 2 < self.monkey_detection_distance ** 2]
+        self.alarms += 1
+        self.state[receivers] = self.HIDDEN + self.signal_act[receivers, signal]
+        self.stop(receivers)
+        for m, version in zip(receivers.tolist(), self.monkeys.version[receivers].tolist()):
+            self.schedule(self.time + self.hide_time, self.RELEASE, m, version)
+        # The eagle eats the monkey unless it is safe
+        if self.exposed(np.array([monkey]))[0]:
+            self.kill(np.array([monkey]))
+        # Stopped monkeys may now be caught by eagles
+        receivers = receivers[self.state[receivers] != self.DEAD]
+        self.reschedule_encounters(0, receivers)
+        self.catch_inside(receivers)
+
+    def on_refresh(self) -> None:
+        self.refreshtime = self.time
+        self.monkeys.materialise(self.time)
+        self.eagles.materialise(self.time)
+        alive = np.nonzero(self.alive)[0]
+        # Cell lists of the positions at this refresh and the agent of each point
+        self.monkeycells = (
+            CellList(self.monkeys.x[alive], self.monkeys.y[alive], self.reach), alive)
+        self.eaglecells = (
+            CellList(self.eagles.x, self.eagles.y, self.reach), np.arange(self.neagles))
+        eagles, monkeys = self.monkeycells[0].query(self.eagles.x, self.eagles.y, self.reach)
+        self.schedule_encounters(eagles, alive[monkeys])
+        self.schedule(self.time + self.horizon, self.REFRESH)
+
+    def on_frame(self, interval: float) -> None:
+        self.monkeys.materialise(self.time)
+        self.eagles.materialise(self.time)
+        self.frames += 1
+        for observer, stride in self.observers:
+            if not (self.frames % stride):
+                observer.on_step(self)
+        self.schedule(self.time + interval, self.FRAME, interval)
+
+    # Running
+
+    def run(self, duration: float, frame_interval: float = None) -> None:
+        '''Processes the events of the next *duration* time units (or until every monkey is dead)
+
+        :param frame_interval: time between frames (None means no frames)
+
+        '''
+        end = self.time + duration
+        if frame_interval is not None:
+            self.schedule(self.time + frame_interval, self.FRAME, frame_interval)
+        self.monkeys.materialise(self.time)
+        self.eagles.materialise(self.time)
+        for observer, _ in self.observers:
+            observer.on_start(self)
+        handlers = {
+            self.MOTION: self.on_motion,
+            self.RELEASE: self.on_release,
+            self.ENCOUNTER: self.on_encounter,
+            self.REFRESH: self.on_refresh,
+            self.FRAME: self.on_frame,
+        }
+        while self.queue and (self.queue[0][0] <= end) and self.nalive:
+            time, _, kind, *event = heapq.heappop(self.queue)
+            self.time = time
+            self.processed += 1
+            handlers[kind](*event)
+        self.time = max(self.time, end) if self.nalive else self.time
+        # Pending frames belong to this run only
+        self.queue = [event for event in self.queue if event[2] != self.FRAME]
+        heapq.heapify(self.queue)
+        self.monkeys.materialise(self.time)
+        self.eagles.materialise(self.time)
+        for observer, _ in self.observers:
+            observer.on_end(self)
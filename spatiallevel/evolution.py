@@ -0,0 +1,201 @@
+import numpy as np
+
+from abstractlevel.models import MonkeyArray, PredArray
+from abstractlevel.utilities import onehot
+
+from .spatialgame import SpatialGame
+from .spatialindex import pairs_within
+
+
+class EvolvingSpatialGame(SpatialGame):
+    '''Spatial game in which the monkeys reproduce and their strategies evolve
+
+    Every *reproduction_cycle* steps the living monkeys have babies, which are
+    born next to their parent in the free (DEAD) slots. A baby copies the
+    event_signal and signal_act maps of its parent, except for a proportion
+    *mut_rate* of mutants with random maps. The number of babies follows
+    MonkeyArray.reproduce (the living monkeys times rep_rate - 1).
+
+    The living monkeys are available as a MonkeyArray (*monkeyarray*), so the
+    game reports the same statistics as an abstract Game. The events are the
+    predators of *predarray*, and the hunt draws from it: a monkey within
+    reach of an eagle survives with the chance of its act in the eagle_event
+    row (a roaming monkey is doing no act, so it never survives). The arena
+    only has eagles, so in the other rows the act must not matter. By default
+    only the safe acts survive eagles, which is the hunt of SpatialGame. learned and
+    optimalchance only look at the events in which the act changes the chance
+    of surviving (see relevant_events): nothing selects a convention for the
+    other ones.
+
+    :param predarray: survival chances of each event and act (default is built from safe_acts)
+    :param rep_rate: proportion of monkeys after a reproduction relative to the living ones
+    :param mut_rate: proportion of babies with random maps
+    :param reproduction_cycle: number of steps between two reproductions
+    :param birth_radius: maximum distance along each axis between a baby and its parent
+
+    The rest of the parameters are the ones of SpatialGame.
+
+    '''
+
+    def __init__(
+            self,
+            nmonkeys: int,
+            neagles: int,
+            predarray: PredArray = None,
+            rep_rate: float = 1.1,
+            mut_rate: float = 0.05,
+            reproduction_cycle: int = 10,
+            birth_radius: float = None,
+            **kwargs) -> None:
+        self.rep_rate = rep_rate
+        self.mut_rate = mut_rate
+        self.reproduction_cycle = reproduction_cycle
+        self.birth_radius = birth_radius
+        super().__init__(nmonkeys, neagles, **kwargs)
+        if birth_radius is None:
+            self.birth_radius = self.monkey_detection_distance
+        self.predarray = predarray if predarray is not None else self.default_predarray()
+        if self.predarray.array.shape != (self.nevents, self.nacts):
+            raise ValueError('predarray must have shape {0} (it has shape {1})'.format(
+                (self.nevents, self.nacts), self.predarray.array.shape))
+        others = [int(event) for event in self.relevant_events if event != self.eagle_event]
+        if others:
+            raise ValueError('only the eagle_event row of predarray can depend on the act (events {0} do)'.format(
+                others))
+
+    def default_predarray(self) -> PredArray:
+        '''Returns a PredArray in which only eagles catch the monkeys not doing a safe act'''
+        array = np.ones((self.nevents, self.nacts))
+        array[self.eagle_event] = 0.0
+        array[self.eagle_event, list(self.safe_acts)] = 1.0
+        return PredArray(array=array)
+
+    def reset(self) -> None:
+        super().reset()
+        self.births = 0
+        self.generations = 0
+        self._monkeyarray = None
+
+    # MonkeyArray properties
+
+    @property
+    def monkeyarray(self) -> MonkeyArray:
+        '''The living monkeys as a MonkeyArray (rebuilt after every step)'''
+        if self._monkeyarray is None:
+            alive = self.alive
+            self._monkeyarray = MonkeyArray(
+                wordarray=onehot(self.event_signal[alive], self.nsignals),
+                actionarray=onehot(self.signal_act[alive], self.nacts))
+        return self._monkeyarray
+
+    @property
+    def wordcount(self) -> np.ndarray:
+        return self.monkeyarray.wordcount
+
+    @property
+    def wordconvention(self) -> np.ndarray:
+        return self.monkeyarray.wordconvention
+
+    @property
+    def actioncount(self) -> np.ndarray:
+        return self.monkeyarray.actioncount
+
+    @property
+    def actionconvention(self) -> np.ndarray:
+        return self.monkeyarray.actionconvention
+
+    @property
+    def strategychance(self) -> np.ndarray:
+        return self.monkeyarray.strategychance
+
+    @property
+    def strategyconvention(self) -> np.ndarray:
+        return self.monkeyarray.strategyconvention
+
+    @property
+    def survivalchances(self) -> np.ndarray:
+        return self.monkeyarray.survivalchances(self.predarray)
+
+    @property
+    def relevant_events(self) -> np.ndarray:
+        '''Indexes of the events in which the act changes the chance of surviving'''
+        array = self.predarray.array
+        return np.nonzero(array.max(axis=1) > array.min(axis=1))[0]
+
+    @property
+    def learned(self) -> bool:
+        '''True if the convention of every relevant event is its optimal act'''
+        events = self.relevant_events
+        return bool(np.all(
+            self.strategyconvention[events] == self.predarray.survivalstates[events]))
+
+    @property
+    def optimalchance(self) -> np.ndarray:
+        '''Chance of the optimal act in each relevant event (in the order of relevant_events)'''
+        return self.monkeyarray.optimalchance(self.predarray)[self.relevant_events]
+
+    # Phases
+
+    def hunt(self) -> np.ndarray:
+        '''The eagles attack the monkeys within reach, which survive with the chance of their act
+
+        A monkey within reach of several eagles is attacked by the one of
+        lowest index. Survival is only drawn when the chance is neither 0 nor 1.
+
+        :returns: indexes of the killed monkeys
+
+        '''
+        alive = np.nonzero(self.alive)[0]
+        eagles, caught = pairs_within(
+            self.eagles.x, self.eagles.y,
+            self.monkeys.x[alive], self.monkeys.y[alive],
+            self.eagle_detection_distance)
+        attacked, first = np.unique(alive[caught], return_index=True)
+        acts = self.state[attacked].astype(np.int64) - self.HIDDEN
+        chances = np.where(
+            acts >= 0, self.predarray.array[self.eagle_event].take(np.maximum(acts, 0)), 0.0)
+        survived = chances >= 1.0
+        uncertain = (chances > 0.0) & ~survived
+        survived[uncertain] = self.rng.random(np.count_nonzero(uncertain)) < chances[uncertain]
+        killed = attacked[~survived]
+        self.eat(killed, eagles[first][~survived])
+        return killed
+
+    def reproduce(self) -> np.ndarray:
+        '''The living monkeys have babies in the free slots
+
+        :returns: indexes of the babies
+
+        '''
+        parents = np.nonzero(self.alive)[0]
+        free = np.nonzero(~self.alive)[0]
+        number = min(int(len(parents) * (self.rep_rate - 1.0)), len(free))
+        if (not len(parents)) or (number <= 0):
+            return np.zeros(0, dtype=np.int64)
+        babies = free[:number]
+        chosen = parents[self.rng.integers(len(parents), size=number)]
+        # Inherited maps, then mutants
+        self.event_signal[babies] = self.event_signal[chosen]
+        self.signal_act[babies] = self.signal_act[chosen]
+        mutants = babies[self.rng.random(number) < self.mut_rate]
+        self.event_signal[mutants] = self.rng.integers(
+            self.nsignals, size=(len(mutants), self.nevents))
+        self.signal_act[mutants] = self.rng.integers(
+            self.nacts, size=(len(mutants), self.nsignals))
+        # Born next to their parent
+        self.monkeys.x[babies] = self.monkeys.apply_boundary(
+            self.monkeys.x[chosen] + self.rng.uniform(-1.0, 1.0, number) * self.birth_radius)
+        self.monkeys.y[babies] = self.monkeys.apply_boundary(
+            self.monkeys.y[chosen] + self.rng.uniform(-1.0, 1.0, number) * self.birth_radius)
+        self.monkeys.stop(babies)
+        self.monkeys.moving[babies] = True
+        self.state[babies] = self.ROAMING
+        self.births += number
+        self.generations += 1
+        return babies
+
+    def advance(self) -> None:
+        super().advance()
+        if not ((self.steps + 1) % self.reproduction_cycle):
+            self.reproduce()
+        self._monkeyarray = None
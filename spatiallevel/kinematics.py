@@ -0,0 +1,121 @@
+import numpy as np
+
+from typing import Tuple, Union
+
+
+def reflect(values: np.ndarray, low: float, high: float) -> np.ndarray:
+    '''Folds values into [low, high] as if they bounced off both walls
+
+    This is the closed form of reflecting repeatedly, so it works for any
+    displacement, however far out of the bounds.
+
+    '''
+    span = high - low
+    folded = np.mod(values - low, 2 * span)
+    return low + np.where(folded > span, 2 * span - folded, folded)
+
+
+def wrap(values: np.ndarray, low: float, high: float) -> np.ndarray:
+    '''Wraps values into [low, high) (periodic boundaries)'''
+    return low + np.mod(values - low, high - low)
+
+
+class Kinematics:
+    '''Positions and movement of a group of agents (e.g. monkeys or eagles)
+
+    The agents are stored as a struct of arrays: x, y, moving (which agents
+    move in the next steps), hidden (which agents are hiding) and
+    rounds_hidden (for how many steps each hidden agent has been hiding).
+    Every step moves all the moving agents at once by a random displacement
+    of at most *longest_step* along each axis and then applies the boundaries.
+    Hidden agents stay put and move again after *max_rounds_hidden* steps.
+
+    :param x: initial x coordinates
+    :param y: initial y coordinates
+    :param longest_step: maximum displacement along each axis in a step
+    :param bounds: (low, high) bounds of both axes
+    :param boundary: 'reflect' (agents bounce off the walls) or 'periodic'
+    :param max_rounds_hidden: steps until a hidden agent moves again (None means never)
+    :param moving: boolean array, True for the agents that move (default is all of them)
+
+    '''
+
+    boundaries = {
+        'reflect': reflect,
+        'periodic': wrap,
+    }
+
+    def __init__(
+            self,
+            x: np.ndarray,
+            y: np.ndarray,
+            longest_step: float,
+            bounds: Tuple[float, float],
+            boundary: str = 'reflect',
+            max_rounds_hidden: int = None,
+            moving: np.ndarray = None) -> None:
+        if boundary not in self.boundaries:
+            raise ValueError('unknown boundary {0} (must be one of {1})'.format(
+                boundary, list(self.boundaries)))
+        self.x = np.array(x, dtype=float)
+        self.y = np.array(y, dtype=float)
+        if self.x.shape != self.y.shape:
+            raise ValueError('x and y must have the same shape')
+        self.longest_step = longest_step
+        self.bounds = bounds
+        self.boundary = boundary
+        self.max_rounds_hidden = max_rounds_hidden
+        self.moving = np.ones(self.x.shape, dtype=bool) if moving is None else np.array(moving, dtype=bool)
+        self.hidden = np.zeros(self.x.shape, dtype=bool)
+        self.rounds_hidden = np.zeros(self.x.shape, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def hide(self, agents: Union[np.ndarray, list]) -> None:
+        '''Makes some agents hide (and restarts their hiding count)'''
+        self.moving[agents] = False
+        self.hidden[agents] = True
+        self.rounds_hidden[agents] = 0
+
+    def stop(self, agents: Union[np.ndarray, list]) -> None:
+        '''Makes some agents stop for good (e.g. dead monkeys)'''
+        self.moving[agents] = False
+        self.hidden[agents] = False
+        self.rounds_hidden[agents] = 0
+
+    def release(self) -> np.ndarray:
+        '''Makes the agents that have been hiding for too long move again
+
+        :returns: the indexes of the released agents
+
+        '''
+        if self.max_rounds_hidden is None:
+            return np.zeros(0, dtype=np.int64)
+        released = np.nonzero(
+            self.hidden & (self.rounds_hidden > self.max_rounds_hidden))[0]
+        self.hidden[released] = False
+        self.moving[released] = True
+        self.rounds_hidden[released] = 0
+        return released
+
+    def apply_boundary(self, values: np.ndarray) -> np.ndarray:
+        '''Returns the values after applying the boundary'''
+        return self.boundaries[self.boundary](values, *self.bounds)
+
+    def step(self, rng: np.random.Generator = None) -> np.ndarray:
+        '''Advances the agents one step
+
+        :param rng: random generator (default is np.random)
+        :returns: the indexes of the agents that stopped hiding in this step
+
+        '''
+        rng = np.random if rng is None else rng
+        self.rounds_hidden[self.hidden] += 1
+        released = self.release()
+        scale = self.longest_step * self.moving
+        self.x[...] = self.apply_boundary(
+            self.x + rng.uniform(-1.0, 1.0, size=self.x.shape) * scale)
+        self.y[...] = self.apply_boundary(
+            self.y + rng.uniform(-1.0, 1.0, size=self.y.shape) * scale)
+        return released
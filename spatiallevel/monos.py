@@ -5,6 +5,7 @@ import matplotlib.pylab as plt
 #import matplotlib
 from moviepy.video.io.bindings import mplfig_to_npimage
 import moviepy.editor as mpy
+from spatiallevel.kinematics import reflect # run from the project folder with python -m spatiallevel.monos
 #matplotlib.rcParams['text.usetex'] = True
 #matplotlib.rcParams['text.latex.unicode'] = True
 
@@ -58,27 +59,13 @@ def initialize_signal_act(mapping):
 	return mapping
 
 def move(axis):
-	for monkey in numpy.nditer(axis[:current_n,:current_n],flags=['ranged'],op_flags=['readwrite']):
-		if random.random()>0.5:
-			monkey[...]=monkey+(random.random() * longest_step)
-		else:
-			monkey[...]=monkey-(random.random() * longest_step)
-		if monkey>max_axis:
-			monkey[...]=2*max_axis-monkey
-		if monkey<-max_axis:
-			monkey[...]=-2*max_axis-monkey
+	monkeys = axis[:current_n,:current_n]
+	monkeys[...] = reflect(monkeys + numpy.random.uniform(-1.0, 1.0, monkeys.shape) * longest_step, -max_axis, max_axis)
 	return axis
 
 def move_eagle(axis):
-	for eagle in numpy.nditer(axis[:current_m],flags=['ranged'],op_flags=['readwrite']):
-		if random.random()>0.5:
-			eagle[...]=eagle+(random.random() * longest_step)
-		else:
-			eagle[...]=eagle-(random.random() * longest_step)
-		if eagle>max_axis:
-			eagle[...]=2*max_axis-eagle
-		if eagle<-max_axis:
-			eagle[...]=-2*max_axis-eagle
+	eagles = axis[:current_m]
+	eagles[...] = reflect(eagles + numpy.random.uniform(-1.0, 1.0, eagles.shape) * longest_step, -max_axis, max_axis)
 	return axis
 
 
@@ -1,12 +1,15 @@
 #from __future__ import unicode_literals
 import numpy as np
 import random
-import math
 import itertools
 import matplotlib.pylab as plt
 #import matplotlib
 from moviepy.video.io.bindings import mplfig_to_npimage
 import moviepy.editor as mpy
+from numpy.lib.recfunctions import structured_to_unstructured
+from spatiallevel.spatialindex import pairs_within # run from the project folder with python -m spatiallevel.monosparamatlab
+from spatiallevel.alarms import propagate_alarms
+from spatiallevel.kinematics import Kinematics
 #matplotlib.rcParams['text.usetex'] = True
 #matplotlib.rcParams['text.latex.unicode'] = True
 
@@ -68,6 +71,14 @@ state = np.array([1]*initial_n + [0]*(n-initial_n)) #stuff like hidden or in a t
 
 moving = np.array([1]*initial_n + [0]*(n-initial_n))
 
+# monkeys and eagles move with the same kinematics; the arrays below are updated in place
+
+monkeys = Kinematics(x_axis, y_axis, longest_step, (-max_axis, max_axis), max_rounds_hidden=max_rounds_hidden, moving=moving)
+x_axis, y_axis, moving, rounds_hidden = monkeys.x, monkeys.y, monkeys.moving, monkeys.rounds_hidden
+
+eagles = Kinematics(x_eagle, y_eagle, longest_step, (-max_axis, max_axis))
+x_eagle, y_eagle = eagles.x, eagles.y
+
 # -2 vio al aguila??
 # -1 vio a la serpiente??
 # 0 muerto
@@ -103,65 +114,12 @@ for i in range(initial_n):
  
 
 def move():
-	global x_axis
-	global y_axis
-	global state
-	global monkeys_hidden
-	global moving
-
-	# for monkey in monkeys_hidden:   ##change to array substraction
-
-	# 	if state[monkey]!=0 and state[monkey]!=1 and rounds_hidden[monkey]>max_rounds_hidden:  #shall the monkey move again?
-	# 			rounds_hidden[monkey]=0
-	# 			moving[monkey]=1
-	# 			state[monkey]=1
-
-	temp=rounds_hidden
-	temp[temp<max_rounds_hidden]=0          #change to 1 only those who have stayed put more than the max rounds
-	temp[temp>max_rounds_hidden]=1
-
-	print(temp)
-
-	moving = moving + temp                                  # change from 0 to 1 those who can move again
-
-	state = state + temp*5                                  # change from 2 and 3 to 1 the state of those that can move again
-
-	state[state > 5]=1
-
-	
-
-
-	if random.random()>0.5:
-
-		x_axis = x_axis + ((np.random.uniform(low=-1.0, high=1.0, size=(n,)) * longest_step) * moving)
-
-		y_axis = y_axis + ((np.random.uniform(low=-1.0, high=1.0, size=(n,)) * longest_step) * moving)
-
-	else:
-
-		x_axis = x_axis - ((np.random.uniform(low=-1.0, high=1.0, size=(n,)) * longest_step) * moving)
-
-		y_axis = y_axis - ((np.random.uniform(low=-1.0, high=1.0, size=(n,)) * longest_step) * moving)
-
-
-	while np.amax(x_axis)>max_axis:
-
-		x_axis[np.argmax(x_axis)] = 2*max_axis - x_axis[np.argmax(x_axis)]
-
-
-	while np.amax(x_axis)<-max_axis:
-
-		x_axis[np.argmax(x_axis)] = -2*max_axis - x_axis[np.argmax(x_axis)]
 
+	# hidden monkeys that can move again go back to roaming (a single vectorised step, see Kinematics)
 
-	while np.amax(y_axis)>max_axis:
+	released = monkeys.step()
 
-		y_axis[np.argmax(y_axis)] = 2*max_axis - y_axis[np.argmax(y_axis)]
-
-
-	while np.amax(y_axis)<-max_axis:
-
-		y_axis[np.argmax(y_axis)] = -2*max_axis - y_axis[np.argmax(y_axis)]
+	state[released] = vivo
 				
 
 
@@ -212,60 +170,15 @@ def move():
 
 def move_eagle():
 
-	global x_eagle
-	global y_eagle
-
-	if random.random()>0.5:
-
-		x_eagle = x_eagle + ((np.random.uniform(low=-1.0, high=1.0, size=(n,)) * longest_step) * moving)
-
-		y_eagle = y_eagle + ((np.random.uniform(low=-1.0, high=1.0, size=(n,)) * longest_step) * moving)
-
-	else:
-
-		x_eagle = x_eagle - ((np.random.uniform(low=-1.0, high=1.0, size=(n,)) * longest_step) * moving)
-
-		y_eagle = y_eagle - ((np.random.uniform(low=-1.0, high=1.0, size=(n,)) * longest_step) * moving)
-
-
-	while np.amax(x_eagle)>max_axis:
-
-		x_eagle[np.argmax(x_eagle)] = 2*max_axis - x_eagle[np.argmax(x_eagle)]
-
-
-	while np.amax(x_eagle)<-max_axis:
-
-		x_eagle[np.argmax(x_eagle)] = -2*max_axis - x_eagle[np.argmax(x_eagle)]
-
-
-	while np.amax(y_eagle)>max_axis:
-
-		y_eagle[np.argmax(y_eagle)] = 2*max_axis - y_eagle[np.argmax(y_eagle)]
-
-
-	while np.amax(y_eagle)<-max_axis:
-
-		y_eagle[np.argmax(y_eagle)] = -2*max_axis - y_eagle[np.argmax(y_eagle)]
+	eagles.step()
 
 def eagle_detection():
 
-	list_of_emitters=[]
-
-	for i in range(current_m):
-		
-		eagle_loc=[x_eagle[i],y_eagle[i]]
-
-		for j in range(current_n):
-		
-			monkey_loc=[x_axis[j],y_axis[j]]
-		
-			if math.sqrt((eagle_loc[0]-monkey_loc[0])**2 + (eagle_loc[1]-monkey_loc[1])**2)<eagle_detection_distance:
-				#print('detection!')
-				list_of_emitters.append(j)
-
+	# every (eagle, monkey) pair closer than eagle_detection_distance, sorted by eagle and then by monkey
 
+	eagles, list_of_emitters = pairs_within(x_eagle[:current_m], y_eagle[:current_m], x_axis[:current_n], y_axis[:current_n], eagle_detection_distance)
 
-	return list_of_emitters
+	return list(list_of_emitters)
 
 
 def game_round(list_of_emitters):
@@ -278,26 +191,17 @@ def game_round(list_of_emitters):
 
 	if len(list_of_emitters)>0:
 
-		for i in list_of_emitters:
-			number_alerted=0
-			emitter_loc=[x_axis[i],y_axis[i]]
+		emitters = np.array(list_of_emitters)
 
-			for j in range(current_n):
+		# every emitter calls the signal for the eagle (event 0), every alive monkey in range hides
 
-				if state[j]!=0:
-					
-					receiver_loc=[x_axis[j],y_axis[j]]
+		receivers, acts, heard = propagate_alarms(emitters, structured_to_unstructured(event_signal)[emitters, 0], x_axis[:current_n], y_axis[:current_n], state[:current_n]!=0, structured_to_unstructured(signal_act), monkey_detection_distance)
 
-					if math.sqrt((emitter_loc[0]-receiver_loc[0])**2 + (emitter_loc[1]-receiver_loc[1])**2)<monkey_detection_distance:
+		state[receivers] = acts + 2
+		#monkeys_hidden.extend(receivers)
+		monkeys.hide(receivers)
 
-						 
-						number_alerted+=1
-						state[j]=(signal_act[j][event_signal[i][0]])+2
-						moving[j] = 0
-						#monkeys_hidden.append(j)
-						rounds_hidden[j]+=1
-
-			#print(str(i)+' alerted '+str(number_alerted)+' other monkeys')
+		#print(str(len(emitters))+' emitters alerted '+str(len(receivers))+' other monkeys')
 
 
 
@@ -312,27 +216,15 @@ def hunt():
 	global rounds_hidden
 	global moving
 
-	exposed_monkeys=[]
+	exposed_monkeys = np.nonzero((state[:current_n]!=0) & (state[:current_n]!=arbusto))[0]
 
-	for i in range(current_n):
+	eagles, hunted = pairs_within(x_eagle[:current_m], y_eagle[:current_m], x_axis[exposed_monkeys], y_axis[exposed_monkeys], eagle_detection_distance)
+
+	killed = exposed_monkeys[hunted]
 
-		if state[i]!=0 and state[i]!=arbusto :
-			exposed_monkeys.append(i)
-
-	for i in range(current_m):
-		
-		eagle_loc=[x_eagle[i],y_eagle[i]]
-
-		for j in exposed_monkeys:
-		
-			monkey_loc=[x_axis[j],y_axis[j]]
-		
-			if math.sqrt((eagle_loc[0]-monkey_loc[0])**2 + (eagle_loc[1]-monkey_loc[1])**2)<eagle_detection_distance:
-				#print('murder!')
-				dead_monkeys.append(j)
-				moving[j]=0
-				state[j]=0
-				rounds_hidden[j]=0
+	dead_monkeys.extend(killed)
+	monkeys.stop(killed)
+	state[killed]=0
 
 
 
@@ -0,0 +1,231 @@
+import queue
+import threading
+
+import numpy as np
+
+from typing import Callable, List
+
+from .spatialgame import SpatialGame, SpatialObserver
+
+
+class MatplotlibRenderer(SpatialObserver):
+    '''Draws the game with matplotlib every time it is notified
+
+    matplotlib is only imported when a renderer is created, so the game
+    itself runs without it. The frames are drawn on a Figure of their own
+    with an Agg canvas, so the pyplot backend of the process is left alone.
+    The monkeys are a single scatter whose offsets
+    and colours are updated in place, and so are the eagles. Each drawn frame
+    is an RGB uint8 image passed to *on_frame* (by default it is kept in
+    *frames*).
+
+    :param on_frame: function which receives every frame
+    :param colors: colour of each monkey state (DEAD, ROAMING, then one per act)
+    :param figsize: size of the figure in inches
+    :param dpi: dots per inch of the figure
+
+    '''
+
+    def __init__(
+            self,
+            on_frame: Callable[[np.ndarray], None] = None,
+            colors: List[str] = None,
+            figsize: tuple = (5, 5),
+            dpi: int = 100) -> None:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.colors import to_rgba_array
+        from matplotlib.figure import Figure
+        self.Figure = Figure
+        self.FigureCanvas = FigureCanvasAgg
+        self.colors = to_rgba_array(colors or ['white', 'k', 'g', 'b', 'c', 'm', 'y'])
+        self.figsize = figsize
+        self.dpi = dpi
+        self.frames = []
+        self.on_frame = on_frame or self.frames.append
+        self.figure = None
+
+    def on_start(self, game: SpatialGame) -> None:
+        self.figure = self.Figure(figsize=self.figsize, dpi=self.dpi)
+        self.FigureCanvas(self.figure)
+        ax = self.figure.subplots()
+        ax.set_xlim(-game.max_axis, game.max_axis)
+        ax.set_ylim(-game.max_axis, game.max_axis)
+        self.monkeys = ax.scatter(game.monkeys.x, game.monkeys.y, s=4)
+        self.eagles = ax.scatter(game.eagles.x, game.eagles.y, s=16, c='r', marker='^')
+        self.on_step(game)
+
+    def on_step(self, game: SpatialGame) -> None:
+        self.monkeys.set_offsets(np.column_stack((game.monkeys.x, game.monkeys.y)))
+        self.monkeys.set_facecolor(self.colors[game.state])
+        self.eagles.set_offsets(np.column_stack((game.eagles.x, game.eagles.y)))
+        self.figure.canvas.draw()
+        self.on_frame(np.asarray(self.figure.canvas.buffer_rgba())[:, :, :3].copy())
+
+    def on_end(self, game: SpatialGame) -> None:
+        self.figure = None
+
+
+class FrameEncoder:
+    '''Encodes frames into a video or GIF in a background thread
+
+    Frames are handed over through a bounded queue, so rendering and encoding
+    overlap and the producer only waits when the encoder falls behind.
+    imageio (a moviepy dependency) is imported when the encoder starts,
+    unless another *writer* is given.
+
+    :param path: output file (its extension selects the format)
+    :param fps: frames per second
+    :param queue_size: maximum number of frames waiting to be encoded
+    :param writer: object with append_data(frame) and close() (default is an imageio writer)
+
+    '''
+
+    def __init__(
+            self,
+            path: str,
+            fps: int = 24,
+            queue_size: int = 8,
+            writer=None) -> None:
+        self.path = path
+        self.fps = fps
+        self.queue_size = queue_size
+        self.writer = writer
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.error = None
+
+    def start(self) -> None:
+        '''Opens the writer and starts the encoding thread'''
+        if self.writer is None:
+            import imageio
+            self.writer = imageio.get_writer(self.path, fps=self.fps)
+        self.thread = threading.Thread(target=self.encode, daemon=True)
+        self.thread.start()
+
+    def encode(self) -> None:
+        '''Encodes frames until a None arrives (runs in the encoding thread)'''
+        while True:
+            frame = self.queue.get()
+            if frame is None:
+                break
+            if self.error is None:
+                try:
+                    self.writer.append_data(frame)
+                except Exception as error:
+                    self.error = error
+
+    def put(self, frame: np.ndarray) -> None:
+        '''Queues a frame (waits while the queue is full)'''
+        if self.thread is None:
+            self.start()
+        if self.error is not None:
+            raise self.error
+        self.queue.put(frame)
+
+    def close(self) -> None:
+        '''Waits until every queued frame is encoded and closes the writer'''
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+            self.writer.close()
+        if self.error is not None:
+            raise self.error
+
+
+class RasterRenderer(SpatialObserver):
+    '''Rasterises the game straight into a preallocated RGB frame buffer
+
+    Every agent is a square of pixels coloured by its state, drawn with a few
+    vectorised assignments, so the cost of a frame is a few vectorised passes
+    over the monkeys, with no per-monkey Python or plotting calls. The frames
+    are written into a ring of buffers large enough to never overwrite a frame
+    still waiting in the encoder queue.
+
+    :param size: width and height of the frames in pixels
+    :param encoder: FrameEncoder which receives the frames (default keeps copies in *frames*)
+    :param monkey_size: side of a monkey in pixels
+    :param eagle_size: side of an eagle in pixels
+    :param colors: RGB colour of each monkey state (DEAD, ROAMING, then one per act)
+    :param eagle_color: RGB colour of the eagles
+    :param background: RGB colour of the background
+    :param draw_dead: whether dead monkeys are drawn
+
+    '''
+
+    def __init__(
+            self,
+            size: int = 400,
+            encoder: FrameEncoder = None,
+            monkey_size: int = 2,
+            eagle_size: int = 5,
+            colors: List[tuple] = None,
+            eagle_color: tuple = (255, 0, 0),
+            background: tuple = (255, 255, 255),
+            draw_dead: bool = False) -> None:
+        self.size = size
+        self.encoder = encoder
+        self.monkey_size = monkey_size
+        self.eagle_size = eagle_size
+        self.colors = np.array(colors or [
+            (200, 200, 200),  # dead
+            (0, 0, 0),  # roaming
+            (0, 128, 0),  # first act
+            (0, 0, 255),
+            (0, 192, 192),
+            (192, 0, 192),
+            (192, 192, 0)], dtype=np.uint8)
+        self.eagle_color = np.array(eagle_color, dtype=np.uint8)
+        self.background = np.array(background, dtype=np.uint8)
+        self.draw_dead = draw_dead
+        nbuffers = encoder.queue_size + 2 if encoder is not None else 1
+        self.buffers = np.empty((nbuffers, size, size, 3), dtype=np.uint8)
+        self.current = 0
+        self.frames = []
+
+    def pixels(self, game: SpatialGame, x: np.ndarray, y: np.ndarray) -> tuple:
+        '''Returns the rows and columns of some points (the y axis points up)'''
+        scale = (self.size - 1) / (2 * game.max_axis)
+        columns = np.clip(np.rint((x + game.max_axis) * scale), 0, self.size - 1).astype(np.int64)
+        rows = np.clip(np.rint((game.max_axis - y) * scale), 0, self.size - 1).astype(np.int64)
+        return (rows, columns)
+
+    def draw(
+            self,
+            frame: np.ndarray,
+            rows: np.ndarray,
+            columns: np.ndarray,
+            colors: np.ndarray,
+            side: int) -> None:
+        '''Draws squares of *side* pixels centred on some pixels'''
+        low = -(side // 2)
+        for dr in range(low, low + side):
+            r = np.clip(rows + dr, 0, self.size - 1)
+            for dc in range(low, low + side):
+                frame[r, np.clip(columns + dc, 0, self.size - 1)] = colors
+
+    def render(self, game: SpatialGame) -> np.ndarray:
+        '''Draws the current state of *game* into the next buffer and returns it'''
+        frame = self.buffers[self.current]
+        self.current = (self.current + 1) % len(self.buffers)
+        frame[...] = self.background
+        agents = slice(None) if self.draw_dead else np.nonzero(game.state)[0]
+        rows, columns = self.pixels(game, game.monkeys.x[agents], game.monkeys.y[agents])
+        self.draw(frame, rows, columns, self.colors[game.state[agents]], self.monkey_size)
+        rows, columns = self.pixels(game, game.eagles.x, game.eagles.y)
+        self.draw(frame, rows, columns, self.eagle_color, self.eagle_size)
+        return frame
+
+    def on_start(self, game: SpatialGame) -> None:
+        self.on_step(game)
+
+    def on_step(self, game: SpatialGame) -> None:
+        frame = self.render(game)
+        if self.encoder is not None:
+            self.encoder.put(frame)
+        else:
+            self.frames.append(frame.copy())
+
+    def on_end(self, game: SpatialGame) -> None:
+        if self.encoder is not None:
+            self.encoder.close()
@@ -0,0 +1,257 @@
+import numpy as np
+
+from typing import Tuple
+
+from .alarms import propagate_alarms
+from .kinematics import Kinematics
+from .spatialindex import pairs_within
+
+
+class SpatialObserver:
+    '''Receives the events of a spatial game
+
+    Every hook does nothing by default. Observers are attached to a SpatialGame
+    with a stride, so that on_step is only called every *stride* steps.
+
+    '''
+
+    def on_start(self, game: 'SpatialGame') -> None:
+        '''Called when *game* starts running'''
+
+    def on_step(self, game: 'SpatialGame') -> None:
+        '''Called after a step (every *stride* steps)'''
+
+    def on_end(self, game: 'SpatialGame') -> None:
+        '''Called when the run ends'''
+
+
+class SpatialGame:
+    '''Monkeys and eagles moving in a square arena, without any plotting
+
+    Every step the agents move, the monkeys that are close enough to an eagle see
+    it and call the signal for it, the monkeys that hear the call hide doing the
+    act for that signal, and the eagles eat the exposed monkeys within reach.
+
+    A monkey's state is DEAD, ROAMING or HIDDEN + a, where a is the act it is
+    doing. event_signal[j, e] is the signal monkey j calls when it perceives
+    event e and signal_act[j, s] is the act monkey j does when it hears signal
+    s. Eagles are event *eagle_event*. Slots beyond *initial_monkeys* start
+    empty (DEAD).
+
+    :param nmonkeys: maximum number of monkeys
+    :param neagles: number of eagles
+    :param initial_monkeys: number of monkeys alive at the start (default is nmonkeys)
+    :param nevents: number of events (the first one, eagle_event, is an eagle)
+    :param nsignals: number of signals
+    :param nacts: number of acts
+    :param max_axis: the arena is [-max_axis, max_axis] in both axes
+    :param longest_step: maximum monkey displacement per axis and step (default is max_axis / 15)
+    :param eagle_step: maximum eagle displacement per axis and step (default is longest_step)
+    :param eagle_detection_distance: distance at which monkeys see eagles and eagles catch monkeys
+    :param monkey_detection_distance: distance at which monkeys hear calls
+    :param max_rounds_hidden: steps until a hidden monkey moves again
+    :param safe_acts: acts which protect a monkey from eagles
+    :param eagle_event: event number of an eagle
+    :param boundary: 'reflect' or 'periodic'
+    :param seed: seed of the random generator
+
+    '''
+
+    DEAD = 0
+    ROAMING = 1
+    HIDDEN = 2
+
+    def __init__(
+            self,
+            nmonkeys: int,
+            neagles: int,
+            initial_monkeys: int = None,
+            nevents: int = 2,
+            nsignals: int = 2,
+            nacts: int = 2,
+            max_axis: float = 100.0,
+            longest_step: float = None,
+            eagle_step: float = None,
+            eagle_detection_distance: float = 1.0,
+            monkey_detection_distance: float = 10.0,
+            max_rounds_hidden: int = 2,
+            safe_acts: Tuple[int] = (0,),
+            eagle_event: int = 0,
+            boundary: str = 'reflect',
+            seed: int = None) -> None:
+        # Received parameters
+        self.nmonkeys = nmonkeys
+        self.neagles = neagles
+        self.initial_monkeys = nmonkeys if initial_monkeys is None else initial_monkeys
+        self.nevents = nevents
+        self.nsignals = nsignals
+        self.nacts = nacts
+        self.max_axis = max_axis
+        self.longest_step = longest_step if longest_step is not None else max_axis / 15
+        self.eagle_step = eagle_step if eagle_step is not None else self.longest_step
+        self.eagle_detection_distance = eagle_detection_distance
+        self.monkey_detection_distance = monkey_detection_distance
+        self.max_rounds_hidden = max_rounds_hidden
+        self.safe_acts = tuple(safe_acts)
+        self.eagle_event = eagle_event
+        self.boundary = boundary
+        self.seed = seed
+        # Observers
+        self.observers = []
+        self.reset()
+
+    def reset(self) -> None:
+        '''Puts the monkeys and eagles back at random positions with random strategies'''
+        self.rng = np.random.default_rng(self.seed)
+        n = self.nmonkeys
+        alive = np.arange(n) < self.initial_monkeys
+        self.monkeys = Kinematics(
+            self.rng.uniform(-self.max_axis, self.max_axis, n),
+            self.rng.uniform(-self.max_axis, self.max_axis, n),
+            self.longest_step,
+            (-self.max_axis, self.max_axis),
+            boundary=self.boundary,
+            max_rounds_hidden=self.max_rounds_hidden,
+            moving=alive)
+        self.eagles = Kinematics(
+            self.rng.uniform(-self.max_axis, self.max_axis, self.neagles),
+            self.rng.uniform(-self.max_axis, self.max_axis, self.neagles),
+            self.eagle_step,
+            (-self.max_axis, self.max_axis),
+            boundary=self.boundary)
+        self.state = np.where(alive, self.ROAMING, self.DEAD).astype(np.int8)
+        self.event_signal = self.rng.integers(self.nsignals, size=(n, self.nevents))
+        self.signal_act = self.rng.integers(self.nacts, size=(n, self.nsignals))
+        self.steps = 0
+        self.kills = 0
+        # Events of the last step
+        self.detections = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        self.alarmed = np.zeros(0, dtype=np.int64)
+        self.killed = np.zeros(0, dtype=np.int64)
+        self.killers = np.zeros(0, dtype=np.int64)
+
+    # Observers
+
+    def attach(self, observer: SpatialObserver, stride: int = 1) -> None:
+        '''Attaches an observer which is notified every *stride* steps'''
+        self.observers.append((observer, stride))
+
+    def detach(self, observer: SpatialObserver) -> None:
+        '''Detaches an observer'''
+        self.observers = [(obs, stride) for obs, stride in self.observers if obs is not observer]
+
+    # Properties
+
+    @property
+    def alive(self) -> np.ndarray:
+        '''Boolean array, True for the monkeys that are alive'''
+        return self.state != self.DEAD
+
+    @property
+    def nalive(self) -> int:
+        '''Number of monkeys alive'''
+        return int(np.count_nonzero(self.state))
+
+    @property
+    def exposed(self) -> np.ndarray:
+        '''Boolean array, True for the monkeys that eagles can catch'''
+        exposed = self.alive
+        for act in self.safe_acts:
+            exposed &= (self.state != self.HIDDEN + act)
+        return exposed
+
+    # Phases
+
+    def move(self) -> None:
+        '''Moves monkeys and eagles (hidden monkeys may start roaming again)'''
+        released = self.monkeys.step(self.rng)
+        self.state[released] = self.ROAMING
+        self.eagles.step(self.rng)
+
+    def detect(self) -> Tuple[np.ndarray, np.ndarray]:
+        '''Finds the monkeys that see an eagle
+
+        :returns: arrays E, M where eagle E[k] is seen by monkey M[k]
+
+        '''
+        candidates = np.nonzero(self.alive)[0]
+        eagles, seen_by = pairs_within(
+            self.eagles.x, self.eagles.y,
+            self.monkeys.x[candidates], self.monkeys.y[candidates],
+            self.eagle_detection_distance)
+        self.detections = (eagles, candidates[seen_by])
+        return self.detections
+
+    def alarm(self, emitters: np.ndarray) -> np.ndarray:
+        '''The emitters call the signal for an eagle and the monkeys that hear it hide
+
+        :returns: indexes of the alarmed monkeys
+
+        '''
+        if not len(emitters):
+            self.alarmed = np.zeros(0, dtype=np.int64)
+            return self.alarmed
+        receivers, acts, _ = propagate_alarms(
+            emitters,
+            self.event_signal[emitters, self.eagle_event],
+            self.monkeys.x,
+            self.monkeys.y,
+            self.alive,
+            self.signal_act,
+            self.monkey_detection_distance)
+        self.state[receivers] = self.HIDDEN + acts
+        self.monkeys.hide(receivers)
+        self.alarmed = receivers
+        return receivers
+
+    def hunt(self) -> np.ndarray:
+        '''The eagles eat the exposed monkeys within reach
+
+        A monkey within reach of several eagles is eaten by the one of lowest
+        index (killers holds the eagle of each killed monkey).
+
+        :returns: indexes of the killed monkeys
+
+        '''
+        exposed = np.nonzero(self.exposed)[0]
+        eagles, caught = pairs_within(
+            self.eagles.x, self.eagles.y,
+            self.monkeys.x[exposed], self.monkeys.y[exposed],
+            self.eagle_detection_distance)
+        killed, first = np.unique(exposed[caught], return_index=True)
+        self.eat(killed, eagles[first])
+        return killed
+
+    def eat(self, killed: np.ndarray, killers: np.ndarray) -> None:
+        '''Some monkeys are eaten, each by an eagle of *killers*'''
+        self.state[killed] = self.DEAD
+        self.monkeys.stop(killed)
+        self.kills += len(killed)
+        self.killed = killed
+        self.killers = killers
+
+    def advance(self) -> None:
+        '''Runs the phases of a step'''
+        self.move()
+        _, emitters = self.detect()
+        self.alarm(emitters)
+        self.hunt()
+
+    def step(self) -> None:
+        '''Advances the game one step'''
+        self.advance()
+        self.steps += 1
+        for observer, stride in self.observers:
+            if not (self.steps % stride):
+                observer.on_step(self)
+
+    def run(self, nsteps: int) -> None:
+        '''Runs *nsteps* steps (or until every monkey is dead)'''
+        for observer, _ in self.observers:
+            observer.on_start(self)
+        for _ in range(nsteps):
+            if not self.nalive:
+                break
+            self.step()
+        for observer, _ in self.observers:
+            observer.on_end(self)
@@ -0,0 +1,120 @@
+import numpy as np
+
+from typing import Tuple
+
+
+class CellList:
+    '''A uniform grid of square cells holding the indexes of a set of points
+
+    The points are sorted by cell, so the points of a cell are a contiguous
+    range of *order*. A query only looks at the cells around each query point,
+    so its cost grows with the number of nearby pairs instead of the number of
+    query points times the number of points.
+
+    :param x: x coordinates of the points
+    :param y: y coordinates of the points
+    :param cell_size: side of a cell (a good choice is the query radius)
+
+    '''
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, cell_size: float) -> None:
+        if cell_size <= 0:
+            raise ValueError('the cell size must be positive')
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.cell_size = cell_size
+        if len(self.x):
+            self.origin = (np.amin(self.x), np.amin(self.y))
+        else:
+            self.origin = (0.0, 0.0)
+        cx, cy = self.cell_coordinates(self.x, self.y)
+        self.shape = (
+            int(np.amax(cx)) + 1 if len(cx) else 1,
+            int(np.amax(cy)) + 1 if len(cy) else 1)
+        keys = cx * self.shape[1] + cy
+        # Query results are sorted at the end, so the order inside a cell does not matter
+        self.order = np.argsort(keys)
+        self.sortedkeys = keys[self.order]
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def cell_coordinates(
+            self,
+            x: np.ndarray,
+            y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        '''Returns the (possibly out of the grid) cell coordinates of some points'''
+        return (
+            np.floor((x - self.origin[0]) / self.cell_size).astype(np.int64),
+            np.floor((y - self.origin[1]) / self.cell_size).astype(np.int64))
+
+    def query(
+            self,
+            x: np.ndarray,
+            y: np.ndarray,
+            radius: float) -> Tuple[np.ndarray, np.ndarray]:
+        '''Finds every pair of a query point and a point closer than *radius*
+
+        :param x: x coordinates of the query points
+        :param y: y coordinates of the query points
+        :param radius: maximum (excluded) distance
+        :returns: arrays Q, P where query point Q[k] is closer than radius to point P[k], sorted by Q and then P
+
+        '''
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        if (not len(x)) or (not len(self)):
+            return empty
+        reach = int(np.ceil(radius / self.cell_size))
+        offsets = np.arange(-reach, reach + 1)
+        qcx, qcy = self.cell_coordinates(x, y)
+        # Neighbouring cells of every query point, shape (nqueries, ncells)
+        ncx = (qcx.reshape(-1, 1, 1) + offsets.reshape(1, -1, 1)).repeat(
+            len(offsets), axis=2).reshape(len(x), -1)
+        ncy = (qcy.reshape(-1, 1, 1) + offsets.reshape(1, 1, -1)).repeat(
+            len(offsets), axis=1).reshape(len(x), -1)
+        valid = (ncx >= 0) & (ncx < self.shape[0]) & (ncy >= 0) & (ncy < self.shape[1])
+        queries = np.nonzero(valid)[0]
+        keys = ncx[valid] * self.shape[1] + ncy[valid]
+        # Ranges of points in those cells
+        first = np.searchsorted(self.sortedkeys, keys, side='left')
+        counts = np.searchsorted(self.sortedkeys, keys, side='right') - first
+        total = int(np.sum(counts))
+        if not total:
+            return empty
+        starts = np.cumsum(counts) - counts
+        positions = np.arange(total) - np.repeat(starts - first, counts)
+        candidates_q = np.repeat(queries, counts)
+        candidates_p = self.order[positions]
+        # Exact distances
+        close = ((x[candidates_q] - self.x[candidates_p]) ** 2 + (
+            y[candidates_q] - self.y[candidates_p]) ** 2) < radius ** 2
+        q = candidates_q[close]
+        p = candidates_p[close]
+        order = np.lexsort((p, q))
+        return (q[order], p[order])
+
+
+def pairs_within(
+        ax: np.ndarray,
+        ay: np.ndarray,
+        bx: np.ndarray,
+        by: np.ndarray,
+        radius: float) -> Tuple[np.ndarray, np.ndarray]:
+    '''Finds every pair of a point a and a point b closer than *radius*
+
+    :returns: arrays A, B where a point A[k] is closer than radius to b point B[k], sorted by A and then B
+
+    '''
+    return CellList(bx, by, cell_size=radius).query(ax, ay, radius)
+
+
+def within_any(
+        ax: np.ndarray,
+        ay: np.ndarray,
+        bx: np.ndarray,
+        by: np.ndarray,
+        radius: float) -> np.ndarray:
+    '''Returns the sorted indexes of the b points closer than *radius* to any a point'''
+    return np.unique(pairs_within(ax, ay, bx, by, radius)[1])
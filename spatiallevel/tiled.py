@@ -0,0 +1,488 @@
+import multiprocessing
+import threading
+import traceback
+
+import numpy as np
+
+from multiprocessing import shared_memory
+from typing import Dict, Tuple
+
+from .alarms import propagate_alarms
+from .kinematics import Kinematics
+from .spatialgame import SpatialGame
+from .spatialindex import pairs_within
+
+
+class SharedArrays:
+    '''Numpy arrays stored in shared memory blocks
+
+    The process that creates the arrays owns the blocks and unlinks them when
+    it closes; other processes attach to the same blocks by name.
+
+    :param specs: shape and dtype of each array
+    :param names: names of the blocks to attach to (default creates new blocks)
+
+    '''
+
+    def __init__(
+            self,
+            specs: Dict[str, Tuple[tuple, str]],
+            names: Dict[str, str] = None) -> None:
+        self.specs = specs
+        self.owner = names is None
+        self.blocks = {}
+        self.arrays = {}
+        for key, (shape, dtype) in specs.items():
+            if self.owner:
+                size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+                block = shared_memory.SharedMemory(create=True, size=size)
+            else:
+                block = shared_memory.SharedMemory(name=names[key])
+            self.blocks[key] = block
+            self.arrays[key] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+    @property
+    def names(self) -> Dict[str, str]:
+        '''Names of the blocks'''
+        return {key: block.name for key, block in self.blocks.items()}
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.arrays[key]
+
+    def close(self) -> None:
+        '''Detaches from the blocks (and unlinks them if they are owned)
+
+        Every view of the arrays must have been dropped before.
+
+        '''
+        self.arrays = {}
+        for block in self.blocks.values():
+            block.close()
+            if self.owner:
+                block.unlink()
+        self.blocks = {}
+
+
+class TileWorker:
+    '''Steps the agents of a tile of the arena (runs in a worker process)
+
+    The arena is split into *ntiles* vertical strips and a worker owns the
+    monkeys whose x coordinate lies in its strip. It keeps the indexes of its
+    monkeys, so every phase only touches them: after moving, the monkeys which
+    crossed a border are handed to their new tile through a shared mailbox,
+    and the calling monkeys close enough to a border to be heard in another
+    strip are published in a shared halo list. A phase thus costs
+    O(nmonkeys / ntiles) plus the monkeys crossing or calling near the
+    borders. The eagles are few, so every tile reads all of them and moves the
+    ones in its strip.
+
+    The mailbox and halo list of a tile are written into the exchange arrays
+    (see exchange_specs) from the sum of the counts of monkeys of the tiles
+    before it, since a tile never hands over or publishes more monkeys than
+    it owns. A worker only writes the agents it owns, so the phases only need
+    a barrier between them.
+
+    '''
+
+    def __init__(
+            self,
+            tile: int,
+            ntiles: int,
+            arrays: SharedArrays,
+            params: dict) -> None:
+        self.tile = tile
+        self.ntiles = ntiles
+        self.arrays = arrays
+        self.params = params
+        low, high = params['bounds']
+        self.width = (high - low) / ntiles
+        self.low = low + tile * self.width
+        self.high = self.low + self.width
+        self.boundary = Kinematics.boundaries[params['boundary']]
+        self.rng = np.random.default_rng(
+            np.random.SeedSequence(params['seed'], spawn_key=(tile,)))
+        self.kills = 0
+        # The only scan of every monkey, when the worker starts
+        self.own = np.nonzero(self.owned(arrays['x']))[0]
+        self.own_eagles = np.nonzero(self.owned(arrays['eagle_x']))[0]
+        arrays['counts'][tile] = len(self.own)
+        self.alive = np.zeros(0, dtype=np.int64)
+        self.emitters = np.zeros(0, dtype=np.int64)
+
+    @staticmethod
+    def exchange_specs(nmonkeys: int, ntiles: int) -> Dict[str, Tuple[tuple, str]]:
+        '''Returns the shape and dtype of the arrays through which the tiles exchange monkeys'''
+        return {
+            'counts': ((ntiles,), '<i8'),  # monkeys owned by each tile
+            'moffsets': ((ntiles,), '<i8'),  # start of the mailbox of each tile
+            'nleavers': ((ntiles,), '<i8'),  # monkeys in the mailbox of each tile
+            'migrants': ((nmonkeys,), '<i8'),  # monkeys which crossed a border
+            'destinations': ((nmonkeys,), '<i8'),  # tile of each migrant
+            'nhalo': ((ntiles,), '<i8'),  # monkeys in the halo list of each tile
+            'halo': ((nmonkeys,), '<i8'),  # calling monkeys near a border
+        }
+
+    def tiles(self, x: np.ndarray) -> np.ndarray:
+        '''Returns the tile in which each point lies'''
+        low, _ = self.params['bounds']
+        return np.clip(((x - low) // self.width).astype(np.int64), 0, self.ntiles - 1)
+
+    def owned(self, x: np.ndarray) -> np.ndarray:
+        '''Returns True for the points that lie in this tile'''
+        return self.tiles(x) == self.tile
+
+    def offsets(self) -> np.ndarray:
+        '''Returns the start of the region of each tile in the exchange arrays'''
+        counts = self.arrays['counts']
+        return np.cumsum(counts) - counts
+
+    def move(self) -> None:
+        a = self.arrays
+        p = self.params
+        own = self.own
+        # Hidden monkeys which have been hiding for too long are released
+        hidden = own[a['hidden'][own]]
+        a['rounds_hidden'][hidden] += 1
+        released = hidden[a['rounds_hidden'][hidden] > p['max_rounds_hidden']]
+        a['hidden'][released] = False
+        a['moving'][released] = True
+        a['rounds_hidden'][released] = 0
+        a['state'][released] = SpatialGame.ROAMING
+        scale = p['longest_step'] * a['moving'][own]
+        for axis in ('x', 'y'):
+            a[axis][own] = self.boundary(
+                a[axis][own] + self.rng.uniform(-1.0, 1.0, len(own)) * scale, *p['bounds'])
+        for axis in ('eagle_x', 'eagle_y'):
+            a[axis][self.own_eagles] = self.boundary(
+                a[axis][self.own_eagles]
+                + self.rng.uniform(-1.0, 1.0, len(self.own_eagles)) * p['eagle_step'],
+                *p['bounds'])
+        # Monkeys which crossed a border go to the mailbox
+        tiles = self.tiles(a['x'][own])
+        leaving = tiles != self.tile
+        start = int(self.offsets()[self.tile])
+        stop = start + int(np.count_nonzero(leaving))
+        a['migrants'][start:stop] = own[leaving]
+        a['destinations'][start:stop] = tiles[leaving]
+        a['moffsets'][self.tile] = start
+        a['nleavers'][self.tile] = stop - start
+        self.own = own[~leaving]
+
+    def receive(self) -> None:
+        '''Takes the monkeys which crossed into this tile from the mailboxes'''
+        a = self.arrays
+        arrivals = []
+        for tile in range(self.ntiles):
+            start = a['moffsets'][tile]
+            stop = start + a['nleavers'][tile]
+            if (tile != self.tile) and (stop > start):
+                arrivals.append(a['migrants'][start:stop][a['destinations'][start:stop] == self.tile])
+        if arrivals:
+            arrivals = np.sort(np.concatenate(arrivals))
+            self.own = np.insert(self.own, np.searchsorted(self.own, arrivals), arrivals)
+        a['counts'][self.tile] = len(self.own)
+
+    def detect(self) -> None:
+        a = self.arrays
+        p = self.params
+        self.receive()
+        self.alive = self.own[a['state'][self.own] != SpatialGame.DEAD]
+        _, seen_by = pairs_within(
+            a['eagle_x'], a['eagle_y'], a['x'][self.alive], a['y'][self.alive],
+            p['eagle_detection_distance'])
+        self.emitters = self.alive[np.unique(seen_by)]
+
+    def publish(self) -> None:
+        '''Publishes the calling monkeys which can be heard in another strip'''
+        a = self.arrays
+        radius = self.params['monkey_detection_distance']
+        x = a['x'][self.emitters]
+        border = self.emitters[(x < self.low + radius) | (x >= self.high - radius)]
+        start = int(self.offsets()[self.tile])
+        a['halo'][start:start + len(border)] = border
+        a['nhalo'][self.tile] = len(border)
+
+    def alarm(self) -> None:
+        a = self.arrays
+        p = self.params
+        radius = p['monkey_detection_distance']
+        calls = [self.emitters]
+        for tile, start in enumerate(self.offsets()):
+            if tile != self.tile:
+                halo = a['halo'][start:start + a['nhalo'][tile]]
+                x = a['x'][halo]
+                calls.append(halo[(x >= self.low - radius) & (x < self.high + radius)])
+        # Emitters call in the order of their indexes, whatever their tile
+        emitters = np.sort(np.concatenate(calls))
+        if not len(emitters):
+            return
+        points = np.concatenate((emitters, self.alive))
+        receivers, acts, _ = propagate_alarms(
+            np.arange(len(emitters)),
+            a['event_signal'][emitters, p['eagle_event']],
+            a['x'][points], a['y'][points],
+            np.arange(len(points)) >= len(emitters),
+            a['signal_act'][points], radius)
+        receivers = points[receivers]
+        a['state'][receivers] = SpatialGame.HIDDEN + acts
+        a['moving'][receivers] = False
+        a['hidden'][receivers] = True
+        a['rounds_hidden'][receivers] = 0
+
+    def hunt(self) -> None:
+        a = self.arrays
+        p = self.params
+        state = a['state'][self.own]
+        exposed = state != SpatialGame.DEAD
+        for act in p['safe_acts']:
+            exposed &= (state != SpatialGame.HIDDEN + act)
+        exposed = self.own[exposed]
+        _, caught = pairs_within(
+            a['eagle_x'], a['eagle_y'], a['x'][exposed], a['y'][exposed],
+            p['eagle_detection_distance'])
+        killed = np.unique(exposed[caught])
+        a['state'][killed] = SpatialGame.DEAD
+        a['moving'][killed] = False
+        a['hidden'][killed] = False
+        a['rounds_hidden'][killed] = 0
+        self.kills += len(killed)
+        # Eagles do not move before the next step, so every tile knows its eagles
+        self.own_eagles = np.nonzero(self.owned(a['eagle_x']))[0]
+
+    def step(self, barrier: multiprocessing.Barrier) -> None:
+        '''Runs the phases of a step, waiting for the other tiles after each one'''
+        for phase in (self.move, self.detect, self.publish, self.alarm, self.hunt):
+            phase()
+            barrier.wait()
+
+
+def _run_tile(
+        tile: int,
+        ntiles: int,
+        names: Dict[str, str],
+        specs: dict,
+        params: dict,
+        barrier: multiprocessing.Barrier,
+        connection) -> None:
+    '''Main loop of a worker process: runs steps until it is told to stop
+
+    An error is sent back to the game, after breaking the barrier so that the
+    other workers stop waiting for this one.
+
+    '''
+    arrays = SharedArrays(specs, names)
+    worker = None
+    try:
+        worker = TileWorker(tile, ntiles, arrays, params)
+        # Every tile must have counted its monkeys
+        barrier.wait()
+        while True:
+            command, argument = connection.recv()
+            if command != 'run':
+                break
+            for _ in range(argument):
+                worker.step(barrier)
+            connection.send(('done', tile, worker.kills))
+    except Exception as error:
+        barrier.abort()
+        connection.send(('error', tile, error, traceback.format_exc()))
+    finally:
+        worker = None
+        arrays.close()
+        connection.close()
+
+
+class TiledSpatialGame(SpatialGame):
+    '''SpatialGame stepped by several processes, each one owning a tile of the arena
+
+    The agents live in shared memory (see SharedArrays) and the arena is split
+    into *ntiles* vertical strips, each one stepped by a worker process (see
+    TileWorker). Alarms heard across a border are found in the halo lists of
+    the calling monkeys within monkey_detection_distance of each border.
+
+    The workers start on the first step and stop with close (or at the end of
+    a with block). Results are reproducible for a given seed and number of
+    tiles. The detections, alarmed and killed arrays of the last step are not
+    collected. If a worker fails (or dies), the others are released from the
+    barrier, the workers are stopped and the error is raised by advance; the
+    agents are left as they were in the interrupted step.
+
+    :param ntiles: number of tiles and worker processes (default is the number of CPUs)
+
+    The rest of the parameters are the ones of SpatialGame.
+
+    '''
+
+    def __init__(self, nmonkeys: int, neagles: int, ntiles: int = None, **kwargs) -> None:
+        self.ntiles = ntiles or multiprocessing.cpu_count()
+        self.shared = None
+        self.barrier = None
+        self.workers = []
+        self.connections = []
+        super().__init__(nmonkeys, neagles, **kwargs)
+
+    def __enter__(self) -> 'TiledSpatialGame':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def reset(self) -> None:
+        self.close()
+        super().reset()
+        self.basekills = 0
+
+    @property
+    def params(self) -> dict:
+        '''Parameters sent to the workers'''
+        return {
+            'bounds': (-self.max_axis, self.max_axis),
+            'boundary': self.boundary,
+            'longest_step': self.longest_step,
+            'eagle_step': self.eagle_step,
+            'max_rounds_hidden': self.max_rounds_hidden,
+            'eagle_detection_distance': self.eagle_detection_distance,
+            'monkey_detection_distance': self.monkey_detection_distance,
+            'safe_acts': self.safe_acts,
+            'eagle_event': self.eagle_event,
+            'seed': self.seed if self.seed is not None else int(self.rng.integers(2 ** 63 - 1)),
+        }
+
+    def start(self) -> None:
+        '''Moves the agents into shared memory and starts the workers'''
+        if self.shared is not None:
+            return
+        sources = {
+            'x': self.monkeys.x,
+            'y': self.monkeys.y,
+            'moving': self.monkeys.moving,
+            'hidden': self.monkeys.hidden,
+            'rounds_hidden': self.monkeys.rounds_hidden,
+            'state': self.state,
+            'event_signal': self.event_signal,
+            'signal_act': self.signal_act,
+            'eagle_x': self.eagles.x,
+            'eagle_y': self.eagles.y,
+        }
+        specs = {key: (array.shape, array.dtype.str) for key, array in sources.items()}
+        specs.update(TileWorker.exchange_specs(self.nmonkeys, self.ntiles))
+        self.shared = SharedArrays(specs)
+        for key, array in sources.items():
+            self.shared[key][...] = array
+        self.bind(self.shared.arrays)
+        self.barrier = multiprocessing.Barrier(self.ntiles)
+        params = self.params
+        for tile in range(self.ntiles):
+            parent, child = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=_run_tile,
+                args=(tile, self.ntiles, self.shared.names, specs, params, self.barrier, child),
+                daemon=True)
+            worker.start()
+            # Only the worker keeps its end, so its death is seen as the end of the pipe
+            child.close()
+            self.workers.append(worker)
+            self.connections.append(parent)
+
+    def bind(self, arrays: Dict[str, np.ndarray]) -> None:
+        '''Makes the game's arrays point to *arrays*'''
+        self.monkeys.x = arrays['x']
+        self.monkeys.y = arrays['y']
+        self.monkeys.moving = arrays['moving']
+        self.monkeys.hidden = arrays['hidden']
+        self.monkeys.rounds_hidden = arrays['rounds_hidden']
+        self.state = arrays['state']
+        self.event_signal = arrays['event_signal']
+        self.signal_act = arrays['signal_act']
+        self.eagles.x = arrays['eagle_x']
+        self.eagles.y = arrays['eagle_y']
+
+    def close(self) -> None:
+        '''Stops the workers and moves the agents back to private memory'''
+        if self.shared is None:
+            return
+        self.kills = self.basekills = self.kills
+        for connection in self.connections:
+            try:
+                connection.send(('stop', None))
+            except OSError:
+                # The worker stopped after an error
+                pass
+        for worker in self.workers:
+            worker.join()
+        for connection in self.connections:
+            connection.close()
+        self.workers = []
+        self.connections = []
+        self.barrier = None
+        exchange = TileWorker.exchange_specs(self.nmonkeys, self.ntiles)
+        self.bind({key: array.copy() for key, array in self.shared.arrays.items()
+                   if key not in exchange})
+        self.shared.close()
+        self.shared = None
+
+    def receive(self, tile: int) -> tuple:
+        '''Waits for the answer of the worker of a tile
+
+        A dead worker would leave the others waiting at the barrier forever,
+        so the barrier is broken as soon as one is found, and the answer of a
+        worker which died without answering is an error.
+
+        '''
+        worker = self.workers[tile]
+        connection = self.connections[tile]
+        while not connection.poll(1.0):
+            if not all(other.is_alive() for other in self.workers):
+                self.barrier.abort()
+        try:
+            return connection.recv()
+        except EOFError:
+            self.barrier.abort()
+            worker.join()
+            error = RuntimeError('the worker of tile {0} exited with code {1}'.format(
+                tile, worker.exitcode))
+            return ('error', tile, error, '')
+
+    def advance(self, nsteps: int = 1) -> None:
+        '''Runs *nsteps* steps in the workers (the error of a failed worker is raised)'''
+        self.start()
+        for connection in self.connections:
+            try:
+                connection.send(('run', nsteps))
+            except OSError:
+                # The worker is dead, which receive reports
+                pass
+        answers = [self.receive(tile) for tile in range(self.ntiles)]
+        errors = [answer for answer in answers if answer[0] == 'error']
+        if errors:
+            self.close()
+            # Workers which were waiting at the broken barrier only report that
+            errors.sort(key=lambda answer: isinstance(answer[2], threading.BrokenBarrierError))
+            _, tile, error, text = errors[0]
+            raise error from RuntimeError('in the worker of tile {0}\n{1}'.format(tile, text))
+        self.kills = self.basekills + sum(kills for _, _, kills in answers)
+
+    def run(self, nsteps: int) -> None:
+        '''Runs *nsteps* steps (or until every monkey is dead)
+
+        The workers run without interruption until the next step an observer
+        must be notified of.
+
+        '''
+        for observer, _ in self.observers:
+            observer.on_start(self)
+        remaining = nsteps
+        while (remaining > 0) and self.nalive:
+            # Up to the next step of any observer
+            chunk = min(
+                [stride - self.steps % stride for _, stride in self.observers],
+                default=remaining)
+            chunk = min(chunk, remaining)
+            self.advance(chunk)
+            self.steps += chunk
+            remaining -= chunk
+            for observer, observer_stride in self.observers:
+                if not (self.steps % observer_stride):
+                    observer.on_step(self)
+        for observer, _ in self.observers:
+            observer.on_end(self)
@@ -0,0 +1,266 @@
+import json
+import os
+
+import numpy as np
+
+from typing import List, Tuple
+
+from .rendering import FrameEncoder
+from .spatialgame import SpatialGame, SpatialObserver
+
+# Kinds of events
+DETECTION = 0  # agent is a monkey which saw eagle other
+ALARM = 1  # agent is a monkey which heard an alarm and hid in state other
+KILL = 2  # agent is a monkey eaten by eagle other
+
+EVENT_DTYPE = np.dtype([
+    ('step', np.int64),
+    ('kind', np.int8),
+    ('agent', np.int64),
+    ('other', np.int64)])
+
+
+def frame_dtype(nmonkeys: int, neagles: int) -> np.dtype:
+    '''Returns the dtype of a frame of a trajectory'''
+    return np.dtype([
+        ('step', np.int64),
+        ('monkeys', np.float32, (nmonkeys, 2)),
+        ('state', np.int8, (nmonkeys,)),
+        ('eagles', np.float32, (neagles, 2))])
+
+
+def trajectory_paths(path: str) -> Tuple[str, str, str]:
+    '''Returns the paths of the metadata, frames and events of a trajectory'''
+    return (path + '.json', path + '.frames', path + '.events')
+
+
+class TrajectoryFile:
+    '''Appends frames and events to the files of a trajectory
+
+    This is the writer of the FrameEncoder used by TrajectoryWriter, so it
+    runs in the encoder's background thread.
+
+    '''
+
+    def __init__(self, path: str) -> None:
+        _, frames, events = trajectory_paths(path)
+        self.frames = open(frames, 'ab')
+        self.events = open(events, 'ab')
+
+    def append_data(self, record: Tuple[np.ndarray, np.ndarray]) -> None:
+        frame, events = record
+        if frame is not None:
+            self.frames.write(frame.tobytes())
+        if len(events):
+            self.events.write(events.tobytes())
+
+    def close(self) -> None:
+        self.frames.close()
+        self.events.close()
+
+
+class TrajectoryWriter(SpatialObserver):
+    '''Records a spatial game into a trajectory (see Trajectory)
+
+    Every *frame_interval* notified steps a frame with the positions (float32)
+    and states (int8) is stored; the detections, alarms and kills of every
+    notified step are stored as events. The observer must be attached with
+    stride 1 to record every event. Records are written by a background
+    thread (a FrameEncoder), so the step loop only copies the arrays.
+
+    A game can be recorded over several runs into the same trajectory as long
+    as it is not reset in between: steps must keep growing, since frames and
+    events are looked up by step (a reset game needs a new trajectory).
+
+    :param path: path of the trajectory (the files are path.json, path.frames and path.events)
+    :param frame_interval: number of steps between two frames
+    :param queue_size: maximum number of records waiting to be written
+
+    '''
+
+    def __init__(self, path: str, frame_interval: int = 1, queue_size: int = 64) -> None:
+        self.path = path
+        self.frame_interval = frame_interval
+        self.queue_size = queue_size
+        self.encoder = None
+        self.dtype = None
+
+    def on_start(self, game: SpatialGame) -> None:
+        meta, _, _ = trajectory_paths(self.path)
+        metadata = {
+            'nmonkeys': game.nmonkeys,
+            'neagles': game.neagles,
+            'max_axis': game.max_axis,
+        }
+        if os.path.exists(meta):
+            with open(meta) as file:
+                if json.load(file) != metadata:
+                    raise ValueError('{0} is the trajectory of a different game'.format(self.path))
+            last = self.last_step()
+            if (last is not None) and ((game.steps < last) or not game.steps):
+                raise ValueError('{0} ends at step {1}, the game is at step {2} (was it reset?)'.format(
+                    self.path, last, game.steps))
+        else:
+            with open(meta, 'w') as file:
+                json.dump(metadata, file)
+        self.dtype = frame_dtype(game.nmonkeys, game.neagles)
+        self.encoder = FrameEncoder(
+            self.path, queue_size=self.queue_size, writer=TrajectoryFile(self.path))
+        if not game.steps:
+            self.encoder.put((self.frame(game), np.zeros(0, dtype=EVENT_DTYPE)))
+
+    def last_step(self) -> int:
+        '''Returns the last step recorded in the trajectory (None if it is empty)'''
+        trajectory = Trajectory(self.path)
+        steps = np.concatenate([trajectory.steps, trajectory.eventrecords['step']])
+        return int(steps.max()) if len(steps) else None
+
+    def frame(self, game: SpatialGame) -> np.ndarray:
+        '''Returns the current frame of *game*'''
+        frame = np.zeros(1, dtype=self.dtype)
+        frame['step'] = game.steps
+        frame['monkeys'][0, :, 0] = game.monkeys.x
+        frame['monkeys'][0, :, 1] = game.monkeys.y
+        frame['state'][0] = game.state
+        frame['eagles'][0, :, 0] = game.eagles.x
+        frame['eagles'][0, :, 1] = game.eagles.y
+        return frame
+
+    @staticmethod
+    def events(game: SpatialGame) -> np.ndarray:
+        '''Returns the events of the last step of *game*'''
+        eagles, seers = game.detections
+        kinds = [
+            (DETECTION, seers, eagles),
+            (ALARM, game.alarmed, game.state[game.alarmed]),
+            (KILL, game.killed, game.killers)]
+        events = np.zeros(sum(len(agents) for _, agents, _ in kinds), dtype=EVENT_DTYPE)
+        events['step'] = game.steps
+        start = 0
+        for kind, agents, others in kinds:
+            stop = start + len(agents)
+            events['kind'][start:stop] = kind
+            events['agent'][start:stop] = agents
+            events['other'][start:stop] = others
+            start = stop
+        return events
+
+    def on_step(self, game: SpatialGame) -> None:
+        frame = self.frame(game) if not (game.steps % self.frame_interval) else None
+        self.encoder.put((frame, self.events(game)))
+
+    def on_end(self, game: SpatialGame) -> None:
+        self.encoder.close()
+        self.encoder = None
+
+
+class Positions:
+    '''x and y coordinates of a group of agents in a frame'''
+
+    def __init__(self, xy: np.ndarray) -> None:
+        self.x = xy[:, 0]
+        self.y = xy[:, 1]
+
+
+class TrajectoryFrame:
+    '''A frame of a trajectory, with the attributes observers read from a game
+
+    :param frame: record of the frame
+    :param max_axis: the arena is [-max_axis, max_axis] in both axes
+
+    '''
+
+    def __init__(self, frame: np.ndarray, max_axis: float) -> None:
+        self.steps = int(frame['step'])
+        self.monkeys = Positions(frame['monkeys'])
+        self.eagles = Positions(frame['eagles'])
+        self.state = frame['state']
+        self.max_axis = max_axis
+        self.nmonkeys = len(self.state)
+        self.neagles = len(self.eagles.x)
+
+    @property
+    def alive(self) -> np.ndarray:
+        return self.state != SpatialGame.DEAD
+
+    @property
+    def nalive(self) -> int:
+        return int(np.count_nonzero(self.state))
+
+
+class Trajectory:
+    '''Reads a trajectory recorded by TrajectoryWriter without loading it
+
+    Frames and events are memory-mapped, so any frame can be read directly.
+    The frames written so far are visible even while the game is still
+    being recorded (reopen the trajectory to see new ones).
+
+    :param path: path of the trajectory
+
+    '''
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        meta, frames, events = trajectory_paths(path)
+        with open(meta) as file:
+            self.metadata = json.load(file)
+        self.max_axis = self.metadata['max_axis']
+        self.frames = self.memmap(frames, frame_dtype(
+            self.metadata['nmonkeys'], self.metadata['neagles']))
+        self.eventrecords = self.memmap(events, EVENT_DTYPE)
+
+    @staticmethod
+    def memmap(path: str, dtype: np.dtype) -> np.ndarray:
+        '''Maps the complete records of a file'''
+        size = os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0
+        if not size:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=(size,))
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def __getitem__(self, index: int) -> TrajectoryFrame:
+        return TrajectoryFrame(self.frames[index], self.max_axis)
+
+    @property
+    def steps(self) -> np.ndarray:
+        '''Step of each frame'''
+        return self.frames['step']
+
+    def seek(self, step: int) -> TrajectoryFrame:
+        '''Returns the last frame recorded at or before *step*'''
+        index = np.searchsorted(self.steps, step, side='right') - 1
+        if index < 0:
+            raise IndexError('there are no frames before step {0}'.format(step))
+        return self[index]
+
+    def events(self, start: int = 0, stop: int = None, kind: int = None) -> np.ndarray:
+        '''Returns the events of the steps in [start, stop) (optionally of a kind)'''
+        steps = self.eventrecords['step']
+        first = np.searchsorted(steps, start, side='left')
+        last = len(steps) if stop is None else np.searchsorted(steps, stop, side='left')
+        events = self.eventrecords[first:last]
+        if kind is not None:
+            events = events[events['kind'] == kind]
+        return events
+
+    def replay(
+            self,
+            observers: List[SpatialObserver],
+            start: int = 0,
+            stop: int = None) -> None:
+        '''Shows the frames of the steps in [start, stop) to some observers (e.g. renderers)'''
+        first = np.searchsorted(self.steps, start, side='left')
+        last = len(self) if stop is None else np.searchsorted(self.steps, stop, side='left')
+        if first >= last:
+            return
+        frame = self[first]
+        for observer in observers:
+            observer.on_start(frame)
+        for index in range(first + 1, last):
+            frame = self[index]
+            for observer in observers:
+                observer.on_step(frame)
+        for observer in observers:
+            observer.on_end(frame)
@@ -0,0 +1,53 @@
+import pandas as pd
+
+from abstractlevel.sweep import Sweep, grid_design
+
+# CREATE SWEEP
+#########################
+
+# Settings
+nreplicates = 20
+maxturns = 10**4
+nworkers = None # default is one process per cpu
+path = 'sweep.jsonl' # finished games are stored here, rerun to resume an interrupted sweep
+
+predarray = [
+    #grass  #tree   #bush
+    [0.7,   0.99,   0.6],   # snake
+    [0.6,   0.7,    0.99],  # eagle
+    [0.99,   0.6,    0.7]   # puma
+]
+
+configurations = grid_design(
+    nmonkeys=[1000],
+    nsignals=[3, 5, 7],
+    nstates=[3],
+    predarray=[predarray],
+    rep_rate=[1.1, 1.2],
+    mut_rate=[0.01, 0.05],
+    min_monkeys=[30],
+    immortal=[True],
+    archive_cycle=[10**3])
+
+sweep = Sweep(
+    configurations,
+    nreplicates=nreplicates,
+    nturns=maxturns,
+    path=path,
+    nworkers=nworkers)
+
+# RUN GAMES
+#########################
+
+print('RUNNING {0} GAMES ({1} ALREADY DONE)'.format(
+    len(sweep.pending()), len(configurations) * nreplicates - len(sweep.pending())))
+print('-' * 30)
+summary = sweep.run(
+    callback=lambda index, replicate, result: print(
+        'CONFIGURATION {0}, GAME {1}: {2} TURNS, {3} LOSSES'.format(
+            index + 1, replicate + 1, result['turns'], result['losses'])))
+
+pd.set_option('display.width', 200)
+print('-' * 30)
+print(summary.drop(columns=['predarray']))
+summary.to_csv('sweep.csv', index=False, encoding='utf-8')
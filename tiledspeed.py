@@ -0,0 +1,36 @@
+import os
+import time
+
+from spatiallevel.tiled import TiledSpatialGame
+
+# Parameters
+nmonkeys = 200000
+neagles = 100
+max_axis = 300.0
+nsteps = 20
+seed = 0
+
+# Steps with 1, 2, 4, ... tiles (each tile only touches its own monkeys and the halo)
+# The guard keeps worker processes which import this script from running it
+
+if __name__ == '__main__':
+    ntiles = 1
+    while ntiles <= (os.cpu_count() or 1):
+        with TiledSpatialGame(
+                nmonkeys=nmonkeys,
+                neagles=neagles,
+                ntiles=ntiles,
+                max_axis=max_axis,
+                seed=seed) as game:
+            # The first step starts the workers
+            game.run(1)
+            t1 = time.time()
+            game.run(nsteps)
+            t2 = time.time()
+            print('{0} tiles: {1:.0f} μs per step ({2:.4f} μs per monkey, {3} kills)'.format(
+                ntiles,
+                (t2 - t1) * (10**6) / nsteps,
+                (t2 - t1) * (10**6) / (nsteps * nmonkeys),
+                game.kills
+            ))
+        ntiles *= 2